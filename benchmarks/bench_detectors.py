@@ -0,0 +1,98 @@
+"""
+UIDAI Hackathon - Detector Benchmark
+Throughput and flag counts of every registered detector at state, district and pincode level
+
+Usage:
+    python benchmarks/bench_detectors.py --rows 1e6
+    python benchmarks/bench_detectors.py --data-dir /data/uidai --repeat 5 --output detectors.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from uidai_analytics.detectors import DETECTORS, run_detectors, unit_counts
+from uidai_analytics.discovery import discover_shards
+from uidai_analytics.hierarchy import LEVEL_KEYS
+from uidai_analytics.loader import DEMOGRAPHIC, ENROLMENT, load_dataset
+from uidai_analytics.rollup import build_rollup
+from uidai_analytics.synthetic import generate
+
+
+def bench(data_dir, repeat):
+    enrolment_files, demographic_files = discover_shards(data_dir).split()
+    cubes = {ENROLMENT: build_rollup(load_dataset(enrolment_files, ENROLMENT), ENROLMENT),
+             DEMOGRAPHIC: build_rollup(load_dataset(demographic_files, DEMOGRAPHIC), DEMOGRAPHIC)}
+
+    results = {}
+    for level, keys in LEVEL_KEYS.items():
+        start = time.perf_counter()
+        data = unit_counts(cubes[ENROLMENT].table(keys), cubes[DEMOGRAPHIC].table(keys), level,
+                           cubes[DEMOGRAPHIC].table(['date'] + keys))
+        prepare_seconds = time.perf_counter() - start
+
+        # Best of repeat runs; flags are deterministic so any run's table will do
+        best = {}
+        for _ in range(repeat):
+            result = run_detectors(data)
+            for name, seconds in result.seconds.items():
+                best[name] = min(best.get(name, np.inf), seconds)
+        baseline = result.table['iqr_flag'].to_numpy()
+
+        print(f"\n{level}: {len(data):,} units, {int(data.valid.sum()):,} with a ratio "
+              f"(prepared in {prepare_seconds:.3f}s)")
+        print(f"  {'detector':<10} {'flagged':>8} {'also iqr':>9} {'seconds':>9} {'units/s':>12}")
+        level_results = {'units': len(data), 'prepare_seconds': round(prepare_seconds, 4),
+                         'detectors': {}}
+        for name, seconds in best.items():
+            if name in result.not_scored:
+                print(f"  {name:<10} {'not scored':>8}")
+                continue
+            flags = result.table[f'{name}_flag'].to_numpy()
+            overlap = int((flags & baseline).sum())
+            rate = len(data) / seconds if seconds else float('inf')
+            print(f"  {name:<10} {int(flags.sum()):>8,} {overlap:>9,} {seconds:>9.4f} {rate:>12,.0f}")
+            level_results['detectors'][name] = {'flagged': int(flags.sum()), 'overlap_iqr': overlap,
+                                                'seconds': round(seconds, 6),
+                                                'units_per_second': round(rate)}
+        results[level] = level_results
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the anomaly detector suite")
+    parser.add_argument('--data-dir', default=None, help="Existing data root (default: generate)")
+    parser.add_argument('--rows', type=float, default=1e6, help="Synthetic rows to generate")
+    parser.add_argument('--seed', type=int, default=0, help="Synthetic data seed")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per detector; best is kept")
+    parser.add_argument('--output', default=None, help="Write the results as JSON")
+    args = parser.parse_args()
+
+    print("Detectors:")
+    for name, (_, description) in DETECTORS.items():
+        print(f"  {name:<10} {description}")
+
+    if args.data_dir:
+        results = bench(args.data_dir, args.repeat)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            rows = int(args.rows)
+            generate(tmp, rows // 13, rows - rows // 13, geography_root=REPO_ROOT, seed=args.seed)
+            results = bench(tmp, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
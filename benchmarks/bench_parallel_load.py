@@ -0,0 +1,92 @@
+"""
+UIDAI Hackathon - Parallel Loading Benchmark
+Times state aggregation over a pool of shards for an increasing worker count
+
+Usage:
+    python benchmarks/bench_parallel_load.py --copies 32 --max-workers 8
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from uidai_analytics.discovery import discover_shards
+from uidai_analytics.loader import DEMOGRAPHIC, ENROLMENT
+from uidai_analytics.parallel import aggregate_files_parallel, default_workers
+
+
+def build_workload(source_files, copies, target_dir):
+    """Replicate the source shards so there are enough files to spread over workers."""
+    workload = []
+    for i in range(copies):
+        for path in source_files:
+            name, ext = os.path.splitext(os.path.basename(path))
+            copy_path = os.path.join(target_dir, f"{name}_copy{i}{ext}")
+            shutil.copyfile(path, copy_path)
+            workload.append(copy_path)
+    return workload
+
+
+def worker_counts(max_workers):
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel shard aggregation")
+    parser.add_argument('--data-dir', default='.', help="Directory holding the source shards")
+    parser.add_argument('--copies', type=int, default=16, help="Copies of each source shard")
+    parser.add_argument('--max-workers', type=int, default=default_workers())
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per worker count (best is kept)")
+    args = parser.parse_args()
+
+    enrolment_files, demographic_files = discover_shards(args.data_dir).split()
+    if not enrolment_files and not demographic_files:
+        sys.exit(f"No shards found under {args.data_dir}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        enrolment_work = build_workload(enrolment_files, args.copies, tmp)
+        demographic_work = build_workload(demographic_files, args.copies, tmp)
+        total_mb = sum(os.path.getsize(f) for f in enrolment_work + demographic_work) / 1e6
+
+        print("=" * 60)
+        print("PARALLEL LOAD BENCHMARK")
+        print("=" * 60)
+        print(f"Shards: {len(enrolment_work)} enrolment + {len(demographic_work)} demographic "
+              f"({total_mb:.1f} MB)")
+        print(f"CPU cores: {os.cpu_count()}\n")
+        print(f"{'Workers':>8} {'Seconds':>10} {'MB/s':>10} {'Speedup':>10}")
+
+        baseline = None
+        reference = None
+        for workers in worker_counts(args.max_workers):
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                enrolment_agg, _ = aggregate_files_parallel(enrolment_work, ENROLMENT, workers=workers)
+                update_agg, _ = aggregate_files_parallel(demographic_work, DEMOGRAPHIC, workers=workers)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+
+            # Every worker count must produce exactly the same aggregates
+            result = (enrolment_agg, update_agg)
+            if reference is None:
+                reference = result
+            elif not all(a.equals(b) for a, b in zip(reference, result)):
+                sys.exit(f"Aggregates differ at {workers} workers")
+
+            baseline = baseline or best
+            print(f"{workers:>8} {best:>10.3f} {total_mb / best:>10.1f} {baseline / best:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
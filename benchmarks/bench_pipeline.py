@@ -0,0 +1,172 @@
+"""
+UIDAI Hackathon - Pipeline Benchmark
+Times every pipeline stage on synthetic shards and compares against a stored baseline
+
+Usage:
+    python benchmarks/bench_pipeline.py --rows 1e5 1e6
+    python benchmarks/bench_pipeline.py --rows 1e7 --workers 8 --update-baseline
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import warnings
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from uidai_analytics.metrics import MetricsRecorder
+from uidai_analytics.pipeline import run_pipeline
+from uidai_analytics.synthetic import generate
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_pipeline.json')
+
+# Stage timings below this many seconds are too noisy to flag
+NOISE_FLOOR_SECONDS = 0.05
+
+
+def run_scale(rows, workers, seed, data_dir=None, keep_dir=None, metrics=None):
+    """
+    Generate (or reuse) shards for one scale and run the pipeline once, quietly.
+
+    metrics may be a MetricsRecorder set up to trace memory or profile stages.
+    """
+    with contextlib.ExitStack() as stack:
+        if data_dir is None:
+            data_dir = keep_dir or stack.enter_context(tempfile.TemporaryDirectory())
+            enrolment_rows = rows // 13
+            generate(data_dir, enrolment_rows, rows - enrolment_rows, geography_root=REPO_ROOT,
+                     seed=seed)
+        input_bytes = sum(os.path.getsize(os.path.join(d, f))
+                          for d, _, files in os.walk(data_dir) for f in files
+                          if f.endswith('.csv'))
+
+        metrics = metrics or MetricsRecorder()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results, _ = run_pipeline(root=data_dir, output_dir=os.path.join(data_dir, 'charts'),
+                                      workers=workers, fmt='draft', force=True, metrics=metrics)
+
+    report = results['report']
+    stages = {}
+    for stage in metrics.stages:
+        record = stage.to_dict()
+        # Throughput is rows consumed per second; load consumes what it emits
+        rows_in = stage.rows_out if stage.name == 'load' else stage.rows_in
+        record['rows_per_second'] = (round(rows_in / stage.wall_seconds)
+                                     if rows_in and stage.wall_seconds else None)
+        if stage.name == 'load':
+            record['mb_per_second'] = round(input_bytes / 1e6 / stage.wall_seconds, 2)
+        stages[stage.name] = record
+    return {
+        'rows': rows,
+        'input_mb': round(input_bytes / 1e6, 2),
+        'total_wall_seconds': round(sum(s.wall_seconds for s in metrics.stages), 6),
+        'peak_rss_bytes': max(s.peak_rss_bytes or 0 for s in metrics.stages) or None,
+        'stages': stages,
+        # Same seed and scale must always give the same answer
+        'result': {
+            'states_analyzed': report['states_analyzed'],
+            'upper_bound': round(report['thresholds']['upper_bound'], 6),
+            'state_outliers': len(report['state_outliers']),
+            'district_outliers': report['district_outliers'],
+            'pincode_outliers': report['pincode_outliers'],
+        },
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Regressions of current against baseline as a list of messages."""
+    problems = []
+    if current['result'] != baseline['result']:
+        problems.append(f"results changed: {baseline['result']} -> {current['result']}")
+    for name, stage in current['stages'].items():
+        base = baseline['stages'].get(name)
+        if base is None:
+            continue
+        now, before = stage['wall_seconds'], base['wall_seconds']
+        if now > before * (1 + tolerance) and now - before > NOISE_FLOOR_SECONDS:
+            problems.append(f"{name}: {before:.3f}s -> {now:.3f}s (+{(now / before - 1) * 100:.0f}%)")
+    if current['peak_rss_bytes'] and baseline.get('peak_rss_bytes'):
+        now, before = current['peak_rss_bytes'], baseline['peak_rss_bytes']
+        if now > before * (1 + tolerance):
+            problems.append(f"peak RSS: {before / 1e6:.0f} MB -> {now / 1e6:.0f} MB")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic shards")
+    parser.add_argument('--rows', type=float, nargs='+', default=[1e5, 1e6],
+                        help="Total rows per scale, 1e5 .. 1e9 (default: 1e5 1e6)")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=None,
+                        help="Benchmark existing shards instead of generating them (one scale)")
+    parser.add_argument('--keep-data', default=None,
+                        help="Write the generated shards here instead of a temporary directory")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed slowdown / memory growth before failing (default: 0.25)")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="Store this run as the new baseline instead of comparing")
+    parser.add_argument('--output', default=None, help="Also write this run's results as JSON")
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    scales = [None] if args.data_dir else [int(rows) for rows in args.rows]
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print("=" * 70)
+    print("PIPELINE BENCHMARK")
+    print("=" * 70)
+    print(f"Workers: {args.workers}  CPU cores: {os.cpu_count()}\n")
+
+    results = {}
+    failed = False
+    for rows in scales:
+        keep_dir = None
+        if args.keep_data:
+            keep_dir = os.path.join(args.keep_data, str(rows))
+            os.makedirs(keep_dir, exist_ok=True)
+        current = run_scale(rows, args.workers, args.seed, args.data_dir, keep_dir)
+        key = str(rows) if rows is not None else os.path.abspath(args.data_dir)
+        results[key] = current
+
+        print(f"Rows: {current['rows'] or 'existing shards'}  Input: {current['input_mb']:.1f} MB  "
+              f"Peak RSS: {(current['peak_rss_bytes'] or 0) / 1e6:.0f} MB")
+        print(f"  {'Stage':<11} {'Wall s':>9} {'CPU s':>9} {'Rows/s':>14} {'vs base':>9}")
+        base_stages = baseline.get(key, {}).get('stages', {})
+        for name, stage in current['stages'].items():
+            rate = f"{stage['rows_per_second']:,}" if stage['rows_per_second'] else '-'
+            base = base_stages.get(name)
+            change = f"{stage['wall_seconds'] / base['wall_seconds']:.2f}x" if base and base['wall_seconds'] else '-'
+            print(f"  {name:<11} {stage['wall_seconds']:>9.3f} {stage['cpu_seconds']:>9.3f} "
+                  f"{rate:>14} {change:>9}")
+
+        if not args.update_baseline and key in baseline:
+            problems = compare(current, baseline[key], args.tolerance)
+            for problem in problems:
+                print(f"  REGRESSION {problem}")
+            failed = failed or bool(problems)
+        print()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+    elif failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+UIDAI Hackathon - Record Store Benchmark
+Aggregation from CSV shards vs the memory-mapped record store, alone and with
+several analysis processes running at once on the same host
+
+Usage:
+    python benchmarks/bench_recordstore.py --rows 1e6
+    python benchmarks/bench_recordstore.py --data-dir /data/uidai --processes 4 --workers 8
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from uidai_analytics.discovery import discover_shards
+from uidai_analytics.hierarchy import LEVEL_KEYS
+from uidai_analytics.loader import DEMOGRAPHIC, ENROLMENT
+from uidai_analytics.parallel import aggregate_levels_parallel, aggregate_records_parallel
+from uidai_analytics.recordstore import RecordStore
+from uidai_analytics.synthetic import generate
+
+# The levels the advanced script aggregates with --detectors
+LEVELS = {'state': LEVEL_KEYS['state'], 'pincode': LEVEL_KEYS['pincode'], 'date': ['date', 'state']}
+
+# One analysis process: aggregate both datasets, then report its own memory.
+# Pss splits shared pages between the processes mapping them.
+ANALYSIS = """
+import json, resource, sys
+sys.path.insert(0, {repo!r})
+from bench_recordstore import aggregate
+aggregate(sys.argv[1], sys.argv[2], int(sys.argv[3]))
+memory = {{'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}
+try:
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if name in ('Pss', 'Private_Clean', 'Private_Dirty'):
+                memory[name.lower() + '_mb'] = int(value.split()[0]) / 1024
+except OSError:
+    pass
+print(json.dumps(memory))
+"""
+
+
+def aggregate(mode, root, workers):
+    """Both datasets' levels from the CSV shards or the record store under root."""
+    if mode == 'store':
+        store = RecordStore(os.path.join(root, 'records'))
+        return {dataset: aggregate_records_parallel(store, dataset, LEVELS, workers)
+                for dataset in (ENROLMENT, DEMOGRAPHIC)}
+    discovery = discover_shards(root)
+    return {dataset: aggregate_levels_parallel(discovery.files(dataset), dataset, LEVELS, workers)
+            for dataset in (ENROLMENT, DEMOGRAPHIC)}
+
+
+def best_seconds(mode, root, workers, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        aggregate(mode, root, workers)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def concurrent_run(mode, root, workers, processes):
+    """Start processes analyses at once. Returns (wall seconds, [per-process memory])."""
+    script = ANALYSIS.format(repo=os.path.dirname(os.path.abspath(__file__)))
+    start = time.perf_counter()
+    children = [subprocess.Popen([sys.executable, '-c', script, mode, root, str(workers)],
+                                 stdout=subprocess.PIPE, text=True)
+                for _ in range(processes)]
+    outputs = [child.communicate()[0] for child in children]
+    seconds = time.perf_counter() - start
+    if any(child.returncode for child in children):
+        raise RuntimeError(f"An analysis process of mode {mode} failed")
+    return seconds, [json.loads(output.splitlines()[-1]) for output in outputs]
+
+
+def bench(root, workers, processes, repeat):
+    discovery = discover_shards(root)
+    csv_bytes = sum(os.path.getsize(shard.path) for shard in discovery.shards)
+
+    start = time.perf_counter()
+    store = RecordStore(os.path.join(root, 'records'))
+    store.ingest(*discovery.split())
+    ingest_seconds = time.perf_counter() - start
+    store_bytes = sum(os.path.getsize(os.path.join(store.store_dir, f"{dataset}.records"))
+                      for dataset in (ENROLMENT, DEMOGRAPHIC))
+    print(f"Ingest (parse once): {ingest_seconds:.2f}s, {csv_bytes / 1e6:.1f} MB CSV -> "
+          f"{store_bytes / 1e6:.1f} MB records")
+
+    expected, actual = aggregate('csv', root, workers), aggregate('store', root, workers)
+    identical = True
+    for dataset in expected:
+        identical &= expected[dataset][1] == actual[dataset][1]
+        for level in LEVELS:
+            try:
+                pd.testing.assert_frame_equal(expected[dataset][0][level], actual[dataset][0][level])
+            except AssertionError:
+                identical = False
+    print(f"Aggregates identical to the CSV path: {'OK' if identical else 'FAIL'}")
+
+    results = {'csv_bytes': csv_bytes, 'store_bytes': store_bytes,
+               'ingest_seconds': round(ingest_seconds, 3), 'identical': identical, 'modes': {}}
+    print(f"\n  {'mode':<6} {'1 run s':>9} {f'{processes} runs s':>10} {'peak RSS MB':>12} "
+          f"{'PSS MB':>8} {'private MB':>11}")
+    for mode in ('csv', 'store'):
+        seconds = best_seconds(mode, root, workers, repeat)
+        wall, memory = concurrent_run(mode, root, workers, processes)
+
+        def mean(key):
+            values = [m[key] for m in memory if key in m]
+            return round(sum(values) / len(values), 1) if values else None
+
+        private = None
+        if mean('private_clean_mb') is not None:
+            private = round(mean('private_clean_mb') + mean('private_dirty_mb'), 1)
+        results['modes'][mode] = {'seconds': round(seconds, 3), 'concurrent_seconds': round(wall, 3),
+                                  'peak_rss_mb': mean('peak_rss_mb'), 'pss_mb': mean('pss_mb'),
+                                  'private_mb': private}
+        r = results['modes'][mode]
+        print(f"  {mode:<6} {r['seconds']:>9.3f} {r['concurrent_seconds']:>10.3f} "
+              f"{r['peak_rss_mb']:>12.1f} {r['pss_mb'] or float('nan'):>8.1f} "
+              f"{private or float('nan'):>11.1f}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the memory-mapped record store")
+    parser.add_argument('--data-dir', default=None, help="Existing data root (default: generate)")
+    parser.add_argument('--rows', type=float, default=1e6, help="Synthetic rows to generate")
+    parser.add_argument('--seed', type=int, default=0, help="Synthetic data seed")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes per analysis")
+    parser.add_argument('--processes', type=int, default=4, help="Analyses run at the same time")
+    parser.add_argument('--repeat', type=int, default=3, help="Single runs timed; best is kept")
+    parser.add_argument('--output', default=None, help="Write the results as JSON")
+    args = parser.parse_args()
+
+    if args.data_dir:
+        results = bench(args.data_dir, args.workers, args.processes, args.repeat)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            rows = int(args.rows)
+            generate(tmp, rows // 13, rows - rows // 13, geography_root=REPO_ROOT, seed=args.seed)
+            results = bench(tmp, args.workers, args.processes, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to: {args.output}")
+    if not results['identical']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
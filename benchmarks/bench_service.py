@@ -0,0 +1,187 @@
+"""
+UIDAI Hackathon - Query Service Benchmark
+p50/p99 latency and requests per second of the HTTP service under concurrent
+keep-alive clients, with the LRU result cache on and off
+
+Usage:
+    python benchmarks/bench_service.py --rows 1e6
+    python benchmarks/bench_service.py --data-dir /data/uidai --concurrency 64 --requests 20000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from uidai_analytics.service import DEFAULT_RESULT_CACHE_MB
+from uidai_analytics.synthetic import generate
+
+# Share of requests going to each endpoint
+MIX = {'ratios': 0.3, 'anomalies': 0.3, 'timeseries': 0.4}
+
+
+def start_server(data_dir, result_cache_mb):
+    """Start the service in its own process on a free port. Returns (process, port)."""
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uidai_analytics.service', '--root', data_dir, '--port', '0',
+         '--interval', '0', '--result-cache-mb', str(result_cache_mb)],
+        cwd=REPO_ROOT, stdout=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        match = re.search(r'Serving on http://[^:]+:(\d+)', line)
+        if match:
+            return process, int(match.group(1))
+    raise RuntimeError(f"Service exited with code {process.wait()} before listening")
+
+
+async def request(reader, writer, target):
+    """One GET on an open keep-alive connection. Returns (status, body)."""
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def fetch_json(port, target):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        _, body = await request(reader, writer, target)
+    finally:
+        writer.close()
+    return json.loads(body)
+
+
+async def query_targets(port, n_requests, seed):
+    """Requests drawn from every state and district with Zipf-like popularity."""
+    states = [unit['state'] for unit in
+              (await fetch_json(port, '/ratios?level=state&limit=100000'))['units']]
+    districts = [(unit['state'], unit['district']) for unit in
+                 (await fetch_json(port, '/ratios?level=district&limit=100000'))['units']
+                 if unit['district'] is not None]
+    pools = {
+        'ratios': [f"/ratios?{urlencode({'level': level, 'state': state})}"
+                   for state in states for level in ('district', 'pincode')],
+        'anomalies': [f"/anomalies?{urlencode({'level': level, 'state': state, 'n': 10})}"
+                      for state in states for level in ('district', 'pincode')],
+        'timeseries': [f"/timeseries?{urlencode({'state': state})}" for state in states] +
+                      [f"/timeseries?{urlencode({'state': state, 'district': district})}"
+                       for state, district in districts],
+    }
+    rng = np.random.default_rng(seed)
+    endpoints = rng.choice(list(MIX), size=n_requests, p=list(MIX.values()))
+    targets = []
+    for name in endpoints:
+        pool = pools[name]
+        rank = min(int(rng.zipf(1.3)) - 1, len(pool) - 1)
+        targets.append(pool[rank])
+    return targets
+
+
+async def load_test(port, targets, concurrency):
+    """Send every target from concurrency keep-alive clients. Returns (latencies, errors, seconds)."""
+    latencies = np.empty(len(targets))
+    errors = 0
+    position = 0
+
+    async def client():
+        nonlocal errors, position
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            while position < len(targets):
+                i = position
+                position += 1
+                start = time.perf_counter()
+                status, _ = await request(reader, writer, targets[i])
+                latencies[i] = time.perf_counter() - start
+                errors += status != 200
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def bench(data_dir, n_requests, concurrency, result_cache_mb, seed):
+    results = {}
+    for mode, budget in (('cached', result_cache_mb), ('uncached', 0)):
+        process, port = start_server(data_dir, budget)
+        try:
+            targets = asyncio.run(query_targets(port, n_requests, seed))
+            latencies, errors, seconds = asyncio.run(load_test(port, targets, concurrency))
+            cache = asyncio.run(fetch_json(port, '/health'))['cache']
+        finally:
+            process.terminate()
+            process.wait()
+        lookups = cache['hits'] + cache['misses']
+        results[mode] = {
+            'requests': len(targets),
+            'distinct': len(set(targets)),
+            'errors': errors,
+            'p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 3),
+            'p99_ms': round(float(np.percentile(latencies, 99)) * 1000, 3),
+            'mean_ms': round(float(latencies.mean()) * 1000, 3),
+            'requests_per_second': round(len(targets) / seconds),
+            'cache_hit_rate': round(cache['hits'] / lookups, 4) if lookups else 0.0,
+            'cache_evictions': cache['evictions'],
+        }
+        r = results[mode]
+        print(f"  {mode:<9} {r['requests']:>8,} {r['distinct']:>9,} {r['p50_ms']:>9.2f} "
+              f"{r['p99_ms']:>9.2f} {r['requests_per_second']:>9,} {r['cache_hit_rate']:>9.1%} "
+              f"{r['errors']:>7,}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the HTTP query service")
+    parser.add_argument('--data-dir', default=None, help="Existing data root (default: generate)")
+    parser.add_argument('--rows', type=float, default=1e6, help="Synthetic rows to generate")
+    parser.add_argument('--seed', type=int, default=0, help="Synthetic data and request mix seed")
+    parser.add_argument('--requests', type=int, default=10000, help="Requests per run")
+    parser.add_argument('--concurrency', type=int, default=32, help="Concurrent keep-alive clients")
+    parser.add_argument('--result-cache-mb', type=float, default=DEFAULT_RESULT_CACHE_MB,
+                        help=f"Result cache budget of the cached run (default: {DEFAULT_RESULT_CACHE_MB})")
+    parser.add_argument('--output', default=None, help="Write the results as JSON")
+    args = parser.parse_args()
+
+    print(f"{args.requests:,} requests from {args.concurrency} clients "
+          f"({', '.join(f'{name} {share:.0%}' for name, share in MIX.items())})")
+    print(f"  {'mode':<9} {'requests':>8} {'distinct':>9} {'p50 ms':>9} {'p99 ms':>9} "
+          f"{'req/s':>9} {'hit rate':>9} {'errors':>7}")
+    if args.data_dir:
+        results = bench(args.data_dir, args.requests, args.concurrency, args.result_cache_mb,
+                        args.seed)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            rows = int(args.rows)
+            generate(tmp, rows // 13, rows - rows // 13, geography_root=REPO_ROOT, seed=args.seed)
+            results = bench(tmp, args.requests, args.concurrency, args.result_cache_mb, args.seed)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to: {args.output}")
+    if any(result['errors'] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
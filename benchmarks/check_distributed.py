@@ -0,0 +1,147 @@
+"""
+UIDAI Hackathon - Distributed Execution Check
+Runs the coordinator with local worker processes standing in for nodes, kills two
+of them mid-shard and compares the merged aggregates, ratios and thresholds with
+a single-machine run
+
+Usage:
+    python benchmarks/check_distributed.py --rows 2e6 --workers 3
+    python benchmarks/check_distributed.py --data-dir /data/uidai --workers 8 --lease-seconds 5
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from uidai_analytics.analysis import build_merged_df
+from uidai_analytics.discovery import discover_shards
+from uidai_analytics.distributed import AUTHKEY_ENV, Coordinator
+from uidai_analytics.hierarchy import score_hierarchy
+from uidai_analytics.loader import DEMOGRAPHIC, ENROLMENT, count_columns, load_dataset
+from uidai_analytics.parallel import aggregate_levels_parallel
+from uidai_analytics.synthetic import generate
+
+LEVELS = {'state': ['state'], 'pincode': ['state', 'district', 'pincode'], 'date': ['date', 'state']}
+
+
+def start_remote_worker(address, authkey, name):
+    """A worker the coordinator did not start: its death is only noticed when its lease runs out."""
+    env = dict(os.environ, **{AUTHKEY_ENV: authkey.decode()})
+    return subprocess.Popen([sys.executable, '-m', 'uidai_analytics.distributed', 'worker',
+                             '--connect', f"{address[0]}:{address[1]}", '--name', name],
+                            cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL)
+
+
+def kill_when_leased(coordinator, name, process, timeout=60):
+    """SIGKILL a worker as soon as it holds a lease. Returns the task it was computing, or None."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and not coordinator.finished.is_set():
+        held = [task_id for task_id, worker in coordinator.status()['leased'].items() if worker == name]
+        if held:
+            process.kill()
+            return held[0]
+        time.sleep(0.005)
+    return None
+
+
+def check(data_dir, workers, lease_seconds):
+    files = dict(zip((ENROLMENT, DEMOGRAPHIC), discover_shards(data_dir).split()))
+
+    start = time.perf_counter()
+    reference = {dataset: aggregate_levels_parallel(paths, dataset, LEVELS, workers=1)
+                 for dataset, paths in files.items()}
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    coordinator = Coordinator.for_shards(files, LEVELS, lease_seconds=lease_seconds)
+    address = coordinator.serve(('127.0.0.1', 0))
+    print(f"{len(coordinator.tasks)} shards, {workers} local workers + 1 remote, "
+          f"lease {lease_seconds:g}s")
+    remote = start_remote_worker(address, coordinator.authkey, 'remote-1')
+    coordinator.start_local_workers(workers)
+    killed = {'remote-1': kill_when_leased(coordinator, 'remote-1', remote)}
+    killed['local-1'] = kill_when_leased(coordinator, 'local-1', coordinator.processes['local-1'])
+    merged = coordinator.wait()
+    remote.wait()
+    distributed_seconds = time.perf_counter() - start
+
+    ok = True
+    for name, task_id in killed.items():
+        print(f"Killed {name} while computing {task_id}" if task_id else
+              f"{name} never held a lease: FAIL")
+        ok = ok and task_id is not None
+    print(f"Reassigned: {coordinator.reassigned}  shards per worker: "
+          f"{', '.join(f'{worker} {n}' for worker, n in sorted(coordinator.workers.items()))}")
+    ok = ok and coordinator.reassigned >= 2
+    print(f"Single process {single_seconds:.2f}s  distributed {distributed_seconds:.2f}s")
+
+    for dataset in files:
+        expected, n_expected = reference[dataset]
+        result, n_rows, sketch = merged[dataset]
+        same_rows = n_rows == n_expected
+        print(f"{dataset}: {n_rows:,} rows  {'identical' if same_rows else 'DIFFERENT'}")
+        ok = ok and same_rows
+        for level in LEVELS:
+            same = expected[level].equals(result[level])
+            print(f"  {level:<8} {len(result[level]):>10,} groups  {'identical' if same else 'DIFFERENT'}")
+            ok = ok and same
+
+        totals = load_dataset(files[dataset], dataset)[count_columns(dataset)].sum(axis=1).to_numpy()
+        for q in (0.5, 0.9, 0.99):
+            exact = float(np.quantile(totals, q, method='lower'))
+            estimate = sketch.quantile(q)
+            close = abs(estimate - exact) <= sketch.relative_accuracy * exact
+            print(f"  p{q * 100:g} per-record count  exact {exact:g}  sketch {estimate:.2f}  "
+                  f"{'OK' if close else 'OFF'}")
+            ok = ok and close
+
+    merged_df = {mode: build_merged_df(tables[ENROLMENT][0]['state'], tables[DEMOGRAPHIC][0]['state'])
+                 for mode, tables in (('single', reference), ('distributed', merged))}
+    same = merged_df['single'].equals(merged_df['distributed'])
+    print(f"merged_df: {'identical' if same else 'DIFFERENT'}")
+    ok = ok and same
+
+    hierarchies = {mode: score_hierarchy(tables[ENROLMENT][0]['pincode'], tables[DEMOGRAPHIC][0]['pincode'])
+                   for mode, tables in (('single', reference), ('distributed', merged))}
+    for level in ('state', 'district', 'pincode'):
+        same = hierarchies['single'].thresholds[level] == hierarchies['distributed'].thresholds[level]
+        print(f"{level} thresholds: {'identical' if same else 'DIFFERENT'}")
+        ok = ok and same
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check distributed execution against one machine")
+    parser.add_argument('--data-dir', default=None, help="Existing data root (default: generate)")
+    parser.add_argument('--rows', type=float, default=2e6, help="Synthetic rows to generate")
+    parser.add_argument('--rows-per-shard', type=int, default=100_000,
+                        help="Rows per synthetic shard, i.e. per task (default: 100000)")
+    parser.add_argument('--workers', type=int, default=3, help="Local worker processes (default: 3)")
+    parser.add_argument('--lease-seconds', type=float, default=2.0,
+                        help="Lease length; the killed remote worker's shard waits this long (default: 2)")
+    args = parser.parse_args()
+
+    if args.data_dir:
+        ok = check(args.data_dir, args.workers, args.lease_seconds)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            rows = int(args.rows)
+            generate(tmp, rows // 13, rows - rows // 13, rows_per_shard=args.rows_per_shard,
+                     geography_root=REPO_ROOT)
+            ok = check(tmp, args.workers, args.lease_seconds)
+
+    print(f"\nDistributed check: {'OK' if ok else 'FAIL'}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
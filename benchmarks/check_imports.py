@@ -0,0 +1,89 @@
+"""
+UIDAI Hackathon - Import & Startup Check
+Fails if a heavy library is imported on the report-only path or startup exceeds its target
+
+Usage:
+    python benchmarks/check_imports.py
+    python benchmarks/check_imports.py --data-dir /data/uidai --startup-target 0.8
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries only needed to draw charts, or not needed at all. pyarrow is not
+# listed: pandas 3 imports it itself for its Arrow-backed string dtype.
+HEAVY_MODULES = ('matplotlib', 'seaborn', 'sklearn', 'scipy')
+
+# Cold start of the CLI (interpreter + pandas/NumPy + the package), in seconds
+STARTUP_TARGET_SECONDS = 1.0
+
+# Runs the whole pipeline with --no-plots, writing the JSON/Parquet report to a
+# temporary directory, and prints the top-level modules that got imported
+REPORT_ONLY = """
+import contextlib, io, json, sys, tempfile
+from uidai_analytics.pipeline import run_pipeline
+with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+    run_pipeline(root=sys.argv[1], output_dir=tmp, plots=False, report_dir=tmp,
+                 detectors=['mad', 'negbin'])
+print(json.dumps(sorted({{name.split('.')[0] for name in sys.modules}} & set({heavy!r}))))
+"""
+
+STARTUP_COMMANDS = {
+    'uidai-analytics --help': [sys.executable, '-m', 'uidai_analytics', '--help'],
+    'advanced_anomaly_detection.py --help': [sys.executable,
+                                             os.path.join(REPO_ROOT, 'advanced_anomaly_detection.py'),
+                                             '--help'],
+}
+
+
+def run(command):
+    return subprocess.run(command, cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+
+
+def startup_seconds(command, repeat):
+    """Best wall time of repeat fresh interpreter runs."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(command)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check imports and startup time")
+    parser.add_argument('--data-dir', default=REPO_ROOT, help="Data root for the report-only run")
+    parser.add_argument('--startup-target', type=float, default=STARTUP_TARGET_SECONDS,
+                        help=f"Maximum cold start in seconds (default: {STARTUP_TARGET_SECONDS})")
+    parser.add_argument('--repeat', type=int, default=3, help="Startup runs; best is kept")
+    args = parser.parse_args()
+    ok = True
+
+    script = REPORT_ONLY.format(heavy=HEAVY_MODULES)
+    heavy = json.loads(run([sys.executable, '-c', script, args.data_dir]).stdout.splitlines()[-1])
+    if heavy:
+        print(f"Report-only path imported: {', '.join(heavy)}  FAIL")
+        ok = False
+    else:
+        print(f"Report-only path imported none of: {', '.join(HEAVY_MODULES)}  OK")
+
+    for name, command in STARTUP_COMMANDS.items():
+        seconds = startup_seconds(command, args.repeat)
+        within = seconds <= args.startup_target
+        print(f"Startup {name:<40} {seconds:.3f}s (target {args.startup_target:.2f}s)  "
+              f"{'OK' if within else 'FAIL'}")
+        ok = ok and within
+
+    baseline = startup_seconds([sys.executable, '-c', 'import pandas'], args.repeat)
+    print(f"  for reference, 'import pandas' alone: {baseline:.3f}s")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+UIDAI Hackathon - Join Engine Check
+Compares the sort-merge (pincode, date) join and the lagged weekly join with pandas
+group-by + merge references, and times both
+
+Usage:
+    python benchmarks/check_join.py --rows 1e6
+    python benchmarks/check_join.py --data-dir /data/uidai --lag-weeks 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from uidai_analytics.discovery import discover_shards
+from uidai_analytics.join import JOIN_TYPES, WEEK_OFFSET_DAYS, cells_from_files, join_cells, lagged_join
+from uidai_analytics.loader import DEMOGRAPHIC, ENROLMENT, count_columns, load_dataset
+from uidai_analytics.synthetic import generate
+
+DATASETS = (ENROLMENT, DEMOGRAPHIC)
+
+
+def reference_cells(frames):
+    """Per-(pincode, date) band sums of each dataset, the pandas way."""
+    return {dataset: frame.dropna(subset=['date']).groupby(['pincode', 'date'])[count_columns(dataset)]
+            .sum().astype(np.int64) for dataset, frame in frames.items()}
+
+
+def reference_weekly_totals(frames, lag_weeks):
+    """(update totals per week, enrolment totals over weeks t-lag_weeks..t) as Series."""
+    totals = {}
+    for dataset, frame in frames.items():
+        frame = frame.dropna(subset=['date'])
+        days = frame['date'].to_numpy('datetime64[D]').view(np.int64)
+        totals[dataset] = pd.DataFrame({
+            'pincode': frame['pincode'].to_numpy(np.int64),
+            'week': (days + WEEK_OFFSET_DAYS) // 7,
+            'total': frame[count_columns(dataset)].sum(axis=1).to_numpy(np.int64),
+        })
+    enrolment = totals[ENROLMENT]
+    window = pd.concat([enrolment.assign(week=enrolment['week'] + lag) for lag in range(lag_weeks + 1)])
+    return (totals[DEMOGRAPHIC].groupby(['pincode', 'week'])['total'].sum(),
+            window.groupby(['pincode', 'week'])['total'].sum())
+
+
+def check(data_dir, lag_weeks):
+    files = dict(zip(DATASETS, discover_shards(data_dir).split()))
+    frames = {dataset: load_dataset(files[dataset], dataset) for dataset in DATASETS}
+    print(f"Records: {len(frames[ENROLMENT]):,} enrolment, {len(frames[DEMOGRAPHIC]):,} update")
+
+    start = time.perf_counter()
+    cells = {dataset: cells_from_files(files[dataset], dataset) for dataset in DATASETS}
+    print(f"Cells folded from the shards in {time.perf_counter() - start:.2f}s: "
+          f"{len(cells[ENROLMENT]):,} enrolment, {len(cells[DEMOGRAPHIC]):,} update")
+
+    start = time.perf_counter()
+    reference = reference_cells(frames)
+    print(f"pandas group-by of the loaded frames: {time.perf_counter() - start:.2f}s")
+
+    ok = True
+    columns = ['pincode', 'date'] + count_columns(ENROLMENT) + count_columns(DEMOGRAPHIC)
+    for how in JOIN_TYPES:
+        start = time.perf_counter()
+        joined = join_cells(cells[ENROLMENT], cells[DEMOGRAPHIC], how)
+        engine_seconds = time.perf_counter() - start
+        # Timed up to the same filled, flat table the engine returns
+        start = time.perf_counter()
+        expected = pd.merge(reference[ENROLMENT], reference[DEMOGRAPHIC], how=how,
+                            left_index=True, right_index=True)
+        expected = expected.fillna(0).astype(np.int64).sort_index().reset_index()
+        pandas_seconds = time.perf_counter() - start
+        result = joined[columns].astype({'pincode': np.int64})
+        same = result.equals(expected[columns].astype({'pincode': np.int64}))
+        print(f"  {how:<6} {len(joined):>10,} cells  engine {engine_seconds:.3f}s  "
+              f"pandas {pandas_seconds:.3f}s  {'identical' if same else 'DIFFERENT'}")
+        ok = ok and same
+
+    updates, window = reference_weekly_totals(frames, lag_weeks)
+    for how in JOIN_TYPES:
+        joined = lagged_join(cells[ENROLMENT], cells[DEMOGRAPHIC], lag_weeks, how)
+        expected = pd.merge(updates.rename('update'), window.rename('window'), how=how,
+                            left_index=True, right_index=True).fillna(0).astype(np.int64).reset_index()
+        same = (len(joined) == len(expected) and
+                np.array_equal(joined['pincode'].to_numpy(np.int64), expected['pincode'].to_numpy()) and
+                np.array_equal(joined['Update_Count'].to_numpy(), expected['update'].to_numpy()) and
+                np.array_equal(joined['Enrolment_Count'].to_numpy(), expected['window'].to_numpy()))
+        print(f"  lagged {how:<6} {len(joined):>10,} weeks (t-{lag_weeks}..t)  "
+              f"{'identical' if same else 'DIFFERENT'}")
+        ok = ok and same
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the join engine against pandas")
+    parser.add_argument('--data-dir', default=None, help="Existing data root (default: generate)")
+    parser.add_argument('--rows', type=float, default=1e6, help="Synthetic rows to generate")
+    parser.add_argument('--lag-weeks', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    if args.data_dir:
+        ok = check(args.data_dir, args.lag_weeks)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            rows = int(args.rows)
+            generate(tmp, rows // 13, rows - rows // 13, geography_root=REPO_ROOT, seed=args.seed)
+            ok = check(tmp, args.lag_weeks)
+
+    print(f"\nJoin check: {'OK' if ok else 'FAIL'}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
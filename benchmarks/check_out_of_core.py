@@ -0,0 +1,86 @@
+"""
+UIDAI Hackathon - Out-of-Core Equivalence Check
+Aggregates shards in memory and through the spilling group-by and compares merged_df
+
+Usage:
+    python benchmarks/check_out_of_core.py --rows 1e6 --memory-budget-mb 4
+    python benchmarks/check_out_of_core.py --data-dir /data/uidai --memory-budget-mb 2048
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from uidai_analytics.analysis import build_merged_df
+from uidai_analytics.discovery import discover_shards
+from uidai_analytics.loader import DEMOGRAPHIC, ENROLMENT, aggregate_levels
+from uidai_analytics.metrics import peak_rss_bytes
+from uidai_analytics.outofcore import aggregate_out_of_core
+from uidai_analytics.synthetic import generate
+
+LEVELS = {'state': ['state'], 'pincode': ['state', 'district', 'pincode'], 'date': ['date', 'state']}
+
+
+def canonical(frame, keys):
+    frame = frame.sort_values(keys).reset_index(drop=True)
+    frame[keys] = frame[keys].astype(str)
+    return frame
+
+
+def check(data_dir, budget_mb):
+    files = dict(zip((ENROLMENT, DEMOGRAPHIC), discover_shards(data_dir).split()))
+    state_tables = {'in-memory': {}, 'out-of-core': {}}
+    ok = True
+    for dataset, paths in files.items():
+        start = time.perf_counter()
+        reference, n_reference = aggregate_levels(paths, dataset, LEVELS)
+        in_memory_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result, n_rows, stats = aggregate_out_of_core(paths, dataset, LEVELS, budget_mb)
+        out_of_core_seconds = time.perf_counter() - start
+
+        print(f"{dataset}: {n_rows:,} rows  in-memory {in_memory_seconds:.2f}s  "
+              f"out-of-core {out_of_core_seconds:.2f}s  spills {stats['spills']} "
+              f"({stats['spilled_bytes'] / 1e6:.1f} MB)")
+        ok = ok and n_rows == n_reference
+        for level, keys in LEVELS.items():
+            same = canonical(reference[level], keys).equals(canonical(result[level], keys))
+            print(f"  {level:<8} {len(result[level]):>10,} groups  {'identical' if same else 'DIFFERENT'}")
+            ok = ok and same
+        state_tables['in-memory'][dataset] = reference['state']
+        state_tables['out-of-core'][dataset] = result['state']
+
+    merged = {mode: build_merged_df(tables[ENROLMENT], tables[DEMOGRAPHIC])
+              for mode, tables in state_tables.items()}
+    same = merged['in-memory'].equals(merged['out-of-core'])
+    print(f"merged_df: {'identical' if same else 'DIFFERENT'}")
+    print(f"Peak RSS: {(peak_rss_bytes() or 0) / 1e6:.0f} MB")
+    return ok and same
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check out-of-core aggregation against in-memory")
+    parser.add_argument('--data-dir', default=None, help="Existing data root (default: generate)")
+    parser.add_argument('--rows', type=float, default=1e6, help="Synthetic rows to generate")
+    parser.add_argument('--memory-budget-mb', type=int, default=4,
+                        help="Out-of-core budget; keep it small to force spills (default: 4)")
+    args = parser.parse_args()
+
+    if args.data_dir:
+        ok = check(args.data_dir, args.memory_budget_mb)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            rows = int(args.rows)
+            generate(tmp, rows // 13, rows - rows // 13, geography_root=REPO_ROOT)
+            ok = check(tmp, args.memory_budget_mb)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
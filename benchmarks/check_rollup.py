@@ -0,0 +1,92 @@
+"""
+UIDAI Hackathon - Rollup Cube Check
+Compares every cube slice with a fresh group-by of the records and times both
+
+Usage:
+    python benchmarks/check_rollup.py --rows 1e6
+    python benchmarks/check_rollup.py --data-dir /data/uidai
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from uidai_analytics.discovery import discover_shards
+from uidai_analytics.hierarchy import LEVEL_KEYS
+from uidai_analytics.loader import DEMOGRAPHIC, ENROLMENT, aggregate_chunk, count_columns, load_dataset
+from uidai_analytics.rollup import build_rollup
+from uidai_analytics.synthetic import generate
+from uidai_analytics.trends import build_daily_cube
+
+# Every level, in total and per day
+QUERIES = [list(keys) for keys in LEVEL_KEYS.values()] + [['date'] + keys for keys in LEVEL_KEYS.values()]
+
+
+def canonical(frame, keys):
+    frame = frame.sort_values(keys).reset_index(drop=True)
+    labels = [key for key in keys if key != 'date']
+    frame[labels] = frame[labels].astype(str)
+    if 'date' in keys:
+        frame['date'] = frame['date'].astype('datetime64[ns]')
+    return frame
+
+
+def check(data_dir):
+    files = dict(zip((ENROLMENT, DEMOGRAPHIC), discover_shards(data_dir).split()))
+    ok = True
+    for dataset, paths in files.items():
+        frame = load_dataset(paths, dataset).dropna(subset=['state'])
+        value_cols = count_columns(dataset)
+
+        start = time.perf_counter()
+        cube = build_rollup(frame, dataset)
+        build_seconds = time.perf_counter() - start
+        print(f"{dataset}: {len(frame):,} rows -> {len(cube.cells['day']):,} leaf cells "
+              f"(build {build_seconds:.3f}s)")
+
+        for keys in QUERIES:
+            start = time.perf_counter()
+            reference = aggregate_chunk(frame.dropna(subset=keys), keys, value_cols).reset_index()
+            groupby_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            result = cube.table(keys)
+            slice_seconds = time.perf_counter() - start
+            same = canonical(reference, keys).equals(canonical(result, keys))
+            print(f"  {'/'.join(keys):<28} {len(result):>9,} rows  group-by {groupby_seconds:.4f}s  "
+                  f"cube {slice_seconds:.4f}s  {'identical' if same else 'DIFFERENT'}")
+            ok = ok and same
+
+        same = (cube.band_totals().to_numpy() == frame[value_cols].sum().to_numpy()).all()
+        print(f"  {'band totals':<28} {'identical' if same else 'DIFFERENT'}")
+        reference = build_daily_cube(frame, dataset, 'state')
+        daily_same = np.array_equal(reference.counts, cube.daily_cube('state').counts)
+        print(f"  {'daily state cube':<28} {'identical' if daily_same else 'DIFFERENT'}")
+        ok = ok and same and daily_same
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check rollup cube slices against group-bys")
+    parser.add_argument('--data-dir', default=None, help="Existing data root (default: generate)")
+    parser.add_argument('--rows', type=float, default=1e6, help="Synthetic rows to generate")
+    args = parser.parse_args()
+
+    if args.data_dir:
+        ok = check(args.data_dir)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            rows = int(args.rows)
+            generate(tmp, rows // 13, rows - rows // 13, geography_root=REPO_ROOT)
+            ok = check(tmp)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+UIDAI Hackathon - Stage Budget Check
+Replays the pipeline benchmark workload and fails when any stage's wall time or
+traced peak memory exceeds its budget in benchmarks/budget_pipeline.json
+
+Usage:
+    python benchmarks/check_stage_budget.py --rows 1e5 1e6
+    python benchmarks/check_stage_budget.py --rows 1e6 --profile-dir profiles   # profile stages over budget
+    python benchmarks/check_stage_budget.py --rows 1e5 1e6 --update-budget --headroom 0.5
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import warnings
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from bench_pipeline import NOISE_FLOOR_SECONDS, run_scale
+from uidai_analytics.metrics import MetricsRecorder
+from uidai_analytics.synthetic import generate
+
+DEFAULT_BUDGET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'budget_pipeline.json')
+
+# Traced peaks within this many bytes of the budget are not flagged
+NOISE_FLOOR_BYTES = 1_000_000
+
+
+def measure(data_dir, rows, workers, seed, repeat):
+    """
+    Per-stage {'wall_seconds', 'traced_peak_bytes'} of the workload on data_dir.
+
+    Wall time is the best of repeat untraced runs; memory comes from one
+    more run with tracemalloc on, which would distort the timings.
+    """
+    stages = {}
+    for _ in range(repeat):
+        for name, stage in run_scale(rows, workers, seed, data_dir)['stages'].items():
+            best = stages.setdefault(name, {}).get('wall_seconds')
+            if best is None or stage['wall_seconds'] < best:
+                stages[name]['wall_seconds'] = stage['wall_seconds']
+    traced = run_scale(rows, workers, seed, data_dir, metrics=MetricsRecorder(trace_memory=True))
+    for name, stage in traced['stages'].items():
+        stages[name]['traced_peak_bytes'] = stage['traced_peak_bytes']
+    return stages
+
+
+def over_budget(stages, budget):
+    """{stage: [messages]} of the stages past their budget."""
+    problems = {}
+    for name, stage in stages.items():
+        limit = budget.get(name)
+        if limit is None:
+            continue
+        now, allowed = stage['wall_seconds'], limit['wall_seconds']
+        if now > allowed and now - allowed > NOISE_FLOOR_SECONDS:
+            problems.setdefault(name, []).append(f"wall {now:.3f}s > budget {allowed:.3f}s")
+        now, allowed = stage['traced_peak_bytes'], limit['traced_peak_bytes']
+        if now > allowed and now - allowed > NOISE_FLOOR_BYTES:
+            problems.setdefault(name, []).append(
+                f"traced peak {now / 1e6:.1f} MB > budget {allowed / 1e6:.1f} MB")
+    return problems
+
+
+def new_budget(stages, headroom):
+    return {name: {'wall_seconds': round(stage['wall_seconds'] * (1 + headroom), 6),
+                   'traced_peak_bytes': int(stage['traced_peak_bytes'] * (1 + headroom))}
+            for name, stage in stages.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check every pipeline stage against its budget")
+    parser.add_argument('--rows', type=float, nargs='+', default=[1e5, 1e6],
+                        help="Total rows per scale (default: 1e5 1e6)")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per scale; best is kept")
+    parser.add_argument('--budget', default=DEFAULT_BUDGET)
+    parser.add_argument('--headroom', type=float, default=0.5,
+                        help="With --update-budget, budget = measured * (1 + headroom) (default: 0.5)")
+    parser.add_argument('--update-budget', action='store_true',
+                        help="Store budgets from this run instead of checking")
+    parser.add_argument('--profile-dir', default=None,
+                        help="Profile the stages over budget once more and write the profiles here")
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    budgets = {}
+    if os.path.exists(args.budget):
+        with open(args.budget) as f:
+            budgets = json.load(f)
+
+    failed = False
+    for rows in (int(rows) for rows in args.rows):
+        key = str(rows)
+        with tempfile.TemporaryDirectory() as tmp:
+            generate(tmp, rows // 13, rows - rows // 13, geography_root=REPO_ROOT, seed=args.seed)
+            stages = measure(tmp, rows, args.workers, args.seed, args.repeat)
+            budget = budgets.get(key, {}).get('stages', {})
+            problems = {} if args.update_budget else over_budget(stages, budget)
+
+            print(f"Rows: {rows:,}")
+            print(f"  {'Stage':<11} {'Wall s':>9} {'Budget s':>9} {'Traced MB':>10} {'Budget MB':>10}")
+            for name, stage in stages.items():
+                limit = budget.get(name, {})
+                wall_budget = f"{limit['wall_seconds']:.3f}" if limit else '-'
+                memory_budget = f"{limit['traced_peak_bytes'] / 1e6:.1f}" if limit else '-'
+                print(f"  {name:<11} {stage['wall_seconds']:>9.3f} {wall_budget:>9} "
+                      f"{stage['traced_peak_bytes'] / 1e6:>10.1f} {memory_budget:>10}"
+                      f"{'  OVER' if name in problems else ''}")
+            for name, messages in problems.items():
+                for message in messages:
+                    print(f"  OVER BUDGET {name}: {message}")
+            if not args.update_budget and not budget:
+                print(f"  No budget stored for {key} rows; run with --update-budget")
+
+            if problems and args.profile_dir:
+                profile_dir = os.path.join(args.profile_dir, key)
+                metrics = MetricsRecorder(profile_stages=problems, profile_dir=profile_dir)
+                run_scale(rows, args.workers, args.seed, tmp, metrics=metrics)
+                print(f"  Profiles of the stages over budget ({', '.join(problems)}):")
+                for path in metrics.profile_files:
+                    print(f"    {path}")
+            print()
+
+        failed = failed or bool(problems)
+        if args.update_budget:
+            budgets[key] = {'headroom': args.headroom, 'workers': args.workers,
+                            'cpu_count': os.cpu_count(), 'stages': new_budget(stages, args.headroom)}
+
+    if args.update_budget:
+        with open(args.budget, 'w') as f:
+            json.dump(budgets, f, indent=2)
+        print(f"Budget updated: {args.budget}")
+    elif failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
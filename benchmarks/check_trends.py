@@ -0,0 +1,111 @@
+"""
+UIDAI Hackathon - Trend Engine Check
+Checks that spikes after flat or all-zero baselines are flagged and that days
+a unit has no record on are gaps, not zero baselines that flag the day after them
+
+Usage:
+    python benchmarks/check_trends.py
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from uidai_analytics.loader import ENROLMENT, count_columns
+from uidai_analytics.trends import detect_trends, rolling_zscore
+
+WINDOW = 7
+THRESHOLD = 3.0
+
+# (name, daily counts, day that must be flagged)
+SPIKES = [
+    ('flat baseline', [5, 5, 5, 5, 5, 500], 5),
+    ('all-zero baseline', [0, 0, 0, 0, 0, 500], 5),
+    ('noisy baseline', [40, 55, 38, 61, 47, 52, 44, 400], 7),
+]
+
+# Days of the gapped series with no record at all, like 30-Nov..14-Dec and
+# 17/19-Dec in the shipped data, and days only Goa reports, like 15-Dec
+GAP_DAYS = set(range(30, 45)) | {47, 49}
+PARTIAL_DAYS = {45, 46, 48}
+N_DAYS = 70
+SPIKE_DAY = 62
+STATES = (('Uttar Pradesh', 3000), ('Bihar', 1200), ('Goa', 40))
+
+
+def gapped_records(seed=0):
+    """Daily records of three states with steady Poisson counts, data gaps and one real spike."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for state, rate in STATES:
+        days = [day for day in range(N_DAYS)
+                if day not in GAP_DAYS and (day not in PARTIAL_DAYS or state == 'Goa')]
+        counts = rng.poisson(rate, size=(len(days), 3))
+        for day, row in zip(days, counts):
+            if day == SPIKE_DAY and state == 'Bihar':
+                row = row * 4
+            rows.append([pd.Timestamp('2025-10-01') + pd.Timedelta(days=day), state, *row])
+    return pd.DataFrame(rows, columns=['date', 'state'] + count_columns(ENROLMENT))
+
+
+def check_gaps():
+    """No spike may follow a window of missing days; the real spike must still be found."""
+    result = detect_trends(gapped_records(), ENROLMENT, 'state', WINDOW, THRESHOLD)
+    ok = True
+
+    missing = ~result.cube.observed
+    expected_missing = np.zeros_like(missing)
+    expected_missing[sorted(GAP_DAYS)] = True
+    not_goa = np.flatnonzero(result.cube.units['state'].to_numpy() != 'Goa')
+    expected_missing[np.ix_(sorted(PARTIAL_DAYS), not_goa)] = True
+    same = np.array_equal(missing, expected_missing)
+    print(f"  record-less (day, state) cells marked as gaps: {int(missing.sum())}  "
+          f"{'ok' if same else 'WRONG'}")
+    ok = ok and same
+
+    scored = np.isfinite(result.zscore)
+    unscored_gaps = not scored[missing].any()
+    print(f"  gap cells scored: {int(scored[missing].sum())}  {'ok' if unscored_gaps else 'WRONG'}")
+    ok = ok and unscored_gaps
+
+    # Cells whose baseline window holds fewer than 3 recorded days must not be scored
+    observed = result.cube.observed
+    prior = np.array([observed[max(day - WINDOW, 0):day].sum(axis=0) for day in range(len(observed))])
+    thin = (prior < 3) & observed
+    after_gap = not scored[thin].any()
+    print(f"  cells after a gap with a thin baseline: {int(thin.sum())}, "
+          f"scored {int(scored[thin].sum())}  {'ok' if after_gap else 'WRONG'}")
+    ok = ok and after_gap
+
+    table = result.spike_table()
+    dates = set(table['date'])
+    expected = {result.cube.dates[SPIKE_DAY]}
+    only_real = dates == expected and list(table['state']) == ['Bihar']
+    print(f"  spikes: {len(table)} ({', '.join(f'{s} {d:%d-%m}' for s, d in zip(table['state'], table['date']))})"
+          f"  {'ok' if only_real else 'WRONG'}")
+    ok = ok and only_real
+    return ok
+
+
+def main():
+    ok = True
+    for name, counts, day in SPIKES:
+        z, _ = rolling_zscore(np.array(counts), WINDOW)
+        flagged = z[day] > THRESHOLD
+        print(f"  {name:<18} z on day {day}: {z[day]:>8.2f}  {'flagged' if flagged else 'MISSED'}")
+        ok = ok and flagged
+
+    ok = check_gaps() and ok
+
+    print(f"\nTrend check: {'OK' if ok else 'FAIL'}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+"""
+UIDAI Hackathon - Shared analytics package
+Common building blocks used by the trend and anomaly detection scripts
+"""
+
+from .loader import (
+    ENROLMENT,
+    DEMOGRAPHIC,
+    aggregate_files,
+    count_columns,
+    iter_chunks,
+    load_dataset,
+    read_shard,
+)
+from .discovery import DATA_DIRS, discover_shards
@@ -0,0 +1,57 @@
+"""
+UIDAI Hackathon - Ratio & Outlier Analysis
+State-level update-to-enrolment ratios and IQR outlier thresholds
+"""
+
+import numpy as np
+import pandas as pd
+
+from .loader import DEMOGRAPHIC, ENROLMENT, count_columns
+
+
+def state_totals(aggregate, dataset, column):
+    """Collapse a per-state aggregate of age bands into one total column."""
+    return pd.DataFrame({
+        'state': aggregate['state'],
+        column: aggregate[count_columns(dataset)].sum(axis=1),
+    })
+
+
+def build_merged_df(enrolment_agg, update_agg, how='inner'):
+    """
+    Merge per-state enrolment and update aggregates and compute Update_Ratio.
+
+    The result is sorted by ratio, highest first, exactly like the
+    merged_df of the advanced analysis script. With how='outer' (or
+    'left'/'right') states missing from one dataset are kept with a count
+    of 0; their ratio is NaN when there are no enrolments.
+    """
+    enrolment_by_state = state_totals(enrolment_agg, ENROLMENT, 'Enrolment_Count')
+    update_by_state = state_totals(update_agg, DEMOGRAPHIC, 'Update_Count')
+
+    merged_df = pd.merge(enrolment_by_state, update_by_state, on='state', how=how)
+    if how != 'inner':
+        counts = ['Enrolment_Count', 'Update_Count']
+        merged_df[counts] = merged_df[counts].fillna(0).astype(np.int64)
+    merged_df['Update_Ratio'] = merged_df['Update_Count'] / merged_df['Enrolment_Count']
+    if how != 'inner':
+        merged_df['Update_Ratio'] = merged_df['Update_Ratio'].where(merged_df['Enrolment_Count'] > 0)
+    return merged_df.sort_values('Update_Ratio', ascending=False).reset_index(drop=True)
+
+
+def iqr_bounds(values, k=1.5):
+    """Return (Q1, Q3, IQR, lower_bound, upper_bound) of a series."""
+    values = pd.Series(values)
+    q1 = values.quantile(0.25)
+    q3 = values.quantile(0.75)
+    iqr = q3 - q1
+    return q1, q3, iqr, q1 - k * iqr, q3 + k * iqr
+
+
+def minmax_normalize(frame):
+    """Scale every column of a frame to 0-1; constant columns become 0."""
+    values = frame.to_numpy(np.float64)
+    low = values.min(axis=0)
+    span = values.max(axis=0) - low
+    span[span == 0] = 1
+    return pd.DataFrame((values - low) / span, index=frame.index, columns=frame.columns)
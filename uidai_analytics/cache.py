@@ -0,0 +1,126 @@
+"""
+UIDAI Hackathon - Parsed Shard Cache
+Stores parsed shards as Arrow IPC files keyed by path, size and mtime
+"""
+
+import hashlib
+import os
+
+from .loader import DEFAULT_CHUNKSIZE, detect_dataset, read_shard
+
+CACHE_VERSION = 1
+DEFAULT_BUDGET_MB = 2048
+CACHE_SUFFIX = '.arrow'
+
+
+def _pyarrow():
+    """Import pyarrow on first use, so runs without a cache never pay for it."""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError:  # pragma: no cover - optional dependency
+        raise ImportError("pyarrow is required for the shard cache (pip install pyarrow)")
+    return pyarrow
+
+
+def shard_fingerprint(path):
+    """Key identifying one immutable version of a shard file."""
+    stat = os.stat(path)
+    raw = f"{CACHE_VERSION}|{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class ShardCache:
+    """
+    Persistent on-disk cache of parsed shards.
+
+    Each shard is written once as an Arrow IPC file and later opened
+    memory-mapped, so only new or changed shards are parsed from CSV. The
+    total size of the cache is kept under max_bytes by evicting the least
+    recently used entries.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_BUDGET_MB * 1024 * 1024):
+        _pyarrow()
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def entry_path(self, path):
+        return os.path.join(self.cache_dir, shard_fingerprint(path) + CACHE_SUFFIX)
+
+    def get(self, path, usecols=None):
+        """Return the cached frame for path, or None when it is not cached."""
+        pa = _pyarrow()
+        entry = self.entry_path(path)
+        try:
+            source = pa.memory_map(entry, 'r')
+        except FileNotFoundError:
+            return None
+        table = pa.ipc.open_file(source).read_all()
+        if usecols is not None:
+            table = table.select(list(usecols))
+        # Touch the entry so eviction sees it as recently used
+        os.utime(entry)
+        return table.to_pandas()
+
+    def put(self, path, frame):
+        """Write a parsed shard to the cache and enforce the disk budget."""
+        pa = _pyarrow()
+        entry = self.entry_path(path)
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        tmp_path = f"{entry}.{os.getpid()}.tmp"
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        # Atomic rename so concurrent readers never see a partial file
+        os.replace(tmp_path, entry)
+        self.evict()
+
+    def read_shard(self, path, dataset=None, usecols=None, chunksize=DEFAULT_CHUNKSIZE):
+        """Load a shard from the cache, parsing and caching it on a miss."""
+        frame = self.get(path, usecols)
+        if frame is not None:
+            self.hits += 1
+            return frame
+        self.misses += 1
+        frame = read_shard(path, dataset or detect_dataset(path), chunksize=chunksize)
+        self.put(path, frame)
+        if usecols is not None:
+            frame = frame[list(usecols)]
+        return frame
+
+    def entries(self):
+        """Return (path, size, last_used) for every cache entry."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            full_path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(full_path)
+            except FileNotFoundError:
+                continue
+            entries.append((full_path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits the budget."""
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for full_path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(full_path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
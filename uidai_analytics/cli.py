@@ -0,0 +1,308 @@
+"""
+UIDAI Hackathon - Command Line Interface
+uidai-analytics run | ingest | query | join | stream | serve | distributed | synth
+"""
+
+import argparse
+import importlib
+import math
+import os
+import sys
+import warnings
+
+import pandas as pd
+
+from .cache import DEFAULT_BUDGET_MB, ShardCache
+from .detectors import DETECTORS, detector_list
+from .discovery import discover_shards, record_range
+from .export import REPORT_FORMATS, report_formats
+from .join import (JOIN_TYPES, cells_from_files, cells_from_store, join_cells, join_summary,
+                   lagged_join)
+from .loader import DEMOGRAPHIC, ENROLMENT
+from .metrics import MetricsRecorder
+from .outofcore import DEFAULT_BUDGET_MB as DEFAULT_MEMORY_MB
+from .pipeline import STAGES, run_pipeline, stage_list
+from .profiling import PROFILE_MODES
+from .recordstore import RecordStore
+from .rendering import FORMATS
+from .sqlstore import RATIO_VIEWS, AnalyticsDB
+from .validation import Validator, quality_lines
+
+
+def add_run_parser(subparsers):
+    parser = subparsers.add_parser('run', help="Run the staged analysis pipeline",
+                                   description="discover -> load -> clean -> aggregate -> "
+                                               "score -> render -> report")
+    parser.add_argument('--root', default='.', help="Directory holding the data folders")
+    parser.add_argument('--manifest', default=None,
+                        help="Shard manifest (.json or one path per line) instead of the data folders")
+    parser.add_argument('--glob', dest='patterns', action='append', default=None,
+                        help="Glob pattern of shard files (repeatable) instead of the data folders")
+    parser.add_argument('--id-range', type=record_range, default=None, metavar='START:END',
+                        help="Only read shards whose record-ID range intersects [START, END)")
+    parser.add_argument('--output-dir', default='output_visualizations',
+                        help="Directory for charts and the metrics file")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes for shard parsing (default: 1)")
+    parser.add_argument('--render-workers', type=int, default=None,
+                        help="Processes drawing charts (default: one per chart, up to the CPU count)")
+    parser.add_argument('--cache-dir', default=None,
+                        help="Directory for the parsed-shard cache (Arrow IPC); disabled if not set")
+    parser.add_argument('--cache-budget-mb', type=int, default=DEFAULT_BUDGET_MB,
+                        help=f"Disk budget of the shard cache in MB (default: {DEFAULT_BUDGET_MB})")
+    parser.add_argument('--out-of-core', action='store_true',
+                        help="Skip load/clean and aggregate through a spilling hash-partitioned group-by")
+    parser.add_argument('--memory-budget-mb', type=int, default=DEFAULT_MEMORY_MB,
+                        help=f"Memory budget of the out-of-core group-by in MB (default: {DEFAULT_MEMORY_MB})")
+    parser.add_argument('--spill-dir', default=None,
+                        help="Directory for out-of-core spill files (default: system temp)")
+    parser.add_argument('--dpi', type=int, default=300, help="Resolution of PNG charts (default: 300)")
+    parser.add_argument('--format', choices=FORMATS, default='png',
+                        help="Chart format: png, svg or draft (100-DPI PNG previews)")
+    parser.add_argument('--force-render', action='store_true',
+                        help="Redraw every chart even if its input data is unchanged")
+    parser.add_argument('--detectors', type=detector_list, default=None,
+                        help="Comma-separated detectors to run in the score stage, or 'all' "
+                             f"({', '.join(DETECTORS)})")
+    parser.add_argument('--merge', choices=JOIN_TYPES, default='inner',
+                        help="States that get a ratio: inner (in both datasets, default), left "
+                             "(every enrolment state), right (every update state) or outer (either); "
+                             "a dataset without the state counts 0")
+    parser.add_argument('--no-plots', action='store_true',
+                        help="Skip the render stage; matplotlib is never imported")
+    parser.add_argument('--report-dir', default=None,
+                        help="Write the findings as anomaly_report.json and anomaly_units.parquet here")
+    parser.add_argument('--report-format', type=report_formats, default=list(REPORT_FORMATS),
+                        help="Report files to write: json, parquet or json,parquet (default: both)")
+    parser.add_argument('--quarantine-dir', default=None,
+                        help="Validate records while loading; rejected ones and per-shard "
+                             "quality summaries are written here")
+    parser.add_argument('--stop-after', choices=STAGES, default='report',
+                        help="Last stage to run (default: report)")
+    parser.add_argument('--metrics', default=None,
+                        help="Path of the JSON stage metrics (default: <output-dir>/pipeline_metrics.json)")
+    parser.add_argument('--profile', type=stage_list, default=[], metavar='STAGES',
+                        help="Profile these stages (comma-separated, or 'all'): CPU and tracemalloc "
+                             "output goes to --profile-dir; use with --workers 1")
+    parser.add_argument('--profile-dir', default='profiles',
+                        help="Directory of the profile files (default: profiles)")
+    parser.add_argument('--profile-mode', choices=PROFILE_MODES, default='sample',
+                        help="sample: flame-graph stacks (<stage>.collapsed); "
+                             "cprofile: deterministic pstats (<stage>.prof)")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="Record the tracemalloc peak of every stage in the metrics")
+    parser.add_argument('--verbose', action='store_true', help="List every shard as it is loaded")
+    parser.set_defaults(func=run_command)
+
+
+def run_command(args):
+    warnings.filterwarnings('ignore')
+    print("="*70)
+    print("UIDAI HACKATHON - ANALYTICS PIPELINE")
+    print("="*70)
+
+    cache = None
+    if args.cache_dir:
+        cache = ShardCache(args.cache_dir, max_bytes=args.cache_budget_mb * 1024 * 1024)
+        print(f"Using shard cache: {args.cache_dir}")
+
+    metrics = MetricsRecorder(trace_memory=args.trace_memory, profile_stages=args.profile,
+                              profile_dir=args.profile_dir, profile_mode=args.profile_mode)
+    results, metrics = run_pipeline(root=args.root, output_dir=args.output_dir,
+                                    workers=args.workers, cache=cache, fmt=args.format,
+                                    dpi=args.dpi, force=args.force_render,
+                                    stop_after=args.stop_after, metrics=metrics, verbose=args.verbose,
+                                    manifest=args.manifest, patterns=args.patterns,
+                                    memory_budget_mb=args.memory_budget_mb if args.out_of_core else None,
+                                    spill_dir=args.spill_dir, detectors=args.detectors,
+                                    plots=not args.no_plots, report_dir=args.report_dir,
+                                    report_formats=args.report_format,
+                                    quarantine_dir=args.quarantine_dir, id_range=args.id_range,
+                                    merge=args.merge, render_workers=args.render_workers)
+
+    metrics_path = args.metrics or os.path.join(args.output_dir, 'pipeline_metrics.json')
+    metrics.write(metrics_path)
+    print("\n⏱  STAGE METRICS:")
+    for line in metrics.summary_lines():
+        print(f"  {line}")
+    print(f"\nMetrics written to: {metrics_path}")
+    if metrics.profile_files:
+        print("Profiles:")
+        for path in metrics.profile_files:
+            print(f"  {path}")
+    return 0
+
+
+def add_db_parsers(subparsers):
+    parser = subparsers.add_parser('ingest', help="Load new shards into the SQLite analytical store")
+    parser.add_argument('--db', required=True, help="Path of the SQLite database file")
+    parser.add_argument('--root', default='.', help="Directory holding the data folders")
+    parser.add_argument('--manifest', default=None,
+                        help="Shard manifest (.json or one path per line) instead of the data folders")
+    parser.add_argument('--glob', dest='patterns', action='append', default=None,
+                        help="Glob pattern of shard files (repeatable) instead of the data folders")
+    parser.add_argument('--quarantine-dir', default=None,
+                        help="Validate records before storing them; rejected ones and per-shard "
+                             "quality summaries are written here")
+    parser.add_argument('--verbose', action='store_true', help="List every shard as it is ingested")
+    parser.set_defaults(func=ingest_command)
+
+    parser = subparsers.add_parser('query', help="Run SQL or a canned query against the store",
+                                   description="Tables: enrolment, demographic, shards. "
+                                               "Views: " + ', '.join(view for view, _ in
+                                                                     RATIO_VIEWS.values()))
+    parser.add_argument('--db', required=True, help="Path of the SQLite database file")
+    parser.add_argument('sql', nargs='?', default=None, help="SELECT statement to run")
+    parser.add_argument('--ratios', choices=list(RATIO_VIEWS), default=None,
+                        help="Update ratios of every unit of a level, highest first")
+    parser.add_argument('--thresholds', choices=list(RATIO_VIEWS), default=None,
+                        help="IQR thresholds of the update ratios of a level")
+    parser.add_argument('--outliers', choices=list(RATIO_VIEWS), default=None,
+                        help="Units of a level above the upper IQR threshold")
+    parser.add_argument('--k', type=float, default=1.5, help="IQR fence multiplier (default: 1.5)")
+    parser.add_argument('--limit', type=int, default=50, help="Rows to print (default: 50)")
+    parser.set_defaults(func=query_command)
+
+
+def ingest_command(args):
+    discovery = discover_shards(args.root, args.manifest, args.patterns)
+    for line in discovery.report_lines():
+        print(f"Warning: {line}")
+    enrolment_files, demographic_files = discovery.split()
+    validator = None
+    if args.quarantine_dir:
+        validator = Validator.for_discovery(discovery, args.quarantine_dir)
+    with AnalyticsDB(args.db) as db:
+        pending = db.pending(enrolment_files, ENROLMENT) + db.pending(demographic_files, DEMOGRAPHIC)
+        ingested = db.ingest(enrolment_files, demographic_files, verbose=args.verbose,
+                             validator=validator)
+        print(f"New shards ingested: {ingested}")
+        if validator is not None and pending:
+            for line in quality_lines(validator.report(pending)):
+                print(line)
+        print(f"Records in {args.db}: {db.row_count(ENROLMENT):,} enrolment, "
+              f"{db.row_count(DEMOGRAPHIC):,} update")
+    return 0
+
+
+def query_command(args):
+    if not os.path.exists(args.db):
+        print(f"No database at {args.db}; run 'uidai-analytics ingest --db {args.db}' first")
+        return 1
+    with AnalyticsDB(args.db) as db:
+        if args.thresholds:
+            thresholds = db.thresholds(args.thresholds, args.k)
+            if all(math.isnan(value) for value in thresholds.values()):
+                print(f"No {args.thresholds} ratios in {args.db} yet; ingest both datasets first")
+                return 1
+            for key, value in thresholds.items():
+                print(f"{key:<12} {value:.4f}")
+            return 0
+        if args.ratios:
+            result = db.ratios(args.ratios)
+        elif args.outliers:
+            result = db.outliers(args.outliers, args.k)
+        elif args.sql:
+            try:
+                result = db.query(args.sql)
+            except pd.errors.DatabaseError as error:
+                print(f"Query failed: {error}")
+                return 1
+        else:
+            print("Nothing to run: give a SELECT statement, --ratios, --thresholds or --outliers")
+            return 2
+    print(result.head(args.limit).to_string(index=False))
+    if len(result) > args.limit:
+        print(f"... {len(result) - args.limit:,} more rows")
+    return 0
+
+
+def add_join_parser(subparsers):
+    parser = subparsers.add_parser('join', help="Join enrolments and updates per (pincode, date) or week",
+                                   description="Sort-merge join of both datasets on integer "
+                                               "(pincode, period) keys")
+    parser.add_argument('--root', default='.', help="Directory holding the data folders")
+    parser.add_argument('--manifest', default=None,
+                        help="Shard manifest (.json or one path per line) instead of the data folders")
+    parser.add_argument('--glob', dest='patterns', action='append', default=None,
+                        help="Glob pattern of shard files (repeatable) instead of the data folders")
+    parser.add_argument('--record-store', default=None,
+                        help="Read a record store built with --record-store instead of the CSV shards")
+    parser.add_argument('--how', choices=JOIN_TYPES, default='outer',
+                        help="Cells to keep: inner (in both), left (enrolment), right (update) "
+                             "or outer (either; default)")
+    parser.add_argument('--weekly', action='store_true', help="Join per (pincode, week) instead of day")
+    parser.add_argument('--lag-weeks', type=int, default=None,
+                        help="Updates in week t against enrolments in weeks t-k..t (implies --weekly)")
+    parser.add_argument('--output', default=None, help="Write the joined cells here (.parquet or .csv)")
+    parser.add_argument('--top', type=int, default=20,
+                        help="Cells with the highest update ratio to print (default: 20)")
+    parser.set_defaults(func=join_command)
+
+
+def join_command(args):
+    if args.record_store:
+        store = RecordStore(args.record_store)
+        cells = [cells_from_store(store, dataset) for dataset in (ENROLMENT, DEMOGRAPHIC)]
+    else:
+        discovery = discover_shards(args.root, args.manifest, args.patterns)
+        for line in discovery.report_lines():
+            print(f"Warning: {line}")
+        cells = [cells_from_files(files, dataset)
+                 for files, dataset in zip(discovery.split(), (ENROLMENT, DEMOGRAPHIC))]
+    enrolment, update = cells
+    print(f"Cells: {len(enrolment):,} enrolment, {len(update):,} update (pincode, date)")
+
+    if args.lag_weeks is not None:
+        joined = lagged_join(enrolment, update, args.lag_weeks, args.how)
+        print(f"Lagged join ({args.how}): updates in week t vs enrolments in weeks t-{args.lag_weeks}..t")
+    else:
+        if args.weekly:
+            enrolment, update = enrolment.to_weeks(), update.to_weeks()
+        joined = join_cells(enrolment, update, args.how)
+        print(f"Join ({args.how}) per (pincode, {'week' if args.weekly else 'date'})")
+    for label, count in join_summary(joined).items():
+        print(f"  {label:<15} {count:>12,}")
+
+    if args.output:
+        if args.output.endswith('.parquet'):
+            joined.to_parquet(args.output, index=False)
+        else:
+            joined.to_csv(args.output, index=False)
+        print(f"Joined cells written to: {args.output}")
+    top = joined.dropna(subset=['Update_Ratio']).nlargest(args.top, 'Update_Ratio')
+    if len(top):
+        columns = [col for col in ('pincode', 'date', 'week', 'Enrolment_Count', 'Update_Count',
+                                   'Update_Ratio') if col in top]
+        print("\nHighest update ratios:")
+        print(top[columns].to_string(index=False))
+    return 0
+
+
+# Subcommands that keep their own argument parser: name -> (module, help)
+DELEGATED = {
+    'stream': ('streaming', "Streaming update-ratio alerts (see 'stream --help')"),
+    'serve': ('service', "HTTP query service over in-memory aggregates (see 'serve --help')"),
+    'distributed': ('distributed', "Coordinator and workers of a multi-host run "
+                                   "(see 'distributed --help')"),
+    'synth': ('synthetic', "Generate synthetic shards for benchmarking (see 'synth --help')"),
+}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    parser = argparse.ArgumentParser(prog='uidai-analytics',
+                                     description="UIDAI enrolment and update analytics")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    add_run_parser(subparsers)
+    add_db_parsers(subparsers)
+    add_join_parser(subparsers)
+    for name, (_, help_text) in DELEGATED.items():
+        subparsers.add_parser(name, add_help=False, help=help_text)
+
+    if argv and argv[0] in DELEGATED:
+        module = importlib.import_module(f".{DELEGATED[argv[0]][0]}", __package__)
+        return module.main(argv[1:])
+
+    args = parser.parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,363 @@
+"""
+UIDAI Hackathon - Anomaly Detector Suite
+Pluggable detectors that score every unit of a hierarchy level in one batched NumPy pass
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from .hierarchy import LEVEL_KEYS, MAD_SCALE, iqr_fence, robust_z
+from .loader import DEMOGRAPHIC, ENROLMENT, count_columns
+
+# Euler-Mascheroni constant, for the average path length of an isolation tree
+EULER_GAMMA = 0.5772156649
+
+
+class UnitCounts:
+    """
+    Inputs shared by every detector at one level: one row per unit.
+
+    enrolment_bands and update_bands are (units, bands) count arrays;
+    daily is an optional (days, units) array of update totals. A unit
+    present in only one dataset has counts of zero for the other and no
+    ratio, as in score_hierarchy.
+    """
+
+    def __init__(self, level, units, enrolment_bands, update_bands, in_enrolment, in_update,
+                 daily=None, dates=None):
+        self.level = level
+        self.units = units
+        self.enrolment_bands = enrolment_bands
+        self.update_bands = update_bands
+        self.enrolment = enrolment_bands.sum(axis=1)
+        self.update = update_bands.sum(axis=1)
+        self.valid = in_enrolment & in_update & (self.enrolment > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.ratio = np.where(self.valid, self.update / self.enrolment, np.nan)
+        self.daily = daily
+        self.dates = dates
+
+    def __len__(self):
+        return len(self.units)
+
+
+def unit_counts(enrolment_table, update_table, level, daily_table=None):
+    """
+    Align the enrolment and update aggregates of a level into UnitCounts.
+
+    The tables are keyed by LEVEL_KEYS[level] with the dataset count
+    columns (aggregate_levels, AggregateStore, RollupCube.table and
+    AnalyticsDB.level_table all produce them); daily_table is the update
+    aggregate by ['date'] + keys.
+    """
+    keys = LEVEL_KEYS[level]
+    enrolment_cols = count_columns(ENROLMENT)
+    update_cols = count_columns(DEMOGRAPHIC)
+    left = enrolment_table[keys + enrolment_cols].copy()
+    right = update_table[keys + update_cols].copy()
+    for frame in (left, right):
+        for key in keys:
+            frame[key] = frame[key].astype(np.int64 if key == 'pincode' else str)
+    merged = pd.merge(left, right, on=keys, how='outer', indicator=True, sort=True)
+    in_enrolment = merged['_merge'].isin(['both', 'left_only']).to_numpy()
+    in_update = merged['_merge'].isin(['both', 'right_only']).to_numpy()
+    merged[enrolment_cols + update_cols] = merged[enrolment_cols + update_cols].fillna(0)
+
+    daily = dates = None
+    if daily_table is not None and len(daily_table):
+        day_frame = daily_table[['date'] + keys].copy()
+        for key in keys:
+            day_frame[key] = day_frame[key].astype(np.int64 if key == 'pincode' else str)
+        unit_index = pd.MultiIndex.from_frame(merged[keys])
+        unit = unit_index.get_indexer(pd.MultiIndex.from_frame(day_frame[keys]))
+        day_numbers = day_frame['date'].to_numpy('datetime64[D]').astype(np.int64)
+        first = day_numbers.min()
+        n_days = int(day_numbers.max() - first) + 1
+        dates = pd.date_range(pd.Timestamp(np.datetime64(int(first), 'D')), periods=n_days, freq='D')
+        known = unit >= 0
+        flat = (day_numbers[known] - first) * len(merged) + unit[known]
+        totals = daily_table[update_cols].to_numpy(np.float64).sum(axis=1)[known]
+        daily = np.bincount(flat, weights=totals, minlength=n_days * len(merged)).reshape(
+            n_days, len(merged))
+
+    return UnitCounts(level, merged[keys], merged[enrolment_cols].to_numpy(np.float64),
+                      merged[update_cols].to_numpy(np.float64), in_enrolment, in_update,
+                      daily, dates)
+
+
+# ---------------------------------------------------------------------------
+# Detectors: each takes UnitCounts and returns (score, flagged) arrays with
+# one entry per unit; units a detector cannot score get NaN and False, and a
+# detector returns None when it cannot score the level at all
+# ---------------------------------------------------------------------------
+
+def detect_iqr(data, k=1.5):
+    """The original rule: Update_Ratio above Q3 + k * IQR."""
+    upper = iqr_fence(data.ratio, k)[4]
+    return data.ratio, data.ratio > upper
+
+
+def detect_mad(data, z_threshold=3.5):
+    """Robust z-score of the ratio (median/MAD), flagged in either direction."""
+    z = robust_z(data.ratio)
+    return z, np.abs(np.nan_to_num(z)) > z_threshold
+
+
+def _deviance_residuals(observed, expected, theta=np.inf):
+    """Signed deviance residuals of counts under Poisson (theta=inf) or negative binomial."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        term = np.where(observed > 0, observed * np.log(observed / expected), 0.0)
+        if np.isinf(theta):
+            deviance = 2 * (term - (observed - expected))
+        else:
+            deviance = 2 * (term - (observed + theta) * np.log((observed + theta) / (expected + theta)))
+    return np.sign(observed - expected) * np.sqrt(np.maximum(deviance, 0))
+
+
+def _expected_updates(data):
+    """Updates expected from each unit's enrolments at the pooled national rate."""
+    rate = data.update[data.valid].sum() / data.enrolment[data.valid].sum()
+    return data.enrolment * rate
+
+
+def detect_poisson(data, z_threshold=3.0):
+    """
+    Excess updates against a Poisson count model.
+
+    A unit with few enrolments needs a much larger excess to be flagged
+    than its raw ratio suggests, since its expected count is small.
+    """
+    expected = _expected_updates(data)
+    residual = np.where(data.valid, _deviance_residuals(data.update, expected), np.nan)
+    return residual, np.nan_to_num(residual) > z_threshold
+
+
+def nb_dispersion(observed, expected):
+    """Method-of-moments negative-binomial theta (inf when there is no overdispersion)."""
+    excess = ((observed - expected) ** 2 - expected).sum()
+    return (expected ** 2).sum() / excess if excess > 0 else np.inf
+
+
+def detect_negbin(data, z_threshold=3.0):
+    """Excess updates against a negative-binomial model with dispersion fitted to all units."""
+    expected = _expected_updates(data)
+    theta = nb_dispersion(data.update[data.valid], expected[data.valid])
+    residual = np.where(data.valid, _deviance_residuals(data.update, expected, theta), np.nan)
+    return residual, np.nan_to_num(residual) > z_threshold
+
+
+def seasonal_residuals(daily, period=7):
+    """
+    Residuals of an additive trend + weekly-seasonal decomposition, per column.
+
+    The trend is a centred moving average over period days (shorter at the
+    edges) and the seasonal term the mean detrended value of each weekday.
+    """
+    n_days = len(daily)
+    cumsum = np.concatenate([np.zeros((1, daily.shape[1])), np.cumsum(daily, axis=0)])
+    half = period // 2
+    start = np.maximum(np.arange(n_days) - half, 0)
+    end = np.minimum(np.arange(n_days) + half + 1, n_days)
+    trend = (cumsum[end] - cumsum[start]) / (end - start)[:, np.newaxis]
+    detrended = daily - trend
+    seasonal = np.stack([detrended[phase::period].mean(axis=0) for phase in range(min(period, n_days))])
+    seasonal -= seasonal.mean(axis=0)
+    return detrended - seasonal[np.arange(n_days) % len(seasonal)]
+
+
+def detect_seasonal(data, z_threshold=5.0, period=7, min_active_days=14):
+    """
+    Largest daily residual after removing trend and weekday pattern, in robust SDs.
+
+    The scale is the residuals' MAD, but never below the Poisson noise
+    sqrt(mean daily count), so sparse series with a few busy days are not
+    all flagged. Units active on fewer than min_active_days days are not
+    scored, and neither is a level without a daily series of at least two
+    periods.
+    """
+    if data.daily is None or len(data.daily) < 2 * period:
+        return None
+    nan = np.full(len(data), np.nan)
+    residual = seasonal_residuals(data.daily, period)
+    median = np.median(residual, axis=0)
+    mad = np.median(np.abs(residual - median), axis=0) / MAD_SCALE
+    scale = np.maximum(mad, np.sqrt(data.daily.mean(axis=0)))
+    scored = ((data.daily > 0).sum(axis=0) >= min_active_days) & (scale > 0)
+    score = nan
+    score[scored] = ((residual[:, scored] - median[scored]) / scale[scored]).max(axis=0)
+    return score, np.nan_to_num(score) > z_threshold
+
+
+def band_mix_features(data):
+    """Age-band shares of updates and enrolments plus the log ratio, one row per unit."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        update_mix = data.update_bands / data.update[:, np.newaxis]
+        enrolment_mix = data.enrolment_bands / data.enrolment[:, np.newaxis]
+    return np.column_stack([update_mix, enrolment_mix, np.log1p(data.ratio)])
+
+
+def _average_path(n):
+    """Average unsuccessful-search path length c(n) of a binary search tree of n points."""
+    n = np.asarray(n, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        c = 2 * (np.log(n - 1) + EULER_GAMMA) - 2 * (n - 1) / n
+    return np.where(n > 2, c, np.where(n == 2, 1.0, 0.0))
+
+
+def grow_isolation_forest(X, n_trees=100, sample_size=256, seed=0):
+    """
+    Random isolation trees over the rows of X, flattened into node arrays.
+
+    Returns (feature, threshold, left, right, size, roots, depth_limit);
+    leaves have feature -1 and size holds the points that reached them.
+    """
+    rng = np.random.default_rng(seed)
+    sample_size = min(sample_size, len(X))
+    depth_limit = int(np.ceil(np.log2(max(sample_size, 2))))
+    nodes = []  # [feature, threshold, left, right, size]
+    roots = []
+    for _ in range(n_trees):
+        roots.append(len(nodes))
+        nodes.append([-1, 0.0, -1, -1, 0])
+        stack = [(rng.choice(len(X), sample_size, replace=False), 0, roots[-1])]
+        while stack:
+            rows, depth, node = stack.pop()
+            nodes[node][4] = len(rows)
+            if depth >= depth_limit or len(rows) <= 1:
+                continue
+            points = X[rows]
+            low, high = points.min(axis=0), points.max(axis=0)
+            splittable = np.flatnonzero(high > low)
+            if not len(splittable):
+                continue
+            f = rng.choice(splittable)
+            cut = rng.uniform(low[f], high[f])
+            nodes[node][:4] = [f, cut, len(nodes), len(nodes) + 1]
+            nodes += [[-1, 0.0, -1, -1, 0], [-1, 0.0, -1, -1, 0]]
+            stack.append((rows[points[:, f] < cut], depth + 1, nodes[node][2]))
+            stack.append((rows[points[:, f] >= cut], depth + 1, nodes[node][3]))
+    columns = list(zip(*nodes))
+    feature, left, right, size = (np.array(columns[i], dtype=np.int64) for i in (0, 2, 3, 4))
+    return feature, np.array(columns[1]), left, right, size, np.array(roots), depth_limit
+
+
+def isolation_scores(X, forest, sample_size, block=65536):
+    """Anomaly score 2^(-E[h(x)] / c(sample_size)) of every row, all trees at once."""
+    feature, threshold, left, right, size, roots, depth_limit = forest
+    scores = np.empty(len(X))
+    for begin in range(0, len(X), block):
+        points = X[begin:begin + block]
+        node = np.repeat(roots[:, np.newaxis], len(points), axis=1)
+        depth = np.zeros(node.shape)
+        columns = np.arange(len(points))
+        for _ in range(depth_limit):
+            internal = feature[node] >= 0
+            values = points[columns, np.maximum(feature[node], 0)]
+            step = np.where(values < threshold[node], left[node], right[node])
+            node = np.where(internal, step, node)
+            depth += internal
+        path = depth + _average_path(size[node])
+        scores[begin:begin + block] = 2 ** (-path.mean(axis=0) / _average_path(sample_size))
+    return scores
+
+
+def detect_isolation(data, threshold=0.6, n_trees=100, sample_size=256, seed=0):
+    """Isolation-forest score of each unit's age-band mix; higher is more isolated."""
+    X = band_mix_features(data)
+    usable = np.isfinite(X).all(axis=1)
+    score = np.full(len(data), np.nan)
+    if usable.sum() > 1:
+        sample_size = min(sample_size, int(usable.sum()))
+        forest = grow_isolation_forest(X[usable], n_trees, sample_size, seed)
+        score[usable] = isolation_scores(X[usable], forest, sample_size)
+    return score, np.nan_to_num(score) > threshold
+
+
+# Registered detectors: name -> (function, description). Add an entry to
+# make a detector available to run_detectors, the scripts and the benchmark.
+DETECTORS = {
+    'iqr': (detect_iqr, "Update_Ratio above Q3 + 1.5 IQR"),
+    'mad': (detect_mad, "Robust z-score (median/MAD) of the ratio"),
+    'poisson': (detect_poisson, "Poisson deviance residual of update counts"),
+    'negbin': (detect_negbin, "Negative-binomial deviance residual (fitted dispersion)"),
+    'seasonal': (detect_seasonal, "Daily residual after trend + weekday decomposition"),
+    'isolation': (detect_isolation, "Isolation forest over age-band mixes"),
+}
+
+
+def detector_list(text):
+    """Parse a comma-separated list of detector names ('all' for every one), e.g. for argparse."""
+    if text.strip() == 'all':
+        return list(DETECTORS)
+    names = [name.strip() for name in text.split(',') if name.strip()]
+    unknown = [name for name in names if name not in DETECTORS]
+    if unknown:
+        raise ValueError(f"Unknown detector(s) {', '.join(unknown)}; "
+                         f"expected any of {', '.join(DETECTORS)}")
+    return names
+
+
+class DetectionResult:
+    """
+    Scores and flags of several detectors for the units of one level.
+
+    Detectors in not_scored could not score the level; they have no
+    columns in table and a count of None.
+    """
+
+    def __init__(self, level, table, seconds, not_scored=()):
+        self.level = level
+        self.table = table
+        self.seconds = seconds
+        self.not_scored = list(not_scored)
+
+    def flagged(self, name):
+        if name in self.not_scored:
+            return self.table.iloc[:0]
+        return self.table[self.table[f'{name}_flag']]
+
+    def counts(self):
+        """Number of units flagged by each detector (None if it could not score the level)."""
+        return {name: None if name in self.not_scored else int(self.table[f'{name}_flag'].sum())
+                for name in self.seconds}
+
+    def flag_line(self):
+        """'iqr 3, seasonal not scored, ...' for progress output."""
+        return ', '.join(f"{name} {'not scored' if count is None else f'{count:,}'}"
+                         for name, count in self.counts().items())
+
+    def summary(self):
+        """Units flagged and time taken by each detector."""
+        return pd.DataFrame({'detector': list(self.seconds), 'flagged': list(self.counts().values()),
+                             'seconds': list(self.seconds.values())})
+
+
+def run_detectors(data, names=None, params=None):
+    """
+    Run registered detectors on UnitCounts.
+
+    names defaults to every entry of DETECTORS; params maps a detector
+    name to keyword arguments for it.
+    """
+    names = list(names or DETECTORS)
+    params = params or {}
+    table = data.units.copy()
+    table['Enrolment_Count'] = data.enrolment.astype(np.int64)
+    table['Update_Count'] = data.update.astype(np.int64)
+    table['Update_Ratio'] = data.ratio
+    seconds = {}
+    not_scored = []
+    for name in names:
+        if name not in DETECTORS:
+            raise ValueError(f"Unknown detector {name!r}; expected one of {', '.join(DETECTORS)}")
+        detector = DETECTORS[name][0]
+        start = time.perf_counter()
+        result = detector(data, **params.get(name, {}))
+        seconds[name] = time.perf_counter() - start
+        if result is None:
+            not_scored.append(name)
+            continue
+        table[f'{name}_score'], table[f'{name}_flag'] = result
+    return DetectionResult(data.level, table, seconds, not_scored)
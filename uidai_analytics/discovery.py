@@ -0,0 +1,225 @@
+"""
+UIDAI Hackathon - Shard Discovery
+Finds shards in the known data directories, a manifest or glob patterns, and
+checks their record-ID ranges before any data is read
+"""
+
+import glob
+import json
+import os
+
+from .loader import DEMOGRAPHIC, ENROLMENT, detect_dataset, parse_shard_range
+
+# Where each dataset's shards live, relative to the data root
+DATA_DIRS = {
+    ENROLMENT: 'api_data_aadhar_enrolment',
+    DEMOGRAPHIC: 'api_data_aadhar_demographic',
+}
+
+
+class Shard:
+    """One shard file: its dataset and the [start, end) record-ID range from its name."""
+
+    def __init__(self, path, dataset, id_range=None):
+        self.path = path
+        self.dataset = dataset
+        self.start, self.end = id_range if id_range is not None else (None, None)
+
+    @property
+    def ranged(self):
+        return self.start is not None
+
+    def __repr__(self):
+        return f"Shard({self.path!r}, {self.dataset!r}, {self.start}, {self.end})"
+
+
+def shard_from_path(path, dataset=None):
+    """Build a Shard from a file name, or None if it is not a shard of a known dataset."""
+    if not path.lower().endswith('.csv'):
+        return None
+    dataset = dataset or detect_dataset(path)
+    if dataset is None:
+        return None
+    return Shard(path, dataset, parse_shard_range(path))
+
+
+def scan_data_dirs(root='.'):
+    """List the shards directly inside the two data directories under root (no recursion)."""
+    shards = []
+    for dataset, subdir in DATA_DIRS.items():
+        directory = os.path.join(root, subdir)
+        if not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                # Stray CSVs whose names do not match the folder's dataset are ignored
+                if entry.is_file() and detect_dataset(entry.name) == dataset:
+                    shard = shard_from_path(entry.path, dataset)
+                    if shard is not None:
+                        shards.append(shard)
+    return shards
+
+
+def read_manifest(path):
+    """
+    Read shard paths from a manifest file.
+
+    A .json manifest is either {"enrolment": [...], "demographic": [...]}
+    or a plain list of paths; any other file lists one path per line, with
+    blank lines and # comments ignored. Relative paths are taken relative
+    to the manifest itself.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    entries = []
+    with open(path) as f:
+        if path.lower().endswith('.json'):
+            content = json.load(f)
+            if isinstance(content, dict):
+                for dataset in (ENROLMENT, DEMOGRAPHIC):
+                    entries.extend((item, dataset) for item in content.get(dataset, []))
+            else:
+                entries.extend((item, None) for item in content)
+        else:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    entries.append((line, None))
+
+    shards = []
+    for item, dataset in entries:
+        full_path = item if os.path.isabs(item) else os.path.join(base, item)
+        shard = shard_from_path(full_path, dataset)
+        if shard is None:
+            raise ValueError(f"Manifest entry is not an enrolment/demographic CSV: {item}")
+        shards.append(shard)
+    return shards
+
+
+def expand_globs(patterns):
+    """Shards matching glob patterns (** recurses), dataset taken from the file name."""
+    shards = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern, recursive=True)):
+            shard = shard_from_path(path)
+            if shard is not None:
+                shards.append(shard)
+    return shards
+
+
+class Discovery:
+    """
+    Shards kept after deduplication and pruning, plus what was dropped and why.
+
+    gaps and overlaps are (dataset, previous_shard, next_shard) triples of
+    neighbouring kept shards whose ranges do not meet exactly.
+    """
+
+    def __init__(self):
+        self.shards = []
+        self.duplicates = []
+        self.contained = []
+        self.out_of_range = []
+        self.gaps = []
+        self.overlaps = []
+
+    def files(self, dataset):
+        return [shard.path for shard in self.shards if shard.dataset == dataset]
+
+    def split(self):
+        """(enrolment_files, demographic_files)."""
+        return self.files(ENROLMENT), self.files(DEMOGRAPHIC)
+
+    def report_lines(self):
+        lines = []
+        for shard in self.duplicates:
+            lines.append(f"Duplicate shard skipped: {shard.path}")
+        for shard in self.contained:
+            lines.append(f"Shard inside another shard's range skipped: {shard.path}")
+        for dataset, prev, nxt in self.gaps:
+            lines.append(f"Gap in {dataset} record IDs: {prev.end:,} .. {nxt.start:,} "
+                         f"({nxt.start - prev.end:,} records)")
+        for dataset, prev, nxt in self.overlaps:
+            lines.append(f"Overlapping {dataset} shards: {os.path.basename(prev.path)} and "
+                         f"{os.path.basename(nxt.path)} ({prev.end - nxt.start:,} records)")
+        if self.out_of_range:
+            lines.append(f"Shards outside the record-ID range skipped: {len(self.out_of_range)}")
+        return lines
+
+
+def record_range(text):
+    """Parse 'START:END' into a [start, end) record-ID range, e.g. for argparse."""
+    start, sep, end = text.partition(':')
+    try:
+        id_range = (int(start), int(end))
+    except ValueError:
+        id_range = None
+    if not sep or id_range is None or id_range[0] >= id_range[1]:
+        raise ValueError(f"Invalid record-ID range {text!r}; expected START:END with START < END")
+    return id_range
+
+
+def check_shards(shards, id_range=None):
+    """
+    Deduplicate, prune and order shards using only their names.
+
+    A shard whose dataset and range were already seen is a duplicate (the
+    first one listed wins); a shard whose range lies inside another is
+    dropped; with id_range=(start, end) shards of either dataset that do
+    not intersect it are dropped.
+    Shards without a parsable range are only deduplicated by real path.
+    """
+    result = Discovery()
+    seen_ranges = set()
+    seen_paths = set()
+    kept = []
+    for shard in shards:
+        real = os.path.realpath(shard.path)
+        key = (shard.dataset, shard.start, shard.end) if shard.ranged else real
+        if key in seen_ranges or real in seen_paths:
+            result.duplicates.append(shard)
+            continue
+        seen_ranges.add(key)
+        seen_paths.add(real)
+        if id_range is not None and shard.ranged and (shard.end <= id_range[0] or
+                                                      shard.start >= id_range[1]):
+            result.out_of_range.append(shard)
+            continue
+        kept.append(shard)
+
+    for dataset in (ENROLMENT, DEMOGRAPHIC):
+        ranged = sorted((s for s in kept if s.dataset == dataset and s.ranged),
+                        key=lambda s: (s.start, -s.end))
+        unranged = sorted((s for s in kept if s.dataset == dataset and not s.ranged),
+                          key=lambda s: s.path)
+        previous = None
+        for shard in ranged:
+            if previous is not None and shard.end <= previous.end:
+                result.contained.append(shard)
+                continue
+            if previous is not None and shard.start > previous.end:
+                result.gaps.append((dataset, previous, shard))
+            elif previous is not None and shard.start < previous.end:
+                result.overlaps.append((dataset, previous, shard))
+            result.shards.append(shard)
+            previous = shard
+        result.shards.extend(unranged)
+    return result
+
+
+def discover_shards(root='.', manifest=None, patterns=None, id_range=None):
+    """
+    Collect shards from a manifest, glob patterns or the data directories.
+
+    The manifest and patterns are combined when both are given; the data
+    directories under root are scanned only when neither is. Nothing is
+    walked recursively and no shard is opened.
+    """
+    if manifest is None and not patterns:
+        shards = scan_data_dirs(root)
+    else:
+        shards = []
+        if manifest is not None:
+            shards.extend(read_manifest(manifest))
+        if patterns:
+            shards.extend(expand_globs(patterns))
+    return check_shards(shards, id_range)
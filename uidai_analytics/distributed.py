@@ -0,0 +1,472 @@
+"""
+UIDAI Hackathon - Distributed Shard Execution
+A coordinator leases shards (record-ID ranges) to worker processes on any number of
+hosts and merges the partial aggregates they send back
+
+Usage:
+    UIDAI_AUTHKEY=secret python -m uidai_analytics.distributed coordinate --listen 0.0.0.0:7070
+    UIDAI_AUTHKEY=secret python -m uidai_analytics.distributed worker --connect coordinator:7070
+    python -m uidai_analytics.distributed coordinate --local-workers 4
+"""
+
+import argparse
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from multiprocessing.managers import BaseManager
+
+from .analysis import build_merged_df, iqr_bounds
+from .discovery import discover_shards
+from .hierarchy import LEVEL_KEYS, score_hierarchy
+from .incremental import shard_id
+from .loader import (DEFAULT_CHUNKSIZE, DEMOGRAPHIC, ENROLMENT, aggregate_chunks, count_columns,
+                     level_columns, shard_chunks)
+from .parallel import LogQuantileSketch, merge_partials
+from .validation import Validator
+
+DEFAULT_PORT = 7070
+
+# A lease not renewed for this long is handed to another worker; workers
+# renew theirs every third of it while they work
+LEASE_SECONDS = 30.0
+
+# A shard whose lease is lost or fails this many times stops the run
+MAX_ATTEMPTS = 3
+
+# Shared secret of coordinator and workers
+AUTHKEY_ENV = 'UIDAI_AUTHKEY'
+
+# Coordinator methods workers may call
+EXPOSED = ('lease', 'heartbeat', 'complete', 'fail')
+
+
+def parse_address(value):
+    """'host:port' -> (host, port)."""
+    host, _, port = value.rpartition(':')
+    try:
+        return host or '127.0.0.1', int(port)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected host:port, got {value!r}")
+
+
+def env_authkey():
+    """The shared secret from UIDAI_AUTHKEY as bytes, or None."""
+    value = os.environ.get(AUTHKEY_ENV)
+    return value.encode() if value else None
+
+
+def compute_partial(task):
+    """
+    Aggregate one shard task.
+
+    Returns ({name: aggregate_frame}, row_count, sketch): the level sums of
+    loader.aggregate_levels plus a LogQuantileSketch of the per-record
+    total count, all of which merge exactly across shards.
+    """
+    path, dataset, levels, chunksize, validator = task
+    sketch = LogQuantileSketch()
+    value_cols = count_columns(dataset)
+
+    def sketched(chunks):
+        for chunk in chunks:
+            sketch.add_many(chunk[value_cols].sum(axis=1).to_numpy())
+            yield chunk
+
+    chunks = shard_chunks(path, dataset, level_columns(dataset, levels), chunksize, None, validator)
+    results, n_rows = aggregate_chunks(sketched(chunks), dataset, levels)
+    return results, n_rows, sketch
+
+
+class Coordinator:
+    """
+    Lease table of one distributed run, served to workers over an authenticated socket.
+
+    Each task is one shard, i.e. one record-ID range. A worker leases a
+    task, renews the lease while it works and hands back the partial
+    aggregate. A lease that runs out (the worker died or lost the
+    network) or a task that raised is queued again for any worker, up to
+    MAX_ATTEMPTS times. The first result of a task wins, so a slow worker
+    finishing a task that was already reassigned changes nothing.
+    """
+
+    def __init__(self, tasks, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS,
+                 verbose=False):
+        self.tasks = dict(tasks)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.verbose = verbose
+        self.queue = deque(self.tasks)
+        self.leases = {}
+        self.attempts = {task_id: 0 for task_id in self.tasks}
+        self.results = {}
+        self.workers = {}
+        self.reassigned = 0
+        self.error = None
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        if not self.tasks:
+            self.finished.set()
+        self.address = None
+        self.authkey = None
+        self.processes = {}
+        self.spawned = 0
+        self.layout = {}
+        self.levels = {}
+
+    @classmethod
+    def for_shards(cls, files_by_dataset, levels, chunksize=DEFAULT_CHUNKSIZE, validator=None,
+                   **kwargs):
+        """
+        One task per shard of {dataset: files}, largest shards first.
+
+        Shard paths are sent to the workers as they are, so every host
+        must see the data (and any quarantine directory) at the same paths.
+        """
+        levels = {name: list(keys) for name, keys in levels.items()}
+        tasks = []
+        for dataset, files in files_by_dataset.items():
+            for path in files:
+                tasks.append((f"{dataset}:{shard_id(path)}",
+                              (path, dataset, levels, chunksize, validator)))
+        tasks.sort(key=lambda item: -os.path.getsize(item[1][0]))
+        coordinator = cls(tasks, **kwargs)
+        coordinator.layout = {dataset: [f"{dataset}:{shard_id(path)}" for path in files]
+                              for dataset, files in files_by_dataset.items()}
+        coordinator.levels = levels
+        return coordinator
+
+    # ------------------------------------------------------------------
+    # Called by workers through the manager
+    # ------------------------------------------------------------------
+    def lease(self, worker):
+        """Next task for worker: {'status': 'task' | 'wait' | 'done', ...}."""
+        with self.lock:
+            self.workers.setdefault(worker, 0)
+            self._expire()
+            if self.finished.is_set():
+                return {'status': 'done'}
+            if not self.queue:
+                return {'status': 'wait', 'seconds': min(1.0, self.lease_seconds / 3)}
+            task_id = self.queue.popleft()
+            self.attempts[task_id] += 1
+            self.leases[task_id] = (worker, time.monotonic() + self.lease_seconds)
+            if self.verbose:
+                print(f"  - Leased {task_id} to {worker}")
+            return {'status': 'task', 'task_id': task_id, 'task': self.tasks[task_id],
+                    'lease_seconds': self.lease_seconds}
+
+    def heartbeat(self, worker, task_id):
+        """Renew a lease; False if worker no longer holds it."""
+        with self.lock:
+            holder = self.leases.get(task_id)
+            if holder is None or holder[0] != worker:
+                return False
+            self.leases[task_id] = (worker, time.monotonic() + self.lease_seconds)
+            return True
+
+    def complete(self, worker, task_id, result):
+        """Record a task's partial aggregate; False if it was already done."""
+        with self.lock:
+            if task_id in self.results or self.finished.is_set():
+                return False
+            self.results[task_id] = result
+            self.leases.pop(task_id, None)
+            if task_id in self.queue:
+                self.queue.remove(task_id)
+            self.workers[worker] = self.workers.get(worker, 0) + 1
+            if len(self.results) == len(self.tasks):
+                self.finished.set()
+            return True
+
+    def fail(self, worker, task_id, message):
+        """A worker could not compute a task: queue it again or give up."""
+        with self.lock:
+            holder = self.leases.get(task_id)
+            if holder is not None and holder[0] == worker:
+                del self.leases[task_id]
+                self._requeue(task_id, f"{worker} failed: {message}")
+
+    # ------------------------------------------------------------------
+    # Lease bookkeeping (callers hold the lock)
+    # ------------------------------------------------------------------
+    def _requeue(self, task_id, reason):
+        if task_id in self.results:
+            return
+        if self.attempts[task_id] >= self.max_attempts:
+            self.error = f"Task {task_id} gave up after {self.attempts[task_id]} attempts; {reason}"
+            self.finished.set()
+            return
+        print(f"  - Reassigning {task_id}: {reason}")
+        self.queue.appendleft(task_id)
+        self.reassigned += 1
+
+    def _expire(self):
+        now = time.monotonic()
+        for task_id, (worker, deadline) in list(self.leases.items()):
+            if deadline < now:
+                del self.leases[task_id]
+                self._requeue(task_id, f"lease of {worker} expired")
+
+    def _release(self, worker, reason):
+        for task_id, (holder, _) in list(self.leases.items()):
+            if holder == worker:
+                del self.leases[task_id]
+                self._requeue(task_id, reason)
+
+    # ------------------------------------------------------------------
+    # Serving and local workers
+    # ------------------------------------------------------------------
+    def serve(self, address=('127.0.0.1', DEFAULT_PORT), authkey=None):
+        """
+        Start accepting workers in a background thread; return the bound (host, port).
+
+        Without an authkey a random one is made, which only the local
+        workers started by this coordinator are given.
+        """
+        self.authkey = authkey or secrets.token_hex(16).encode()
+        server_class = type('CoordinatorServer', (BaseManager,), {})
+        server_class.register('coordinator', callable=lambda: self, exposed=EXPOSED)
+        server = server_class(address=address, authkey=self.authkey).get_server()
+        self.address = server.address
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return self.address
+
+    def start_local_workers(self, n):
+        """Start n worker processes on this host, standing in for remote nodes."""
+        for _ in range(n):
+            self._spawn()
+
+    def _spawn(self):
+        self.spawned += 1
+        name = f"local-{self.spawned}"
+        host, port = self.address
+        if host in ('0.0.0.0', ''):
+            host = '127.0.0.1'
+        package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, **{AUTHKEY_ENV: self.authkey.decode()})
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_parent, env.get('PYTHONPATH')]))
+        self.processes[name] = subprocess.Popen(
+            [sys.executable, '-m', 'uidai_analytics.distributed', 'worker',
+             '--connect', f"{host}:{port}", '--name', name],
+            env=env, stdout=subprocess.DEVNULL)
+        return name
+
+    def _check_local_workers(self):
+        """Free the leases of local workers that died and start replacements."""
+        for name, process in list(self.processes.items()):
+            code = process.poll()
+            if code is None:
+                continue
+            del self.processes[name]
+            if code == 0:
+                continue
+            self._release(name, f"{name} exited with code {code}")
+            if not self.finished.is_set() and self.spawned < len(self.tasks) + self.max_attempts:
+                print(f"  - Replacing {name} with {self._spawn()}")
+        if (self.spawned and not self.processes and not self.finished.is_set() and
+                all(worker.startswith('local-') for worker in self.workers)):
+            self.error = "Every local worker exited and no remote worker joined"
+            self.finished.set()
+
+    def status(self):
+        """Snapshot of the run: queued, leased {task_id: worker}, done and workers."""
+        with self.lock:
+            return {
+                'queued': len(self.queue),
+                'leased': {task_id: worker for task_id, (worker, _) in self.leases.items()},
+                'done': len(self.results),
+                'tasks': len(self.tasks),
+                'reassigned': self.reassigned,
+                'workers': dict(self.workers),
+            }
+
+    def wait(self, poll_seconds=0.2):
+        """
+        Block until every task is done and merge the partials in shard order.
+
+        Returns {dataset: ({name: aggregate_frame}, row_count, sketch)}.
+        Raises RuntimeError if a task ran out of attempts.
+        """
+        while not self.finished.wait(poll_seconds):
+            with self.lock:
+                self._expire()
+                self._check_local_workers()
+        for process in self.processes.values():
+            try:
+                process.wait(timeout=10 if self.error is None else 0)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if self.error is not None:
+            raise RuntimeError(self.error)
+
+        merged = {}
+        for dataset, task_ids in self.layout.items():
+            partials = [self.results[task_id] for task_id in task_ids]
+            levels, n_rows = merge_partials([(part[0], part[1]) for part in partials], dataset,
+                                            self.levels)
+            sketch = LogQuantileSketch()
+            for part in partials:
+                sketch.merge(part[2])
+            merged[dataset] = (levels, n_rows, sketch)
+        return merged
+
+
+def run_distributed(files_by_dataset, levels, address=('127.0.0.1', 0), authkey=None,
+                    local_workers=0, lease_seconds=LEASE_SECONDS, chunksize=DEFAULT_CHUNKSIZE,
+                    validator=None, verbose=False):
+    """
+    Coordinate one run to completion; return (merged, coordinator) as Coordinator.wait.
+
+    The merged levels equal aggregate_levels_parallel over the same files.
+    """
+    if not local_workers and authkey is None:
+        raise ValueError(f"Remote workers need the shared secret: set {AUTHKEY_ENV}")
+    coordinator = Coordinator.for_shards(files_by_dataset, levels, chunksize, validator,
+                                         lease_seconds=lease_seconds, verbose=verbose)
+    host, port = coordinator.serve(address, authkey)
+    print(f"Coordinator listening on {host}:{port} ({len(coordinator.tasks)} shards)")
+    coordinator.start_local_workers(local_workers)
+    return coordinator.wait(), coordinator
+
+
+class CoordinatorClient(BaseManager):
+    """Worker-side connection to a coordinator."""
+
+
+CoordinatorClient.register('coordinator')
+
+
+def run_worker(address, authkey, name=None):
+    """Lease and compute tasks until the coordinator's run is done; return the number computed."""
+    name = name or f"{socket.gethostname()}-{os.getpid()}"
+    manager = CoordinatorClient(address=address, authkey=authkey)
+    manager.connect()
+    coordinator = manager.coordinator()
+    computed = 0
+    while True:
+        lease = coordinator.lease(name)
+        if lease['status'] == 'done':
+            return computed
+        if lease['status'] == 'wait':
+            time.sleep(lease['seconds'])
+            continue
+
+        task_id = lease['task_id']
+        stop = threading.Event()
+
+        def renew():
+            # The proxy opens its own connection in this thread
+            while not stop.wait(lease['lease_seconds'] / 3):
+                if not coordinator.heartbeat(name, task_id):
+                    return
+
+        heartbeat = threading.Thread(target=renew, daemon=True)
+        heartbeat.start()
+        try:
+            result = compute_partial(lease['task'])
+        except Exception as exc:
+            stop.set()
+            coordinator.fail(name, task_id, f"{type(exc).__name__}: {exc}")
+            traceback.print_exc()
+            continue
+        stop.set()
+        heartbeat.join()
+        coordinator.complete(name, task_id, result)
+        computed += 1
+        print(f"  - {name}: {task_id} ({result[1]:,} rows)", flush=True)
+
+
+def coordinate_command(args):
+    discovery = discover_shards(args.root, args.manifest, args.patterns)
+    for line in discovery.report_lines():
+        print(f"Warning: {line}")
+    enrolment_files, demographic_files = discovery.split()
+    validator = None
+    if args.quarantine_dir:
+        validator = Validator.for_discovery(discovery, args.quarantine_dir)
+
+    levels = {'state': LEVEL_KEYS['state'], 'pincode': LEVEL_KEYS['pincode']}
+    start = time.perf_counter()
+    merged, coordinator = run_distributed({ENROLMENT: enrolment_files, DEMOGRAPHIC: demographic_files},
+                                          levels, args.listen, env_authkey(), args.local_workers,
+                                          args.lease_seconds, verbose=args.verbose)
+    print(f"Done in {time.perf_counter() - start:.1f}s: "
+          f"{', '.join(f'{worker} {n}' for worker, n in sorted(coordinator.workers.items()))} "
+          f"shards; {coordinator.reassigned} reassigned")
+
+    enrolment, n_enrolment, enrolment_sketch = merged[ENROLMENT]
+    update, n_update, update_sketch = merged[DEMOGRAPHIC]
+    print(f"Records: {n_enrolment:,} enrolment, {n_update:,} update")
+    for label, sketch in (('enrolment', enrolment_sketch), ('update', update_sketch)):
+        print(f"Count per {label} record: p50 {sketch.quantile(0.5):.0f}  "
+              f"p90 {sketch.quantile(0.9):.0f}  p99 {sketch.quantile(0.99):.0f}")
+
+    merged_df = build_merged_df(enrolment['state'], update['state'])
+    q1, q3, _, _, upper = iqr_bounds(merged_df['Update_Ratio'])
+    print(f"\nStates analyzed: {len(merged_df)}  Q1 {q1:.2f}  Q3 {q3:.2f}  threshold {upper:.2f}")
+    print(merged_df.head(args.top).to_string(index=False))
+    hierarchy = score_hierarchy(enrolment['pincode'], update['pincode'])
+    for level in ('state', 'district', 'pincode'):
+        level_units = hierarchy.units[level]
+        print(f"  {level.title():<9} units: {int(level_units['Update_Ratio'].notna().sum()):>7,}  "
+              f"outliers: {int(level_units['is_outlier'].sum()):>6,}  "
+              f"threshold: {hierarchy.thresholds[level]['upper_bound']:.2f}")
+    return 0
+
+
+def worker_command(args):
+    authkey = env_authkey()
+    if authkey is None:
+        print(f"Set {AUTHKEY_ENV} to the coordinator's shared secret")
+        return 2
+    host, port = args.connect
+    try:
+        computed = run_worker(args.connect, authkey, args.name)
+    except (ConnectionError, EOFError, OSError) as exc:
+        print(f"Lost the coordinator at {host}:{port}: {exc}")
+        return 1
+    print(f"Run finished; {computed} shards computed here")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Coordinator and workers of a multi-host run")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    coordinate = subparsers.add_parser('coordinate', help="Lease shards to workers and merge their partials")
+    coordinate.add_argument('--listen', type=parse_address, default=('127.0.0.1', DEFAULT_PORT),
+                            help=f"host:port to accept workers on (default: 127.0.0.1:{DEFAULT_PORT})")
+    coordinate.add_argument('--local-workers', type=int, default=0,
+                            help="Worker processes to start on this host (default: 0)")
+    coordinate.add_argument('--lease-seconds', type=float, default=LEASE_SECONDS,
+                            help=f"Seconds before a silent worker's shard is reassigned "
+                                 f"(default: {LEASE_SECONDS:.0f})")
+    coordinate.add_argument('--root', default='.', help="Directory holding the data folders")
+    coordinate.add_argument('--manifest', default=None,
+                            help="Shard manifest (.json or one path per line) instead of the data folders")
+    coordinate.add_argument('--glob', dest='patterns', action='append', default=None,
+                            help="Glob pattern of shard files (repeatable) instead of the data folders")
+    coordinate.add_argument('--quarantine-dir', default=None,
+                            help="Validate records while loading (a path every worker can write)")
+    coordinate.add_argument('--top', type=int, default=10, help="States to print (default: 10)")
+    coordinate.add_argument('--verbose', action='store_true', help="Log every lease")
+    coordinate.set_defaults(func=coordinate_command)
+
+    worker = subparsers.add_parser('worker', help="Compute shards leased by a coordinator")
+    worker.add_argument('--connect', type=parse_address, required=True,
+                        help="host:port of the coordinator")
+    worker.add_argument('--name', default=None, help="Worker name (default: <host>-<pid>)")
+    worker.set_defaults(func=worker_command)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
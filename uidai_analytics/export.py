@@ -0,0 +1,171 @@
+"""
+UIDAI Hackathon - Structured Report Export
+Per-unit ratios, thresholds, flags and summary statistics as JSON and Parquet
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from .detectors import DETECTORS
+from .hierarchy import LEVEL_KEYS
+
+# Bumped whenever a key or column is renamed, retyped or removed; adding a
+# new one (e.g. a new detector's columns) keeps the version
+REPORT_SCHEMA_VERSION = 1
+
+REPORT_FORMATS = ('json', 'parquet')
+REPORT_FILES = {'json': 'anomaly_report.json', 'parquet': 'anomaly_units.parquet'}
+
+# Per-unit table: column -> pandas dtype. Every level has every column; keys
+# below the level (district of a state, ...) and detectors that did not run
+# are null.
+UNIT_SCHEMA = {
+    'level': 'string',
+    'state': 'string',
+    'district': 'string',
+    'pincode': 'Int64',
+    'enrolment_count': 'int64',
+    'update_count': 'int64',
+    'update_ratio': 'float64',
+    'robust_z': 'float64',
+    'parent_robust_z': 'float64',
+    'iqr_outlier': 'boolean',
+    'robust_outlier': 'boolean',
+}
+for _name in DETECTORS:
+    UNIT_SCHEMA[f'{_name}_score'] = 'float64'
+    UNIT_SCHEMA[f'{_name}_flag'] = 'boolean'
+
+# hierarchy.HierarchyResult column -> report column
+UNIT_COLUMNS = {
+    'Enrolment_Count': 'enrolment_count',
+    'Update_Count': 'update_count',
+    'Update_Ratio': 'update_ratio',
+    'is_outlier': 'iqr_outlier',
+    'is_robust_outlier': 'robust_outlier',
+}
+
+FLAG_COLUMNS = ['iqr_outlier', 'robust_outlier'] + [f'{name}_flag' for name in DETECTORS]
+
+
+def _number(value):
+    """Plain float for JSON; NaN and infinities become null."""
+    if value is None:
+        return None
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def unit_table(hierarchy, detections=None):
+    """
+    One row per state, district and pincode in UNIT_SCHEMA.
+
+    hierarchy is a hierarchy.HierarchyResult; detections optionally maps
+    a level to the detectors.DetectionResult of its units.
+    """
+    detections = detections or {}
+    frames = []
+    for level, table in hierarchy.units.items():
+        frame = table.rename(columns=UNIT_COLUMNS)
+        if level in detections:
+            keys = LEVEL_KEYS[level]
+            scored = detections[level].table
+            columns = [column for column in scored.columns if column.endswith(('_score', '_flag'))]
+            frame = frame.merge(scored[keys + columns], on=keys, how='left')
+        frame.insert(0, 'level', level)
+        frames.append(frame.reindex(columns=list(UNIT_SCHEMA)).astype(UNIT_SCHEMA))
+    units = pd.concat(frames, ignore_index=True)
+    units.attrs['schema_version'] = REPORT_SCHEMA_VERSION
+    return units
+
+
+def build_report(merged_df, thresholds, hierarchy, row_counts, detections=None, update_spikes=None):
+    """
+    The report document and its per-unit table. Returns (document, units).
+
+    merged_df and thresholds are the state ratios and IQR bounds of the
+    analysis; the other levels' thresholds come from the hierarchy. The
+    document lists every state plus the district and pincode units that
+    any rule flagged; the units table holds all of them.
+    """
+    units = unit_table(hierarchy, detections)
+    ratios = merged_df['Update_Ratio']
+    upper = thresholds['upper_bound']
+    above = int((ratios > upper).sum())
+    top_10 = merged_df.nlargest(10, 'Update_Ratio')
+
+    level_thresholds = dict(hierarchy.thresholds)
+    level_thresholds['state'] = thresholds
+    flagged = units[FLAG_COLUMNS].fillna(False).any(axis=1)
+    listed = units[(units['level'] == 'state') | flagged]
+
+    document = {
+        'schema_version': REPORT_SCHEMA_VERSION,
+        'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'records': {dataset: int(count) for dataset, count in row_counts.items()},
+        'summary': {
+            'states_analyzed': len(merged_df),
+            'ratio_mean': _number(ratios.mean()),
+            'ratio_median': _number(ratios.median()),
+            'ratio_std': _number(ratios.std()),
+            'ratio_min': _number(ratios.min()),
+            'ratio_max': _number(ratios.max()),
+            'states_above_threshold': above,
+            'states_in_normal_range': int((ratios <= upper).sum()),
+            'outlier_percent': _number(above / len(merged_df) * 100) if len(merged_df) else None,
+            'district_outliers': int(hierarchy.units['district']['is_outlier'].sum()),
+            'pincode_outliers': int(hierarchy.units['pincode']['is_outlier'].sum()),
+            'update_spikes': None if update_spikes is None else len(update_spikes),
+        },
+        'thresholds': {level: {key: _number(value) for key, value in bounds.items()}
+                       for level, bounds in level_thresholds.items()},
+        'correlation': {
+            'enrolment_vs_ratio': _number(merged_df['Enrolment_Count'].corr(ratios)),
+            'enrolment_vs_ratio_top10': _number(top_10['Enrolment_Count'].corr(top_10['Update_Ratio'])),
+        },
+        'state_outliers': merged_df.loc[ratios > upper, 'state'].tolist(),
+        'detectors': {level: detection.counts() for level, detection in (detections or {}).items()},
+        'units': json.loads(listed.to_json(orient='records')),
+    }
+    return document, units
+
+
+def write_report(document, units, output_dir, formats=REPORT_FORMATS):
+    """
+    Write the document as JSON and the units table as Parquet.
+
+    Each file is written next to its final path and renamed into place,
+    so a reader polling output_dir never sees a partial report. Returns
+    the paths written. Parquet needs pyarrow.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for fmt in formats:
+        if fmt not in REPORT_FILES:
+            raise ValueError(f"Unknown report format {fmt!r}; expected one of {', '.join(REPORT_FORMATS)}")
+        path = os.path.join(output_dir, REPORT_FILES[fmt])
+        if fmt == 'json':
+            with open(path + '.tmp', 'w') as f:
+                json.dump(document, f, indent=2, allow_nan=False)
+        else:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:  # pragma: no cover - optional dependency
+                raise ImportError("pyarrow is required for the Parquet report (pip install pyarrow)")
+            units.to_parquet(path + '.tmp', index=False, engine='pyarrow')
+        os.replace(path + '.tmp', path)
+        paths.append(path)
+    return paths
+
+
+def report_formats(text):
+    """argparse type for --report-format: 'json', 'parquet' or 'json,parquet'."""
+    formats = [fmt.strip() for fmt in text.split(',') if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in REPORT_FORMATS]
+    if unknown or not formats:
+        raise ValueError(f"Unknown report format {text!r}; expected {', '.join(REPORT_FORMATS)}")
+    return formats
@@ -0,0 +1,193 @@
+"""
+UIDAI Hackathon - Hierarchical Anomaly Engine
+Vectorized update-to-enrolment ratios and outlier flags at state, district and pincode level
+"""
+
+import numpy as np
+import pandas as pd
+
+from .loader import DEMOGRAPHIC, ENROLMENT, count_columns
+
+LEVEL_KEYS = {
+    'state': ['state'],
+    'district': ['state', 'district'],
+    'pincode': ['state', 'district', 'pincode'],
+}
+
+# Scales the median absolute deviation to a standard deviation under normality
+MAD_SCALE = 0.6745
+
+
+def factorize_sorted(values):
+    """
+    Dense codes of values and their sorted string labels.
+
+    Categorical columns (as produced by the loader) are factorized through
+    their categories, so no string is built per row. Missing values get
+    the label 'nan'.
+    """
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype('category')
+    names = values.cat.categories.astype(str).tolist()
+    raw = values.cat.codes.to_numpy().astype(np.int64)
+    if (raw < 0).any():
+        raw[raw < 0] = len(names)
+        names.append('nan')
+    category_codes, uniques = pd.factorize(pd.Index(names), sort=True)
+    codes = category_codes[raw]
+    # Drop the unused categories so codes stay dense
+    used = np.zeros(len(uniques), dtype=bool)
+    used[codes] = True
+    return np.cumsum(used)[codes] - 1, uniques[used]
+
+
+def encode_levels(keys_frame, levels=('state', 'district', 'pincode')):
+    """
+    Give every row integer unit codes for each hierarchy level.
+
+    Codes are dense and sorted (state name, then district name, then
+    pincode), so each level is derived from its parent with one
+    np.unique over an int64 key. Returns ({level: codes}, {level: labels}).
+    """
+    codes = {}
+    labels = {}
+    state_codes, state_labels = factorize_sorted(keys_frame['state'])
+    codes['state'] = state_codes.astype(np.int64)
+    labels['state'] = pd.DataFrame({'state': state_labels})
+
+    parent = codes['state']
+    parent_labels = labels['state']
+    if 'district' in levels:
+        district_codes, district_labels = factorize_sorted(keys_frame['district'])
+        combined = parent * len(district_labels) + district_codes
+        units, inverse = np.unique(combined, return_inverse=True)
+        codes['district'] = inverse.astype(np.int64)
+        labels['district'] = pd.DataFrame({
+            'state': parent_labels['state'].to_numpy()[units // len(district_labels)],
+            'district': np.asarray(district_labels)[units % len(district_labels)],
+        })
+        parent = codes['district']
+        parent_labels = labels['district']
+
+    if 'pincode' in levels:
+        combined = parent * 1_000_000 + keys_frame['pincode'].to_numpy(np.int64)
+        units, inverse = np.unique(combined, return_inverse=True)
+        codes['pincode'] = inverse.astype(np.int64)
+        parent_of_unit = units // 1_000_000
+        labels['pincode'] = parent_labels.iloc[parent_of_unit].reset_index(drop=True)
+        labels['pincode']['pincode'] = (units % 1_000_000).astype(np.int32)
+    return codes, labels
+
+
+def grouped_median(values, groups, n_groups):
+    """Median of values within each group, NaN for empty groups, without a Python loop."""
+    valid = ~np.isnan(values)
+    values, groups = values[valid], groups[valid]
+    order = np.lexsort((values, groups))
+    values = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    result = np.full(n_groups, np.nan)
+    nonempty = counts > 0
+    lo = starts[nonempty] + (counts[nonempty] - 1) // 2
+    hi = starts[nonempty] + counts[nonempty] // 2
+    result[nonempty] = (values[lo] + values[hi]) / 2
+    return result
+
+
+def robust_z(values, groups=None, n_groups=1):
+    """Robust z-score 0.6745 * (x - median) / MAD, optionally within groups."""
+    if groups is None:
+        groups = np.zeros(len(values), dtype=np.int64)
+    median = grouped_median(values, groups, n_groups)
+    deviation = np.abs(values - median[groups])
+    mad = grouped_median(deviation, groups, n_groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = MAD_SCALE * (values - median[groups]) / mad[groups]
+    z[~np.isfinite(z)] = np.nan
+    return z
+
+
+def iqr_fence(values, k=1.5):
+    """Return (Q1, Q3, IQR, lower_bound, upper_bound), ignoring NaN."""
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return (np.nan,) * 5
+    q1, q3 = np.quantile(values, [0.25, 0.75])
+    iqr = q3 - q1
+    return q1, q3, iqr, q1 - k * iqr, q3 + k * iqr
+
+
+class HierarchyResult:
+    """Per-level unit tables plus the thresholds used to flag them."""
+
+    def __init__(self, units, thresholds):
+        self.units = units
+        self.thresholds = thresholds
+
+    def outliers(self, level):
+        table = self.units[level]
+        return table[table['is_outlier']].sort_values('Update_Ratio', ascending=False)
+
+
+def score_hierarchy(enrolment_leaf, update_leaf, levels=('state', 'district', 'pincode'), k=1.5,
+                    z_threshold=3.5):
+    """
+    Score every unit of every hierarchy level in one vectorized pass.
+
+    enrolment_leaf and update_leaf are aggregates keyed by the finest
+    requested level (e.g. state, district, pincode) with the dataset count
+    columns. Units present in only one dataset get no ratio, matching the
+    inner merge of the state analysis.
+    """
+    levels = list(levels)
+    leaf_keys = LEVEL_KEYS[levels[-1]]
+    n_enrolment = len(enrolment_leaf)
+
+    keys = pd.concat([enrolment_leaf[leaf_keys], update_leaf[leaf_keys]], ignore_index=True)
+    totals = np.concatenate([
+        enrolment_leaf[count_columns(ENROLMENT)].to_numpy(np.float64).sum(axis=1),
+        update_leaf[count_columns(DEMOGRAPHIC)].to_numpy(np.float64).sum(axis=1),
+    ])
+    is_update = np.arange(len(keys)) >= n_enrolment
+
+    codes, labels = encode_levels(keys, levels)
+
+    units = {}
+    thresholds = {}
+    parent_codes = None
+    n_parents = 0
+    for level in levels:
+        unit_codes = codes[level]
+        n_units = len(labels[level])
+        enrolment = np.bincount(unit_codes[~is_update], totals[~is_update], minlength=n_units)
+        update = np.bincount(unit_codes[is_update], totals[is_update], minlength=n_units)
+        in_enrolment = np.bincount(unit_codes[~is_update], minlength=n_units) > 0
+        in_update = np.bincount(unit_codes[is_update], minlength=n_units) > 0
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(in_enrolment & in_update & (enrolment > 0), update / enrolment, np.nan)
+
+        q1, q3, iqr, lower, upper = iqr_fence(ratio, k)
+        table = labels[level].copy()
+        table['Enrolment_Count'] = enrolment.astype(np.int64)
+        table['Update_Count'] = update.astype(np.int64)
+        table['Update_Ratio'] = ratio
+        table['robust_z'] = robust_z(ratio)
+
+        # Robust z relative to the unit's parent (district within state, ...)
+        if parent_codes is not None:
+            unit_parent = np.zeros(n_units, dtype=np.int64)
+            unit_parent[unit_codes] = parent_codes
+            table['parent_robust_z'] = robust_z(ratio, unit_parent, n_parents)
+        else:
+            table['parent_robust_z'] = np.nan
+
+        table['is_outlier'] = ratio > upper
+        table['is_robust_outlier'] = np.abs(table['robust_z'].to_numpy()) > z_threshold
+        units[level] = table
+        thresholds[level] = {'Q1': q1, 'Q3': q3, 'IQR': iqr,
+                             'lower_bound': lower, 'upper_bound': upper}
+        parent_codes = unit_codes
+        n_parents = n_units
+    return HierarchyResult(units, thresholds)
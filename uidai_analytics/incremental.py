@@ -0,0 +1,172 @@
+"""
+UIDAI Hackathon - Incremental Aggregate Store
+Persists per-state, per-district and per-date partial sums and folds in only new shards
+"""
+
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+
+from .analysis import build_merged_df
+from .loader import DEMOGRAPHIC, ENROLMENT, combine_partials, count_columns, parse_shard_range
+from .parallel import aggregate_shards_parallel
+
+# Bumped whenever LEVELS changes: a store of another version lacks tables
+# that the recorded shards would never backfill
+STORE_VERSION = 2
+
+# Partial sums kept for every dataset
+LEVELS = {
+    'state': ['state'],
+    'district': ['state', 'district'],
+    'date': ['date', 'state'],
+    'pincode': ['state', 'district', 'pincode'],
+}
+
+
+def shard_id(path):
+    """Identify a shard by its record-ID range, falling back to its file name."""
+    id_range = parse_shard_range(path)
+    if id_range is None:
+        return os.path.basename(path)
+    return f"{id_range[0]}_{id_range[1]}"
+
+
+class AggregateStore:
+    """
+    Directory of persisted partial aggregates plus a manifest of applied shards.
+
+    Every update writes a new generation directory and then switches the
+    CURRENT pointer to it, so an interrupted run never leaves tables and
+    manifest out of step.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+        self.manifest = {'version': STORE_VERSION, 'shards': {ENROLMENT: {}, DEMOGRAPHIC: {}}}
+        self.tables = {}
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def _current_dir(self):
+        pointer = os.path.join(self.store_dir, 'CURRENT')
+        if not os.path.exists(pointer):
+            return None
+        with open(pointer) as f:
+            return os.path.join(self.store_dir, f.read().strip())
+
+    def _load(self):
+        current = self._current_dir()
+        for dataset in (ENROLMENT, DEMOGRAPHIC):
+            for level, keys in LEVELS.items():
+                columns = keys + count_columns(dataset)
+                self.tables[dataset, level] = pd.DataFrame(columns=columns)
+        if current is None:
+            return
+
+        with open(os.path.join(current, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest.get('version') != STORE_VERSION:
+            raise ValueError(f"Aggregate store {self.store_dir} has format version "
+                             f"{manifest.get('version')}, expected {STORE_VERSION}; "
+                             f"delete it and rerun to rebuild")
+        self.manifest = manifest
+        for (dataset, level), empty in self.tables.items():
+            path = os.path.join(current, f"{dataset}_{level}.csv")
+            if os.path.exists(path):
+                table = pd.read_csv(path, dtype={'state': str, 'district': str, 'pincode': 'int32'},
+                                    parse_dates=['date'] if level == 'date' else None)
+                self.tables[dataset, level] = table if len(table) else empty
+
+    def _save(self):
+        generation = f"gen-{time.time_ns()}"
+        target = os.path.join(self.store_dir, generation)
+        os.makedirs(target)
+        for (dataset, level), table in self.tables.items():
+            table.to_csv(os.path.join(target, f"{dataset}_{level}.csv"), index=False)
+        with open(os.path.join(target, 'manifest.json'), 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+
+        previous = self._current_dir()
+        pointer = os.path.join(self.store_dir, 'CURRENT')
+        with open(pointer + '.tmp', 'w') as f:
+            f.write(generation)
+        os.replace(pointer + '.tmp', pointer)
+        if previous is not None:
+            shutil.rmtree(previous, ignore_errors=True)
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+    def pending(self, files, dataset):
+        """Return the shards of files that have not been folded in yet."""
+        applied = self.manifest['shards'][dataset]
+        delta = []
+        for path in files:
+            sid = shard_id(path)
+            if sid not in applied:
+                delta.append(path)
+            elif applied[sid]['size'] != os.path.getsize(path):
+                # Shards are immutable once written; a changed one means the
+                # stored sums can no longer be trusted
+                raise ValueError(f"Shard {path} changed after it was applied; "
+                                 f"rebuild the aggregate store")
+        return delta
+
+    def update(self, enrolment_files, demographic_files, workers=1, cache=None, verbose=False,
+               validator=None):
+        """
+        Fold new shards into the stored partial sums; return the number applied.
+
+        A validation.Validator checks only the new shards: the stored sums
+        keep whatever checks were in force when each shard was applied.
+        """
+        applied = 0
+        for dataset, files in ((ENROLMENT, enrolment_files), (DEMOGRAPHIC, demographic_files)):
+            delta = self.pending(files, dataset)
+            if not delta:
+                continue
+            value_cols = count_columns(dataset)
+            shard_results = aggregate_shards_parallel(delta, dataset, LEVELS, workers=workers,
+                                                      verbose=verbose, cache=cache,
+                                                      validator=validator)
+            # One fold of the stored table and every new partial per level
+            for level, keys in LEVELS.items():
+                self.tables[dataset, level] = self._fold(
+                    [self.tables[dataset, level]] + [results[level] for results, _ in shard_results],
+                    keys, value_cols)
+            for path, (_, n_rows) in zip(delta, shard_results):
+                self.manifest['shards'][dataset][shard_id(path)] = {
+                    'file': os.path.basename(path),
+                    'range': parse_shard_range(path),
+                    'size': os.path.getsize(path),
+                    'rows': n_rows,
+                }
+                applied += 1
+        if applied:
+            self._save()
+        return applied
+
+    @staticmethod
+    def _fold(tables, keys, value_cols):
+        partials = [frame.set_index(keys) for frame in tables if len(frame)]
+        return combine_partials(partials, keys, value_cols)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def table(self, dataset, level):
+        return self.tables[dataset, level]
+
+    def row_count(self, dataset):
+        return sum(entry['rows'] for entry in self.manifest['shards'][dataset].values())
+
+    def merged_df(self):
+        """State-level merged_df with Update_Ratio, computed from the stored sums."""
+        return build_merged_df(self.table(ENROLMENT, 'state'), self.table(DEMOGRAPHIC, 'state'))
@@ -0,0 +1,287 @@
+"""
+UIDAI Hackathon - Cross-Dataset Join Engine
+Aligns enrolment and update counts per (pincode, date) or (pincode, week) with a
+sort-merge over int64 keys, including lagged windows of enrolment weeks
+"""
+
+import numpy as np
+import pandas as pd
+
+from .loader import DEFAULT_CHUNKSIZE, count_columns, shard_chunks
+from .recordstore import MISSING_DAY
+
+JOIN_TYPES = ('inner', 'left', 'right', 'outer')
+
+# A cell key is pincode << KEY_SHIFT | period, where period is a day or
+# week number since the Unix epoch (both far below 2^20)
+KEY_SHIFT = 20
+PERIOD_MASK = (1 << KEY_SHIFT) - 1
+
+# Day 0 (1970-01-01) was a Thursday; weeks start on Monday
+WEEK_OFFSET_DAYS = 3
+
+# Fold the per-chunk partial totals once this many have piled up
+FOLD_EVERY = 16
+
+
+def reduce_sorted(keys, values):
+    """Sum the value rows of equal keys; keys must be sorted. Returns (unique keys, sums)."""
+    if not len(keys):
+        return keys, values
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    return keys[starts], np.add.reduceat(values, starts, axis=0)
+
+
+def reduce_keys(keys, values):
+    """Sum the value rows of equal keys. Returns (sorted unique keys, sums)."""
+    order = np.argsort(keys, kind='stable')
+    return reduce_sorted(keys[order], values[order])
+
+
+class CellTotals:
+    """
+    Count columns of one dataset summed per (pincode, period) cell.
+
+    keys is a sorted, unique int64 array of cell keys and values an int64
+    matrix with one row per key and one column per age band. period is
+    'day' or 'week'.
+    """
+
+    def __init__(self, dataset, keys, values, period='day'):
+        self.dataset = dataset
+        self.keys = keys
+        self.values = values
+        self.period = period
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def columns(self):
+        return count_columns(self.dataset)
+
+    def totals(self):
+        return self.values.sum(axis=1)
+
+    def to_weeks(self):
+        """The same counts summed per (pincode, Monday-starting week)."""
+        if self.period == 'week':
+            return self
+        pincodes, days = self.keys >> KEY_SHIFT, self.keys & PERIOD_MASK
+        keys = (pincodes << KEY_SHIFT) | ((days + WEEK_OFFSET_DAYS) // 7)
+        # Days of one pincode map to non-decreasing weeks, so keys stay sorted
+        keys, values = reduce_sorted(keys, self.values)
+        return CellTotals(self.dataset, keys, values, 'week')
+
+
+def fold_cells(parts, dataset):
+    """
+    Sum (pincodes, day numbers, counts) array triples into CellTotals.
+
+    Rows without a date (day < 0) or with a negative pincode are left
+    out. Only the folded partial sums are held between parts, so memory
+    follows the number of distinct cells, not of records.
+    """
+    partials = []
+    for pincodes, days, counts in parts:
+        valid = (days >= 0) & (pincodes >= 0)
+        keys = (pincodes[valid].astype(np.int64) << KEY_SHIFT) | days[valid].astype(np.int64)
+        partials.append(reduce_keys(keys, counts[valid].astype(np.int64)))
+        if len(partials) >= FOLD_EVERY:
+            partials = [reduce_keys(np.concatenate([k for k, _ in partials]),
+                                    np.concatenate([v for _, v in partials]))]
+    if not partials:
+        return CellTotals(dataset, np.empty(0, np.int64),
+                          np.empty((0, len(count_columns(dataset))), np.int64))
+    keys, values = reduce_keys(np.concatenate([k for k, _ in partials]),
+                               np.concatenate([v for _, v in partials]))
+    return CellTotals(dataset, keys, values)
+
+
+def cells_from_files(files, dataset, chunksize=DEFAULT_CHUNKSIZE, cache=None, validator=None):
+    """CellTotals of CSV shards, read as typed chunks of the date, pincode and count columns."""
+    value_cols = count_columns(dataset)
+
+    def parts():
+        for path in files:
+            for chunk in shard_chunks(path, dataset, ['date', 'pincode'] + value_cols, chunksize,
+                                      cache, validator):
+                days = chunk['date'].to_numpy('datetime64[D]').view(np.int64)
+                yield chunk['pincode'].to_numpy(), days, chunk[value_cols].to_numpy(np.int64)
+
+    return fold_cells(parts(), dataset)
+
+
+def cells_from_store(store, dataset, rows_per_slice=DEFAULT_CHUNKSIZE):
+    """CellTotals of a recordstore.RecordStore, straight from the mapped records."""
+    records = store.records(dataset)
+    value_cols = count_columns(dataset)
+
+    def parts():
+        for start in range(0, len(records), rows_per_slice):
+            part = records[start:start + rows_per_slice]
+            days = part['date'].astype(np.int64)
+            days[part['date'] == MISSING_DAY] = -1
+            yield (part['pincode'], days,
+                   np.column_stack([part[col] for col in value_cols]).astype(np.int64))
+
+    return fold_cells(parts(), dataset)
+
+
+def merge_keys(left, right, how='inner'):
+    """
+    Sort-merge two sorted unique key arrays.
+
+    Returns (keys, left_index, right_index): the joined keys in order and
+    the row of each in left and right, -1 where a side has no such key.
+    """
+    if how not in JOIN_TYPES:
+        raise ValueError(f"Unknown join type {how!r}; expected one of {', '.join(JOIN_TYPES)}")
+    # A left/right join keeping the smaller side binary-searches its keys
+    # in the other side instead of merging both
+    if how == 'left' and len(left) <= len(right):
+        return left, np.arange(len(left)), locate(right, left)
+    if how == 'right' and len(right) <= len(left):
+        return right, locate(left, right), np.arange(len(right))
+    # A stable sort of two concatenated sorted runs is a single linear
+    # merge. Keys are unique per side, so a key of both sides sits at two
+    # adjacent positions, its left row first, and the merge order gives
+    # the side and row of every position
+    n_left = len(left)
+    combined = np.concatenate([left, right])
+    order = np.argsort(combined, kind='stable')
+    merged = combined[order]
+    pair = merged[1:] == merged[:-1]
+    from_left = order < n_left
+    matched_next = np.append(pair, False)
+    next_row = np.append(order[1:], n_left) - n_left
+
+    if how == 'inner':
+        at = np.flatnonzero(matched_next)
+        return merged[at], order[at], next_row[at]
+    if how == 'left':
+        at = np.flatnonzero(from_left)
+        return merged[at], order[at], np.where(matched_next[at], next_row[at], -1)
+    if how == 'right':
+        at = np.flatnonzero(~from_left)
+        matched_prev = np.insert(pair, 0, False)[at]
+        return merged[at], np.where(matched_prev, order[at - 1], -1), order[at] - n_left
+    first = np.ones(len(merged), dtype=bool)
+    first[1:] = ~pair
+    at = np.flatnonzero(first)
+    left_at = from_left[at]
+    return (merged[at], np.where(left_at, order[at], -1),
+            np.where(left_at, np.where(matched_next[at], next_row[at], -1), order[at] - n_left))
+
+
+def locate(sorted_keys, keys):
+    """Position of each of keys in sorted_keys, -1 where it is missing."""
+    index = np.searchsorted(sorted_keys, keys)
+    found = index < len(sorted_keys)
+    found[found] = sorted_keys[index[found]] == keys[found]
+    index[~found] = -1
+    return index
+
+
+def take_columns(values, index):
+    """Each column of values at rows index as its own array, 0 where index is -1."""
+    # Index -1 picks an appended zero, so each column is a single 1-D gather
+    return [np.append(column, 0)[index] for column in values.T]
+
+
+def band_columns(names, arrays):
+    """{name: array} of the band columns plus their sum, in name order."""
+    columns = dict(zip(names, arrays))
+    total = np.zeros(len(arrays[0]) if arrays else 0, dtype=np.int64)
+    for array in arrays:
+        total = total + array
+    return columns, total
+
+
+def cell_frame(keys, period, columns):
+    """
+    DataFrame of joined cells: pincode, date/week and the given {name: array} columns.
+
+    Update_Ratio is Update_Count / Enrolment_Count, NaN without enrolments.
+    """
+    periods = (keys & PERIOD_MASK).astype(np.int64)
+    if period == 'week':
+        periods = periods * 7 - WEEK_OFFSET_DAYS
+    data = {'pincode': (keys >> KEY_SHIFT).astype(np.int32),
+            period if period == 'week' else 'date': (periods * 86_400_000_000).view('datetime64[us]')}
+    data.update(columns)
+    enrolments = np.asarray(columns['Enrolment_Count'], dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        data['Update_Ratio'] = np.where(enrolments > 0,
+                                        np.asarray(columns['Update_Count'], dtype=np.float64) / enrolments,
+                                        np.nan)
+    # The arrays are new and owned by the frame alone; no consolidating copy
+    return pd.DataFrame(data, copy=False)
+
+
+def join_cells(enrolment, update, how='outer'):
+    """
+    Enrolment and update counts side by side per (pincode, date) or (pincode, week).
+
+    how is 'inner' (cells in both), 'left' (every enrolment cell),
+    'right' (every update cell) or 'outer' (every cell of either). Counts
+    of a side without the cell are 0 and in_enrolment / in_update say
+    which sides had it.
+    """
+    if enrolment.period != update.period:
+        raise ValueError(f"Cannot join {enrolment.period} cells with {update.period} cells")
+    keys, left, right = merge_keys(enrolment.keys, update.keys, how)
+    enrolment_columns, enrolment_total = band_columns(enrolment.columns,
+                                                      take_columns(enrolment.values, left))
+    update_columns, update_total = band_columns(update.columns, take_columns(update.values, right))
+    columns = {**enrolment_columns, **update_columns}
+    columns['Enrolment_Count'] = enrolment_total
+    columns['Update_Count'] = update_total
+    columns['in_enrolment'] = left >= 0
+    columns['in_update'] = right >= 0
+    return cell_frame(keys, enrolment.period, columns)
+
+
+def lagged_join(enrolment, update, lag_weeks=4, how='inner'):
+    """
+    Updates of each (pincode, week t) against the pincode's enrolments in weeks t-lag_weeks..t.
+
+    Both sides are summed per week first. how picks the weeks: 'left'
+    every week with updates, 'right' every week whose window holds
+    enrolments, 'inner' weeks with both and 'outer' weeks with either.
+    The enrolment columns are window sums, taken as differences of a
+    running sum over the sorted keys, so no window is materialised.
+    """
+    if lag_weeks < 0:
+        raise ValueError("lag_weeks must be >= 0")
+    enrolment, update = enrolment.to_weeks(), update.to_weeks()
+    # Every week whose window contains an enrolment week
+    covered = np.unique(np.concatenate([enrolment.keys + lag for lag in range(lag_weeks + 1)]))
+    keys, in_update, in_covered = merge_keys(update.keys, covered, how)
+
+    # Windows never reach into the previous pincode's keys
+    pincode_base = keys & ~PERIOD_MASK
+    lo = np.maximum(keys - lag_weeks, pincode_base)
+    running = np.vstack([np.zeros((1, enrolment.values.shape[1]), dtype=np.int64),
+                         np.cumsum(enrolment.values, axis=0)])
+    window = (running[np.searchsorted(enrolment.keys, keys, side='right')] -
+              running[np.searchsorted(enrolment.keys, lo, side='left')])
+    enrolment_columns, enrolment_total = band_columns(enrolment.columns, list(window.T))
+    update_columns, update_total = band_columns(update.columns, take_columns(update.values, in_update))
+    columns = {**enrolment_columns, **update_columns}
+    columns['Enrolment_Count'] = enrolment_total
+    columns['Update_Count'] = update_total
+    columns['in_enrolment'] = in_covered >= 0
+    columns['in_update'] = in_update >= 0
+    return cell_frame(keys, 'week', columns)
+
+
+def join_summary(joined):
+    """Cells matched on both sides or on one only, as {label: count}."""
+    both = joined['in_enrolment'] & joined['in_update']
+    return {
+        'cells': len(joined),
+        'both': int(both.sum()),
+        'enrolment_only': int((joined['in_enrolment'] & ~joined['in_update']).sum()),
+        'update_only': int((joined['in_update'] & ~joined['in_enrolment']).sum()),
+    }
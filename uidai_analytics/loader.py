@@ -0,0 +1,302 @@
+"""
+UIDAI Hackathon - Columnar CSV Loader
+Typed, chunked loading of the Aadhaar enrolment and demographic shards
+"""
+
+import os
+import re
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+ENROLMENT = 'enrolment'
+DEMOGRAPHIC = 'demographic'
+
+DATE_FORMAT = '%d-%m-%Y'
+DEFAULT_CHUNKSIZE = 500_000
+
+# Columns shared by both datasets
+KEY_DTYPES = {
+    'state': 'category',
+    'district': 'category',
+    'pincode': 'int32',
+}
+
+# Per-dataset count columns (per pincode per day, so they stay small).
+# Integer columns are parsed as int64 and narrowed by narrow_integers:
+# read_csv would silently wrap values that do not fit these types.
+COUNT_DTYPES = {
+    ENROLMENT: {
+        'age_0_5': 'uint16',
+        'age_5_17': 'uint16',
+        'age_18_greater': 'uint16',
+    },
+    DEMOGRAPHIC: {
+        'demo_age_5_17': 'uint16',
+        'demo_age_17_': 'uint32',
+    },
+}
+
+CATEGORICAL_COLUMNS = [col for col, dtype in KEY_DTYPES.items() if dtype == 'category']
+
+# Shard files end in _<first record id>_<last record id>.csv
+SHARD_RANGE_PATTERN = re.compile(r'_(\d+)_(\d+)\.csv$', re.IGNORECASE)
+
+
+def count_columns(dataset):
+    """Return the count (age band) columns of a dataset."""
+    return list(COUNT_DTYPES[dataset])
+
+
+def dataset_columns(dataset):
+    """Return the full column list of a dataset in file order."""
+    return ['date'] + list(KEY_DTYPES) + count_columns(dataset)
+
+
+def dataset_dtypes(dataset, usecols=None):
+    """Return the read_csv dtype mapping, restricted to usecols if given."""
+    dtypes = {**KEY_DTYPES, **COUNT_DTYPES[dataset]}
+    if usecols is not None:
+        dtypes = {col: dtype for col, dtype in dtypes.items() if col in usecols}
+    return dtypes
+
+
+def wide_dtypes(dtypes):
+    """The read_csv dtypes of a strict read: every integer column as int64."""
+    return {col: dtype if dtype == 'category' else 'int64' for col, dtype in dtypes.items()}
+
+
+def narrow_integers(chunk, dtypes, path):
+    """Cast the int64 columns of chunk to their narrow dtypes; ValueError if a value does not fit."""
+    for col, dtype in dtypes.items():
+        if dtype == 'category' or col not in chunk.columns:
+            continue
+        values = chunk[col].to_numpy()
+        info = np.iinfo(dtype)
+        if len(values) and (values.min() < info.min or values.max() > info.max):
+            raise ValueError(f"{path}: {col} holds values outside the {dtype} range "
+                             f"({values.min()}..{values.max()})")
+        chunk[col] = values.astype(dtype)
+    return chunk
+
+
+def detect_dataset(path):
+    """Guess the dataset of a shard from its file name."""
+    name = os.path.basename(path).lower()
+    if 'enrolment' in name:
+        return ENROLMENT
+    if 'demographic' in name:
+        return DEMOGRAPHIC
+    return None
+
+
+def parse_shard_range(path):
+    """Return the (start, end) record-ID range encoded in a shard name, or None."""
+    match = SHARD_RANGE_PATTERN.search(os.path.basename(path))
+    if match is None:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+
+def iter_chunks(path, dataset=None, usecols=None, chunksize=DEFAULT_CHUNKSIZE, validator=None):
+    """
+    Stream a shard as typed DataFrame chunks.
+
+    State/district are categorical, pincode is int32, counts are unsigned
+    and the date column is parsed while reading. Only one chunk is held in
+    memory at a time. A blank number or one that does not fit its column's
+    type raises ValueError.
+
+    With a validation.Validator every column is read and each chunk is
+    checked (and its names canonicalised) before usecols is applied; the
+    shard's quarantine file and summary are written once the last chunk
+    has been yielded.
+    """
+    dataset = dataset or detect_dataset(path)
+    if dataset not in COUNT_DTYPES:
+        raise ValueError(f"Cannot determine dataset for {path}")
+
+    if validator is None:
+        dtypes = dataset_dtypes(dataset, usecols)
+    else:
+        dtypes = validator.read_dtypes(dataset_dtypes(dataset))
+    reader = pd.read_csv(
+        path,
+        usecols=usecols if validator is None else None,
+        dtype=dtypes if validator is not None else wide_dtypes(dtypes),
+        chunksize=chunksize,
+    )
+    with reader:
+        for chunk in reader:
+            if validator is not None:
+                chunk = validator.check(chunk, path, dataset)
+                if usecols is not None:
+                    chunk = chunk[[col for col in chunk.columns if col in usecols]]
+            else:
+                chunk = narrow_integers(chunk, dtypes, path)
+                if 'date' in chunk.columns:
+                    chunk['date'] = pd.to_datetime(chunk['date'], format=DATE_FORMAT,
+                                                   errors='coerce')
+            yield chunk
+    if validator is not None:
+        validator.finish(path)
+
+
+def shard_chunks(path, dataset, usecols=None, chunksize=DEFAULT_CHUNKSIZE, cache=None,
+                 validator=None):
+    """
+    The chunks of one shard: from iter_chunks, or as one frame from a ShardCache.
+
+    The cache holds shards parsed with the strict dtypes. With a validator,
+    a shard whose numbers fail that parse is read and checked by
+    iter_chunks instead, and is not cached.
+    """
+    if cache is None:
+        return iter_chunks(path, dataset, usecols, chunksize, validator)
+    if validator is None:
+        return [cache.read_shard(path, dataset, usecols, chunksize)]
+    try:
+        frame = cache.read_shard(path, dataset, None, chunksize)
+    except ValueError:
+        return iter_chunks(path, dataset, usecols, chunksize, validator)
+    frame = validator.check_shard(frame, path, dataset)
+    return [frame if usecols is None else frame[list(usecols)]]
+
+
+def concat_frames(frames):
+    """Concatenate typed frames, keeping categorical columns categorical."""
+    frames = [frame for frame in frames if frame is not None]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+
+    for col in CATEGORICAL_COLUMNS:
+        if col not in frames[0].columns:
+            continue
+        categories = union_categoricals([frame[col] for frame in frames]).categories
+        categories = categories.sort_values()
+        for frame in frames:
+            frame[col] = frame[col].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+def read_shard(path, dataset=None, usecols=None, chunksize=DEFAULT_CHUNKSIZE, validator=None):
+    """Read a whole shard into one typed DataFrame."""
+    return concat_frames(list(iter_chunks(path, dataset, usecols, chunksize, validator)))
+
+
+def load_dataset(files, dataset, usecols=None, chunksize=DEFAULT_CHUNKSIZE, verbose=False,
+                 cache=None, validator=None):
+    """
+    Load every shard of a dataset into one typed DataFrame.
+
+    If a ShardCache is given, cached shards are opened from it and only
+    new or changed shards are parsed. A validation.Validator checks every
+    shard as it is read.
+    """
+    frames = []
+    for file in files:
+        if verbose:
+            print(f"  - Loading: {file}")
+        frames.append(concat_frames(list(shard_chunks(file, dataset, usecols, chunksize, cache,
+                                                      validator))))
+    if not frames:
+        columns = usecols or dataset_columns(dataset)
+        return pd.DataFrame(columns=columns)
+    return concat_frames(frames)
+
+
+def aggregate_chunk(chunk, keys, value_cols):
+    """Sum value_cols of one chunk by keys, with plain (non-categorical) keys."""
+    partial = chunk.groupby(list(keys), observed=True, sort=False)[value_cols].sum()
+    if isinstance(partial.index, pd.MultiIndex):
+        partial.index = pd.MultiIndex.from_arrays(
+            [level.astype(object) for level in
+             (partial.index.get_level_values(i) for i in range(partial.index.nlevels))],
+            names=partial.index.names,
+        )
+    else:
+        partial.index = partial.index.astype(object)
+    return partial.astype('int64')
+
+
+def combine_partials(partials, keys, value_cols):
+    """Fold partial group sums into one sorted aggregate frame."""
+    partials = [partial for partial in partials if len(partial)]
+    if not partials:
+        return pd.DataFrame(columns=list(keys) + list(value_cols))
+    combined = pd.concat(partials).groupby(level=list(range(len(keys)))).sum()
+    combined.index.names = list(keys)
+    return combined.reset_index()
+
+
+def level_columns(dataset, levels):
+    """Columns needed to aggregate levels: every key column once, then the counts."""
+    columns = []
+    for keys in levels.values():
+        columns.extend(col for col in keys if col not in columns)
+    return columns + count_columns(dataset)
+
+
+def aggregate_chunks(chunks, dataset, levels):
+    """
+    Sum the count columns of a stream of typed chunks by several key sets.
+
+    Returns ({name: aggregate_frame}, row_count) as aggregate_levels does,
+    holding only the folded partial sums between chunks.
+    """
+    levels = {name: list(keys) for name, keys in levels.items()}
+    value_cols = count_columns(dataset)
+    partials = {name: [] for name in levels}
+    n_rows = 0
+    for chunk in chunks:
+        n_rows += len(chunk)
+        for name, keys in levels.items():
+            level_partials = partials[name]
+            level_partials.append(aggregate_chunk(chunk.dropna(subset=keys), keys, value_cols))
+            # Fold early so the partial list never grows with the input
+            if len(level_partials) >= 16:
+                folded = combine_partials(level_partials, keys, value_cols)
+                partials[name] = [folded.set_index(keys)]
+
+    results = {name: combine_partials(partials[name], keys, value_cols)
+               for name, keys in levels.items()}
+    return results, n_rows
+
+
+def aggregate_levels(files, dataset, levels, chunksize=DEFAULT_CHUNKSIZE, verbose=False,
+                     cache=None, validator=None):
+    """
+    Sum the count columns of every shard by several key sets in one pass.
+
+    levels maps a name to a list of key columns, e.g.
+    {'state': ['state'], 'date': ['date', 'state']}. Returns
+    ({name: aggregate_frame}, row_count). Rows with a missing key are
+    dropped from that level only. Peak memory is a small multiple of one
+    chunk rather than of the whole dataset (or of one shard when reading
+    through a ShardCache). A validation.Validator checks every chunk
+    before it is summed.
+    """
+    usecols = level_columns(dataset, levels)
+
+    def chunks():
+        for file in files:
+            if verbose:
+                print(f"  - Aggregating: {file}")
+            yield from shard_chunks(file, dataset, usecols, chunksize, cache, validator)
+
+    return aggregate_chunks(chunks(), dataset, levels)
+
+
+def aggregate_files(files, dataset, keys=('state',), chunksize=DEFAULT_CHUNKSIZE,
+                    verbose=False, cache=None, validator=None):
+    """
+    Stream shards chunk by chunk and sum the count columns by keys.
+
+    Returns (aggregate_frame, row_count). Rows with a missing key are
+    dropped, matching the dropna cleaning step of the scripts.
+    """
+    results, n_rows = aggregate_levels(files, dataset, {'result': keys}, chunksize,
+                                       verbose, cache, validator)
+    return results['result'], n_rows
@@ -0,0 +1,161 @@
+"""
+UIDAI Hackathon - Stage Metrics
+Wall time, CPU time, peak RSS and row counts recorded per pipeline stage
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from .profiling import StageProfiler
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def peak_child_rss_bytes():
+    """Peak resident set size of the largest finished child process (pool worker)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def cpu_seconds():
+    """CPU time of this process plus finished child processes (worker pools)."""
+    if resource is None:
+        return time.process_time()
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+class StageRecord:
+    """Measurements of one stage; rows can be filled in by the stage body."""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows_in = None
+        self.rows_out = None
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.peak_rss_bytes = None
+        self.peak_child_rss_bytes = None
+        self.traced_peak_bytes = None
+        self.extra = {}
+
+    def to_dict(self):
+        record = {
+            'stage': self.name,
+            'wall_seconds': round(self.wall_seconds, 6),
+            'cpu_seconds': round(self.cpu_seconds, 6),
+            'peak_rss_bytes': self.peak_rss_bytes,
+            'peak_child_rss_bytes': self.peak_child_rss_bytes,
+            'traced_peak_bytes': self.traced_peak_bytes,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+        }
+        record.update(self.extra)
+        return record
+
+
+class MetricsRecorder:
+    """
+    Collects a StageRecord per stage and writes them as one JSON document.
+
+    With trace_memory every stage also records traced_peak_bytes, the
+    tracemalloc peak of Python and NumPy allocations during that stage
+    alone (ru_maxrss only ever grows over the process). Stages named in
+    profile_stages are profiled into profile_dir (see
+    profiling.StageProfiler), which implies tracing their memory. Both
+    slow the traced stages down, and their timings are marked 'profiled'.
+    """
+
+    def __init__(self, trace_memory=False, profile_stages=(), profile_dir='profiles',
+                 profile_mode='sample'):
+        self.stages = []
+        self.started = time.time()
+        self.trace_memory = trace_memory
+        self.profile_stages = set(profile_stages)
+        self.profile_dir = profile_dir
+        self.profile_mode = profile_mode
+        self.profile_files = []
+
+    @contextmanager
+    def stage(self, name):
+        record = StageRecord(name)
+        profiler = None
+        tracing = False
+        if name in self.profile_stages:
+            profiler = StageProfiler(name, self.profile_dir, self.profile_mode)
+            profiler.start()
+        elif self.trace_memory:
+            tracing = not tracemalloc.is_tracing()
+            if tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        wall_start = time.perf_counter()
+        cpu_start = cpu_seconds()
+        try:
+            yield record
+        finally:
+            record.wall_seconds = time.perf_counter() - wall_start
+            record.cpu_seconds = cpu_seconds() - cpu_start
+            if profiler is not None:
+                record.traced_peak_bytes = profiler.stop()
+                record.extra['profiled'] = self.profile_mode
+                self.profile_files.extend(profiler.files)
+            elif self.trace_memory:
+                record.traced_peak_bytes = tracemalloc.get_traced_memory()[1]
+                record.extra['profiled'] = 'tracemalloc'
+                if tracing:
+                    tracemalloc.stop()
+            record.peak_rss_bytes = peak_rss_bytes()
+            record.peak_child_rss_bytes = peak_child_rss_bytes()
+            self.stages.append(record)
+
+    def to_dict(self):
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'total_wall_seconds': round(sum(s.wall_seconds for s in self.stages), 6),
+            'stages': [s.to_dict() for s in self.stages],
+        }
+
+    def write(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary_lines(self):
+        traced = any(s.traced_peak_bytes is not None for s in self.stages)
+        lines = [f"{'Stage':<11} {'Wall s':>9} {'CPU s':>9} {'Peak RSS MB':>12} {'Rows out':>12}" +
+                 (f" {'Traced MB':>10}" if traced else '')]
+        for s in self.stages:
+            rss = f"{s.peak_rss_bytes / 1e6:.1f}" if s.peak_rss_bytes else '-'
+            rows = f"{s.rows_out:,}" if s.rows_out is not None else '-'
+            line = f"{s.name:<11} {s.wall_seconds:>9.3f} {s.cpu_seconds:>9.3f} {rss:>12} {rows:>12}"
+            if traced:
+                peak = f"{s.traced_peak_bytes / 1e6:.1f}" if s.traced_peak_bytes is not None else '-'
+                line += f" {peak:>10}"
+            lines.append(line)
+        return lines
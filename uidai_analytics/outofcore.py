@@ -0,0 +1,193 @@
+"""
+UIDAI Hackathon - Out-of-Core Aggregation
+Hash-partitioned group-by that spills partitions to disk above a memory budget
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from .loader import DEFAULT_CHUNKSIZE, count_columns, shard_chunks
+
+# Finest grouping of the shards; every other level is a roll-up of it
+LEAF_KEYS = ['date', 'state', 'district', 'pincode']
+
+DEFAULT_BUDGET_MB = 1024
+DEFAULT_PARTITIONS = 64
+
+
+def _frame_bytes(frame):
+    # deep=True also counts the Python string objects of state/district
+    return int(frame.memory_usage(index=False, deep=True).sum())
+
+
+class SpillingGroupBy:
+    """
+    Sum value columns by keys over any number of chunks in bounded memory.
+
+    Each chunk is reduced and buffered. When the buffer exceeds
+    memory_budget bytes it is merged; if it is still over half the budget,
+    its groups are routed to one of n_partitions by a hash of the key
+    values and every partition is appended to its own file in spill_dir.
+    partitions() then finishes one partition at a time, so at most one
+    partition's groups are ever held at once. Without a spill the whole
+    group-by stays in memory. Missing key values form their own groups
+    (like dropna=False).
+    """
+
+    def __init__(self, keys, value_cols, memory_budget=DEFAULT_BUDGET_MB * 1024 * 1024,
+                 n_partitions=DEFAULT_PARTITIONS, spill_dir=None):
+        self.keys = list(keys)
+        self.value_cols = list(value_cols)
+        self.memory_budget = memory_budget
+        self.n_partitions = n_partitions
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.spill_files = [[] for _ in range(n_partitions)]
+        self.spill_root = tempfile.mkdtemp(prefix='uidai_spill_', dir=spill_dir)
+        self.spills = 0
+        self.spilled_bytes = 0
+        self.peak_buffer_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        shutil.rmtree(self.spill_root, ignore_errors=True)
+
+    def _reduce(self, frame):
+        """Group-by-sum with plain (non-categorical) key columns."""
+        partial = frame.groupby(self.keys, observed=True, dropna=False, sort=False)[self.value_cols].sum()
+        partial = partial.astype('int64').reset_index()
+        for key in self.keys:
+            if isinstance(partial[key].dtype, pd.CategoricalDtype):
+                partial[key] = partial[key].astype(object)
+        return partial
+
+    def _merge(self, pieces):
+        if len(pieces) == 1:
+            return pieces[0]
+        return self._reduce(pd.concat(pieces, ignore_index=True))
+
+    def add(self, chunk):
+        """Reduce one chunk of raw records and buffer it."""
+        partial = self._reduce(chunk[self.keys + self.value_cols])
+        if not len(partial):
+            return
+        self.buffer.append(partial)
+        self.buffer_bytes += _frame_bytes(partial)
+        self.peak_buffer_bytes = max(self.peak_buffer_bytes, self.buffer_bytes)
+        if self.buffer_bytes > self.memory_budget:
+            # Merging duplicate groups may already bring the buffer under budget
+            merged = self._merge(self.buffer)
+            self.buffer = [merged]
+            self.buffer_bytes = _frame_bytes(merged)
+            if self.buffer_bytes > self.memory_budget // 2:
+                self._spill()
+
+    def _split(self, frame):
+        """Yield (partition, rows) for every partition the frame's groups hash to."""
+        part = (pd.util.hash_pandas_object(frame[self.keys], index=False).to_numpy()
+                % np.uint64(self.n_partitions)).astype(np.int64)
+        order = np.argsort(part, kind='stable')
+        bounds = np.searchsorted(part[order], np.arange(self.n_partitions + 1))
+        for p in np.flatnonzero(np.diff(bounds)):
+            yield p, frame.iloc[order[bounds[p]:bounds[p + 1]]].reset_index(drop=True)
+
+    def _spill(self):
+        for p, piece in self._split(self._merge(self.buffer)):
+            path = os.path.join(self.spill_root, f"part-{p:04d}-{len(self.spill_files[p]):05d}.pkl")
+            piece.to_pickle(path)
+            self.spill_files[p].append(path)
+            self.spilled_bytes += os.path.getsize(path)
+        self.spills += 1
+        self.buffer = []
+        self.buffer_bytes = 0
+
+    def partitions(self):
+        """Yield the final aggregate of each non-empty partition, one at a time."""
+        buffered = self._merge(self.buffer) if self.buffer else None
+        self.buffer = []
+        self.buffer_bytes = 0
+        if not self.spills:
+            if buffered is not None:
+                yield buffered
+            return
+
+        in_memory = dict(self._split(buffered)) if buffered is not None else {}
+        del buffered
+        for p in range(self.n_partitions):
+            pieces = [pd.read_pickle(path) for path in self.spill_files[p]]
+            if p in in_memory:
+                pieces.append(in_memory.pop(p))
+            if pieces:
+                yield self._merge(pieces)
+            for path in self.spill_files[p]:
+                os.remove(path)
+            self.spill_files[p] = []
+
+    def stats(self):
+        return {'partitions': self.n_partitions, 'spills': self.spills,
+                'spilled_bytes': self.spilled_bytes, 'peak_buffer_bytes': self.peak_buffer_bytes}
+
+
+def rollup(frame, keys, value_cols):
+    """Sum value_cols by keys, dropping rows with a missing key (like aggregate_levels)."""
+    return frame.dropna(subset=keys).groupby(keys, sort=False)[value_cols].sum()
+
+
+def _combine(pieces, keys):
+    combined = pd.concat(pieces).groupby(level=list(range(len(keys)))).sum()
+    combined.index.names = keys
+    return combined
+
+
+def aggregate_out_of_core(files, dataset, levels, memory_budget_mb=DEFAULT_BUDGET_MB,
+                          n_partitions=DEFAULT_PARTITIONS, spill_dir=None,
+                          chunksize=DEFAULT_CHUNKSIZE, verbose=False, cache=None,
+                          validator=None):
+    """
+    Stream shards through a SpillingGroupBy on the leaf keys and roll it up.
+
+    levels maps a name to key columns drawn from LEAF_KEYS, as for
+    aggregate_levels, and the return value is the same
+    ({name: aggregate_frame}, row_count), plus a dict of spill statistics.
+    Only the roll-ups are held in memory at the end, never the raw rows or
+    the whole leaf table.
+    """
+    levels = {name: list(keys) for name, keys in levels.items()}
+    value_cols = count_columns(dataset)
+    memory_budget = memory_budget_mb * 1024 * 1024
+    partials = {name: [] for name in levels}
+    n_rows = 0
+
+    with SpillingGroupBy(LEAF_KEYS, value_cols, memory_budget, n_partitions, spill_dir) as groupby:
+        for file in files:
+            if verbose:
+                print(f"  - Streaming: {file}")
+            for chunk in shard_chunks(file, dataset, None, chunksize, cache, validator):
+                n_rows += len(chunk)
+                groupby.add(chunk)
+
+        for leaf in groupby.partitions():
+            for name, keys in levels.items():
+                partials[name].append(rollup(leaf, keys, value_cols))
+                # The same unit appears in many partitions, so fold early
+                if len(partials[name]) >= 16:
+                    partials[name] = [_combine(partials[name], keys)]
+        stats = groupby.stats()
+
+    results = {}
+    for name, keys in levels.items():
+        pieces = [piece for piece in partials[name] if len(piece)]
+        if pieces:
+            results[name] = _combine(pieces, keys).astype('int64').reset_index()
+        else:
+            results[name] = pd.DataFrame(columns=keys + value_cols)
+    return results, n_rows, stats
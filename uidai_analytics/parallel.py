@@ -0,0 +1,191 @@
+"""
+UIDAI Hackathon - Parallel Shard Loading
+Fans shard parsing out over a process pool and merges the results in order
+"""
+
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .loader import (DEFAULT_CHUNKSIZE, aggregate_levels, combine_partials,
+                     concat_frames, count_columns, dataset_columns, shard_chunks)
+
+
+def default_workers():
+    """Number of worker processes to use when none is given."""
+    return os.cpu_count() or 1
+
+
+def _pool_context():
+    # Prefer fork where available: workers start without re-importing
+    # pandas and the calling script
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def _aggregate_shard(task):
+    path, dataset, levels, chunksize, cache, validator = task
+    return aggregate_levels([path], dataset, levels, chunksize=chunksize, cache=cache,
+                            validator=validator)
+
+
+def _read_shard(task):
+    path, dataset, usecols, chunksize, cache, validator = task
+    return concat_frames(list(shard_chunks(path, dataset, usecols, chunksize, cache, validator)))
+
+
+def _aggregate_records(task):
+    store, dataset, levels, start, stop = task
+    return store.aggregate_levels(dataset, levels, start, stop)
+
+
+def _run(worker, tasks, workers):
+    if workers is None:
+        workers = default_workers()
+    workers = max(1, min(workers, len(tasks)))
+    if workers == 1:
+        return [worker(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as executor:
+        # map() yields results in submission order, which keeps the merge ordered
+        return list(executor.map(worker, tasks))
+
+
+def aggregate_shards_parallel(files, dataset, levels, workers=None,
+                              chunksize=DEFAULT_CHUNKSIZE, verbose=False, cache=None,
+                              validator=None):
+    """Aggregate every shard separately; return [({name: frame}, row_count)] in file order."""
+    levels = {name: list(keys) for name, keys in levels.items()}
+    tasks = [(file, dataset, levels, chunksize, cache, validator) for file in files]
+    if verbose:
+        for file in files:
+            print(f"  - Aggregating: {file}")
+    return _run(_aggregate_shard, tasks, workers)
+
+
+def aggregate_levels_parallel(files, dataset, levels, workers=None,
+                              chunksize=DEFAULT_CHUNKSIZE, verbose=False, cache=None,
+                              validator=None):
+    """
+    Pre-aggregate each shard in a worker process and merge the partial sums.
+
+    Returns ({name: aggregate_frame}, row_count), the same as aggregate_levels.
+    """
+    levels = {name: list(keys) for name, keys in levels.items()}
+    results = aggregate_shards_parallel(files, dataset, levels, workers, chunksize, verbose, cache,
+                                        validator)
+    return merge_partials(results, dataset, levels)
+
+
+def merge_partials(results, dataset, levels):
+    """Fold [({name: frame}, row_count)] partial results into ({name: frame}, row_count)."""
+    value_cols = count_columns(dataset)
+    merged = {}
+    for name, keys in levels.items():
+        partials = [part_levels[name].set_index(keys) for part_levels, _ in results]
+        merged[name] = combine_partials(partials, keys, value_cols)
+    n_rows = sum(n for _, n in results)
+    return merged, n_rows
+
+
+class LogQuantileSketch:
+    """
+    Mergeable quantile sketch of non-negative values with bounded relative error.
+
+    Values are counted in logarithmic buckets a factor (1 + a) / (1 - a)
+    apart, so every quantile comes back within relative error a. Two
+    sketches merge by adding bucket counts: partial sketches built by
+    separate workers combine in any order into the sketch of all values.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.count = 0
+        self.zeros = 0
+        self.buckets = {}
+
+    def add_many(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if (values < 0).any():
+            raise ValueError("LogQuantileSketch only holds non-negative values")
+        positive = values[values > 0]
+        keys, counts = np.unique(np.ceil(np.log(positive) / self.log_gamma).astype(np.int64),
+                                 return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zeros += len(values) - len(positive)
+        self.count += len(values)
+
+    def merge(self, other):
+        """Fold another sketch of the same accuracy in."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches of different relative accuracy")
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        return self
+
+    def quantile(self, q):
+        if not self.count:
+            return float('nan')
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # Midpoint of the bucket (gamma^(key-1), gamma^key] in relative terms
+                return 2 * self.gamma ** key / (self.gamma + 1)
+
+
+def aggregate_files_parallel(files, dataset, keys=('state',), workers=None,
+                             chunksize=DEFAULT_CHUNKSIZE, verbose=False, cache=None,
+                             validator=None):
+    """Parallel counterpart of aggregate_files, returning (aggregate_frame, row_count)."""
+    results, n_rows = aggregate_levels_parallel(files, dataset, {'result': keys}, workers,
+                                                chunksize, verbose, cache, validator)
+    return results['result'], n_rows
+
+
+def load_dataset_parallel(files, dataset, usecols=None, workers=None,
+                          chunksize=DEFAULT_CHUNKSIZE, verbose=False, cache=None, validator=None):
+    """
+    Parse shards in worker processes and concatenate them in file order.
+
+    A validation.Validator is pickled to the workers with each task; every
+    worker writes the quarantine file and summary of the shards it reads.
+    """
+    tasks = [(file, dataset, usecols, chunksize, cache, validator) for file in files]
+    if verbose:
+        for file in files:
+            print(f"  - Loading: {file}")
+    frames = _run(_read_shard, tasks, workers)
+    if not frames:
+        return pd.DataFrame(columns=usecols or dataset_columns(dataset))
+    return concat_frames(frames)
+
+
+def aggregate_records_parallel(store, dataset, levels, workers=None):
+    """
+    Aggregate a recordstore.RecordStore in equal row ranges across worker processes.
+
+    Each worker maps the store's record file itself, so the records are
+    shared through the page cache instead of being parsed or pickled.
+    Returns ({name: aggregate_frame}, row_count), as aggregate_levels.
+    """
+    levels = {name: list(keys) for name, keys in levels.items()}
+    n_rows = store.row_count(dataset)
+    if workers is None:
+        workers = default_workers()
+    bounds = np.linspace(0, n_rows, max(1, min(workers, n_rows)) + 1).astype(int)
+    tasks = [(store, dataset, levels, start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+    return merge_partials(_run(_aggregate_records, tasks, workers), dataset, levels)
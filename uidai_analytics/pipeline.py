@@ -0,0 +1,366 @@
+"""
+UIDAI Hackathon - Staged Pipeline
+discover -> load -> clean -> aggregate -> score -> render -> report, each callable on its own
+"""
+
+import os
+
+from .analysis import build_merged_df, iqr_bounds, minmax_normalize
+from .detectors import run_detectors, unit_counts
+from .discovery import discover_shards
+from .export import REPORT_FORMATS, build_report, write_report
+from .hierarchy import LEVEL_KEYS, score_hierarchy
+from .loader import DEMOGRAPHIC, ENROLMENT, count_columns
+from .metrics import MetricsRecorder
+from .outofcore import aggregate_out_of_core, rollup
+from .parallel import load_dataset_parallel
+from .rendering import (boxplot_payload, combo_payload, daily_trend_payload, heatmap_payload,
+                        render_charts)
+from .rollup import build_rollup
+from .trends import detect_trends, rolling_mean
+from .validation import Validator, quality_lines
+
+STAGES = ('discover', 'load', 'clean', 'aggregate', 'score', 'render', 'report')
+
+
+def stage_list(text):
+    """Parse a comma-separated list of stage names ('all' for every one), e.g. for argparse."""
+    if text.strip() == 'all':
+        return list(STAGES)
+    names = [name.strip() for name in text.split(',') if name.strip()]
+    unknown = [name for name in names if name not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stage(s) {', '.join(unknown)}; "
+                         f"expected any of {', '.join(STAGES)}")
+    return names
+
+
+# Aggregate tables built by the aggregate stage, keyed like LEVEL_KEYS
+AGGREGATE_LEVELS = {
+    'state': LEVEL_KEYS['state'],
+    'pincode': LEVEL_KEYS['pincode'],
+    'date': ['date', 'state'],
+}
+
+
+def discover(root='.', manifest=None, patterns=None, id_range=None):
+    """Find and range-check the shards of both datasets. Returns a discovery.Discovery."""
+    return discover_shards(root, manifest, patterns, id_range)
+
+
+def load(files, workers=1, cache=None, verbose=False, validator=None):
+    """Parse every shard into one typed frame per dataset, checked by validator if given."""
+    return {dataset: load_dataset_parallel(paths, dataset, workers=workers, verbose=verbose,
+                                           cache=cache, validator=validator)
+            for dataset, paths in files.items()}
+
+
+def clean(frames):
+    """Drop records without a state. Returns (frames, {dataset: rows dropped})."""
+    cleaned = {}
+    dropped = {}
+    for dataset, frame in frames.items():
+        cleaned[dataset] = frame.dropna(subset=['state'])
+        dropped[dataset] = len(frame) - len(cleaned[dataset])
+    return cleaned, dropped
+
+
+def aggregate(frames, levels=None):
+    """
+    Sum the count columns of each dataset per level. Returns {dataset: {level: frame}}.
+
+    Each dataset is materialized once as a RollupCube and every level is
+    sliced from it rather than grouped from the records again.
+    """
+    levels = levels or AGGREGATE_LEVELS
+    aggregates = {}
+    for dataset, frame in frames.items():
+        cube = build_rollup(frame, dataset)
+        aggregates[dataset] = {name: cube.table(keys) for name, keys in levels.items()}
+    return aggregates
+
+
+def score(aggregates, k=1.5, window=7, threshold=3.0, detectors=None, merge='inner'):
+    """
+    State ratios with IQR bounds, the district/pincode hierarchy and daily spikes.
+
+    merge is the analysis.build_merged_df join of the state totals
+    ('inner' keeps only states present in both datasets). With detectors (a list of detectors.DETECTORS names) the detector
+    suite also scores every level. Returns a dict of results consumed by
+    the render and report stages.
+    """
+    enrolment, update = aggregates[ENROLMENT], aggregates[DEMOGRAPHIC]
+    merged_df = build_merged_df(enrolment['state'], update['state'], how=merge)
+    q1, q3, iqr, lower, upper = iqr_bounds(merged_df['Update_Ratio'], k)
+    hierarchy = score_hierarchy(enrolment['pincode'], update['pincode'], k=k)
+    update_trends = detect_trends(update['date'], DEMOGRAPHIC, level='state', window=window,
+                                  threshold=threshold)
+    return {
+        'merged_df': merged_df,
+        'thresholds': {'Q1': q1, 'Q3': q3, 'IQR': iqr, 'lower_bound': lower, 'upper_bound': upper},
+        'outliers': merged_df[merged_df['Update_Ratio'] > upper],
+        'hierarchy': hierarchy,
+        'update_trends': update_trends,
+        'update_spikes': update_trends.spike_table(),
+        'detections': detect(aggregates, detectors) if detectors else {},
+    }
+
+
+def detect(aggregates, names=None):
+    """
+    Run the detector suite at state, district and pincode level.
+
+    District tables are rolled up from the pincode aggregates; only the
+    state level has a daily series, so the seasonal detector reports the
+    district and pincode levels as not scored. Returns
+    {level: detectors.DetectionResult}.
+    """
+    tables = {level: {dataset: aggregates[dataset][level] for dataset in aggregates}
+              for level in ('state', 'pincode')}
+    tables['district'] = {dataset: rollup(aggregates[dataset]['pincode'], LEVEL_KEYS['district'],
+                                          count_columns(dataset)).reset_index()
+                          for dataset in aggregates}
+    detections = {}
+    for level in LEVEL_KEYS:
+        daily = aggregates[DEMOGRAPHIC]['date'] if level == 'state' else None
+        data = unit_counts(tables[level][ENROLMENT], tables[level][DEMOGRAPHIC], level, daily)
+        detections[level] = run_detectors(data, names)
+    return detections
+
+
+def chart_jobs(scores):
+    """Payloads of the advanced charts and the daily trend chart."""
+    merged_df = scores['merged_df']
+    t = scores['thresholds']
+    jobs = [('advanced_boxplot_outliers',
+             boxplot_payload(merged_df, scores['outliers'], t['Q1'], t['Q3'], t['IQR'],
+                             t['upper_bound']))]
+
+    activity = merged_df['Enrolment_Count'] + merged_df['Update_Count']
+    top_20_states = merged_df.loc[activity.nlargest(20).index]
+    normalized = minmax_normalize(top_20_states[['Enrolment_Count', 'Update_Count', 'Update_Ratio']])
+    normalized.columns = ['Enrolment\n(Normalized)', 'Updates\n(Normalized)',
+                          'Risk Ratio\n(Normalized)']
+    normalized.index = top_20_states['state'].values
+    jobs.append(('advanced_risk_heatmap',
+                 heatmap_payload(normalized, top_20_states['Update_Ratio'], t['upper_bound'],
+                                 t['Q3'])))
+    jobs.append(('advanced_combo_chart',
+                 combo_payload(merged_df.nlargest(10, 'Update_Ratio'), t['upper_bound'])))
+
+    trends = scores['update_trends']
+    daily = trends.totals.sum(axis=1)
+    jobs.append(('daily_trend_analysis', daily_trend_payload(
+        trends.cube.dates, daily, rolling_mean(daily, trends.window), trends.spikes.any(axis=1),
+        trends.window)))
+    return jobs
+
+
+def render(scores, output_dir='output_visualizations', fmt='png', dpi=300, workers=None, force=False):
+    """Draw the charts, skipping unchanged ones. Returns [(name, path, rendered)]."""
+    os.makedirs(output_dir, exist_ok=True)
+    return render_charts(chart_jobs(scores), output_dir, fmt=fmt, dpi=dpi, workers=workers,
+                         force=force)
+
+
+def report(scores, row_counts, rendered=(), report_dir=None, report_formats=REPORT_FORMATS):
+    """
+    Print the key findings and return them as a plain dict.
+
+    With report_dir the findings are also written there as an
+    export.build_report document (JSON) and unit table (Parquet).
+    """
+    merged_df = scores['merged_df']
+    upper = scores['thresholds']['upper_bound']
+    hierarchy = scores['hierarchy']
+
+    print("\n🔍 KEY INSIGHTS:")
+    print(f"  Records analyzed: {row_counts[ENROLMENT]:,} enrolment, "
+          f"{row_counts[DEMOGRAPHIC]:,} update")
+    print(f"  States analyzed: {len(merged_df)}")
+    print(f"  Outlier Threshold (IQR Method): {upper:.2f}")
+    print(f"  Statistical Outliers Detected: {len(scores['outliers'])}")
+    for level in ('district', 'pincode'):
+        print(f"  {level.title()} outliers: {int(hierarchy.units[level]['is_outlier'].sum()):,}")
+    print(f"  Update activity spikes (state x day): {len(scores['update_spikes'])}")
+    for level, detection in scores['detections'].items():
+        print(f"  {level.title()} detector flags: {detection.flag_line()}")
+
+    print(f"\n  Top 5 High-Risk States:")
+    for i, (state, ratio) in enumerate(zip(merged_df['state'].head(5),
+                                           merged_df['Update_Ratio'].head(5))):
+        risk_level = "🚨 CRITICAL" if ratio > upper else "⚠️ HIGH"
+        print(f"    {i+1}. {state:<35} Ratio: {ratio:>6.2f}  {risk_level}")
+
+    if rendered:
+        print("\n📊 VISUALIZATIONS:")
+        for name, path, was_rendered in rendered:
+            print(f"  {path}{'' if was_rendered else ' (unchanged)'}")
+
+    report_files = []
+    if report_dir:
+        document, units = build_report(merged_df, scores['thresholds'], hierarchy, row_counts,
+                                       scores['detections'], scores['update_spikes'])
+        report_files = write_report(document, units, report_dir, report_formats)
+        print("\n📄 REPORT:")
+        for path in report_files:
+            print(f"  {path}")
+
+    return {
+        'records': dict(row_counts),
+        'states_analyzed': len(merged_df),
+        'thresholds': {key: float(value) for key, value in scores['thresholds'].items()},
+        'state_outliers': scores['outliers']['state'].tolist(),
+        'district_outliers': int(hierarchy.units['district']['is_outlier'].sum()),
+        'pincode_outliers': int(hierarchy.units['pincode']['is_outlier'].sum()),
+        'update_spikes': len(scores['update_spikes']),
+        'detectors': {level: detection.counts() for level, detection in scores['detections'].items()},
+        'charts': [path for _, path, _ in rendered],
+        'report_files': report_files,
+    }
+
+
+def run_pipeline(root='.', output_dir='output_visualizations', workers=1, cache=None,
+                 fmt='png', dpi=300, force=False, stop_after='report', metrics=None,
+                 verbose=False, manifest=None, patterns=None, memory_budget_mb=None,
+                 spill_dir=None, detectors=None, plots=True, report_dir=None,
+                 report_formats=REPORT_FORMATS, quarantine_dir=None, id_range=None,
+                 merge='inner', render_workers=None):
+    """
+    Run the stages in order up to stop_after, timing each one.
+
+    Returns (results, metrics): results maps each stage that ran to its
+    output and metrics is the MetricsRecorder holding the measurements.
+    The loaded and cleaned frames are released once they are aggregated,
+    so only the last of load/clean/aggregate that ran is kept.
+
+    With memory_budget_mb the raw records are never materialised: load
+    and clean are skipped and the aggregate stage streams the shards
+    through the out-of-core group-by, spilling to spill_dir.
+
+    With plots=False the render stage is skipped and matplotlib is never
+    imported; report_dir adds the JSON/Parquet report to the report stage.
+
+    With quarantine_dir every record is validated as it is parsed (see
+    validation.Validator): failing records are left out and written
+    there with a per-shard quality summary.
+
+    id_range=(start, end) keeps only the shards whose record-ID range
+    intersects [start, end); shards are pruned by name, not filtered row
+    by row.
+
+    merge picks the states that get a ratio (see score). workers is the
+    number of shard-parsing processes; charts are drawn by render_workers
+    processes, by default one per chart up to the CPU count.
+    """
+    if stop_after not in STAGES:
+        raise ValueError(f"Unknown stage {stop_after!r}; expected one of {', '.join(STAGES)}")
+    last = STAGES.index(stop_after)
+    metrics = metrics or MetricsRecorder()
+    results = {}
+
+    def wanted(stage):
+        return STAGES.index(stage) <= last
+
+    with metrics.stage('discover') as stage:
+        discovery = results['discover'] = discover(root, manifest, patterns, id_range)
+        files = {dataset: discovery.files(dataset) for dataset in (ENROLMENT, DEMOGRAPHIC)}
+        stage.rows_out = len(discovery.shards)
+        stage.extra['shards'] = {dataset: len(paths) for dataset, paths in files.items()}
+        stage.extra['shards_skipped'] = (len(discovery.duplicates) + len(discovery.contained) +
+                                         len(discovery.out_of_range))
+        stage.extra['gaps'] = len(discovery.gaps)
+        stage.extra['overlaps'] = len(discovery.overlaps)
+    for line in discovery.report_lines():
+        print(f"Warning: {line}")
+    if not wanted('load'):
+        return results, metrics
+
+    validator = None
+    if quarantine_dir is not None:
+        validator = Validator.for_discovery(discovery, quarantine_dir)
+
+    def report_quality(stage):
+        quality = validator.report(discovery.files(ENROLMENT) + discovery.files(DEMOGRAPHIC))
+        stage.extra['quarantined'] = int(quality['rows'].sum() - quality['kept'].sum())
+        for line in quality_lines(quality):
+            print(line)
+
+    if memory_budget_mb is None:
+        with metrics.stage('load') as stage:
+            frames = results['load'] = load(files, workers=workers, cache=cache, verbose=verbose,
+                                            validator=validator)
+            stage.rows_out = sum(len(frame) for frame in frames.values())
+            stage.extra['bytes_in'] = sum(os.path.getsize(path) for paths in files.values()
+                                          for path in paths)
+            if validator is not None:
+                report_quality(stage)
+        row_counts = {dataset: len(frame) for dataset, frame in frames.items()}
+        if not wanted('clean'):
+            return results, metrics
+
+        with metrics.stage('clean') as stage:
+            stage.rows_in = sum(row_counts.values())
+            frames, dropped = clean(frames)
+            results['clean'] = frames
+            stage.rows_out = sum(len(frame) for frame in frames.values())
+            stage.extra['rows_dropped'] = dropped
+        del results['load']
+        if not wanted('aggregate'):
+            return results, metrics
+
+        with metrics.stage('aggregate') as stage:
+            stage.rows_in = sum(len(frame) for frame in frames.values())
+            aggregates = results['aggregate'] = aggregate(frames)
+            stage.rows_out = sum(len(table) for levels in aggregates.values()
+                                 for table in levels.values())
+        del frames, results['clean']
+    else:
+        if not wanted('aggregate'):
+            return results, metrics
+        with metrics.stage('aggregate') as stage:
+            aggregates = results['aggregate'] = {}
+            row_counts = {}
+            spills = spilled = 0
+            for dataset, paths in files.items():
+                aggregates[dataset], row_counts[dataset], stats = aggregate_out_of_core(
+                    paths, dataset, AGGREGATE_LEVELS, memory_budget_mb, spill_dir=spill_dir,
+                    verbose=verbose, cache=cache, validator=validator)
+                spills += stats['spills']
+                spilled += stats['spilled_bytes']
+            stage.rows_in = sum(row_counts.values())
+            stage.rows_out = sum(len(table) for levels in aggregates.values()
+                                 for table in levels.values())
+            stage.extra.update(mode='out-of-core', spills=spills, spilled_bytes=spilled)
+            if validator is not None:
+                report_quality(stage)
+    if not wanted('score'):
+        return results, metrics
+
+    with metrics.stage('score') as stage:
+        stage.rows_in = sum(len(table) for levels in aggregates.values()
+                            for table in levels.values())
+        scores = results['score'] = score(aggregates, detectors=detectors, merge=merge)
+        stage.rows_out = sum(len(table) for table in scores['hierarchy'].units.values())
+        if scores['detections']:
+            stage.extra['detector_seconds'] = {
+                level: {name: round(seconds, 6) for name, seconds in detection.seconds.items()}
+                for level, detection in scores['detections'].items()}
+    if not wanted('render'):
+        return results, metrics
+
+    rendered = ()
+    if plots:
+        with metrics.stage('render') as stage:
+            rendered = results['render'] = render(scores, output_dir, fmt=fmt, dpi=dpi,
+                                                  workers=render_workers, force=force)
+            stage.rows_out = sum(1 for _, _, was_rendered in rendered if was_rendered)
+            stage.extra['charts_skipped'] = len(rendered) - stage.rows_out
+    if not wanted('report'):
+        return results, metrics
+
+    with metrics.stage('report') as stage:
+        results['report'] = report(scores, row_counts, rendered, report_dir, report_formats)
+        stage.rows_out = len(scores['merged_df'])
+        stage.extra['report_files'] = len(results['report']['report_files'])
+    return results, metrics
@@ -0,0 +1,141 @@
+"""
+UIDAI Hackathon - Stage Profiling
+Opt-in CPU and memory profiles of pipeline stages, written as flame-graph stacks,
+pstats files and tracemalloc allocation summaries
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+
+PROFILE_MODES = ('sample', 'cprofile')
+
+# Time between stack samples of the sampling profiler
+SAMPLE_INTERVAL_SECONDS = 0.001
+
+# Allocation sites listed per stage in <stage>.memory.txt
+TOP_ALLOCATIONS = 25
+
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Statistical profiler recording collapsed call stacks, in the manner of pyinstrument.
+
+    A sys.setprofile hook looks at the stack on call and return events,
+    at most once per interval, and charges the time since the previous
+    sample to the stack it finds. Because the hook also sees C calls
+    returning, time spent inside numpy/pandas extension code that holds
+    the GIL is attributed to the right frame, which a timer thread could
+    not do. Stacks are weighted in microseconds.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.stacks = {}
+        self.last = None
+
+    def _hook(self, frame, event, arg):
+        now = time.perf_counter()
+        elapsed = now - self.last
+        if elapsed < self.interval:
+            return
+        self.last = now
+        labels = []
+        if event in ('c_return', 'c_exception'):
+            # The elapsed time was (mostly) spent inside the C function
+            labels.append(f"{getattr(arg, '__qualname__', repr(arg))} (C)")
+        elif event == 'call':
+            # The new frame has barely started; the time belongs to its caller
+            frame = frame.f_back
+        while frame is not None:
+            labels.append(frame_label(frame.f_code))
+            frame = frame.f_back
+        stack = ';'.join(reversed(labels))
+        self.stacks[stack] = self.stacks.get(stack, 0) + int(elapsed * 1e6)
+
+    def start(self):
+        self.last = time.perf_counter()
+        sys.setprofile(self._hook)
+
+    def stop(self):
+        sys.setprofile(None)
+
+    def collapsed_lines(self):
+        """'frame;frame;frame microseconds' lines, the input of flamegraph.pl, speedscope and inferno."""
+        return [f"{stack} {weight}" for stack, weight in sorted(self.stacks.items()) if weight]
+
+
+class StageProfiler:
+    """
+    Profiles one stage: CPU (sampled or cProfile) plus tracemalloc.
+
+    Files written to profile_dir on stop():
+      <stage>.collapsed    sampled stacks for flame graphs (mode 'sample')
+      <stage>.prof         pstats file, e.g. for snakeviz (mode 'cprofile')
+      <stage>.txt          the 30 functions with the highest cumulative time (mode 'cprofile')
+      <stage>.memory.txt   traced peak and the largest allocation sites still live at the end
+    Only the calling process is seen, so profile with one worker.
+    """
+
+    def __init__(self, name, profile_dir, mode='sample', interval=SAMPLE_INTERVAL_SECONDS):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}; expected one of {', '.join(PROFILE_MODES)}")
+        self.name = name
+        self.profile_dir = profile_dir
+        self.mode = mode
+        self.profiler = StackSampler(interval) if mode == 'sample' else cProfile.Profile()
+        self.started_tracing = False
+        self.files = []
+
+    def start(self):
+        self.started_tracing = not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        if self.mode == 'sample':
+            self.profiler.start()
+        else:
+            self.profiler.enable()
+
+    def stop(self):
+        """Stop profiling and write the files; returns the traced peak in bytes."""
+        if self.mode == 'sample':
+            self.profiler.stop()
+        else:
+            self.profiler.disable()
+        _, traced_peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)])
+        if self.started_tracing:
+            tracemalloc.stop()
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        base = os.path.join(self.profile_dir, self.name)
+        if self.mode == 'sample':
+            self._write(f"{base}.collapsed", self.profiler.collapsed_lines())
+        else:
+            self.profiler.dump_stats(f"{base}.prof")
+            self.files.append(f"{base}.prof")
+            with open(f"{base}.txt", 'w') as f:
+                pstats.Stats(self.profiler, stream=f).sort_stats('cumulative').print_stats(30)
+            self.files.append(f"{base}.txt")
+        lines = [f"Traced peak: {traced_peak / 1e6:.1f} MB", "Largest live allocation sites:"]
+        for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+            frame = stat.traceback[0]
+            lines.append(f"{stat.size / 1e6:>10.2f} MB {stat.count:>9,} blocks  "
+                         f"{frame.filename}:{frame.lineno}")
+        self._write(f"{base}.memory.txt", lines)
+        return traced_peak
+
+    def _write(self, path, lines):
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        self.files.append(path)
+
@@ -0,0 +1,233 @@
+"""
+UIDAI Hackathon - Memory-Mapped Record Store
+Raw records as fixed-width NumPy structured arrays, parsed from CSV once and
+opened with np.memmap by every later run
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .incremental import shard_id
+from .loader import (COUNT_DTYPES, DEFAULT_CHUNKSIZE, DEMOGRAPHIC, ENROLMENT, aggregate_chunks,
+                     dataset_columns, iter_chunks, level_columns, parse_shard_range)
+
+RECORD_STORE_VERSION = 1
+
+# Day numbers count from the Unix epoch; this one stands for a missing date
+MISSING_DAY = np.iinfo(np.int32).min
+
+# Dictionary-encoded columns: code -1 is a missing value
+CODED_COLUMNS = ('state', 'district')
+
+
+def record_dtype(dataset):
+    """
+    Fixed-width little-endian record of a dataset, packed without padding.
+
+    date is an int32 day number, state and district int16 codes into the
+    store's dictionaries, pincode int32 and the counts keep the loader's
+    unsigned types: 18 bytes per enrolment record, 16 per demographic.
+    """
+    fields = [('date', '<i4'), ('state', '<i2'), ('district', '<i2'), ('pincode', '<i4')]
+    fields += [(col, np.dtype(dtype).newbyteorder('<')) for col, dtype in COUNT_DTYPES[dataset].items()]
+    return np.dtype(fields)
+
+
+class RecordStore:
+    """
+    Directory holding every ingested record of both datasets in binary form.
+
+    <dataset>.records is the records back to back in ingestion order and
+    manifest.json the row counts, per-shard row ranges and the state and
+    district dictionaries. Records are appended first and the manifest
+    is replaced afterwards, so the manifest never counts a record that
+    was not fully written; bytes past its row count are ignored and
+    overwritten by the next ingest.
+
+    The record files are opened read-only with np.memmap: slices are
+    views of the mapped pages and every process on the host that opens
+    the store shares them through the page cache. A RecordStore pickles
+    without its maps, so it can be handed to worker processes.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+        self.manifest = {
+            'version': RECORD_STORE_VERSION,
+            'datasets': {dataset: {'rows': 0, 'shards': {}, 'state': [], 'district': []}
+                         for dataset in (ENROLMENT, DEMOGRAPHIC)},
+        }
+        path = self._path('manifest.json')
+        if os.path.exists(path):
+            with open(path) as f:
+                manifest = json.load(f)
+            if manifest.get('version') != RECORD_STORE_VERSION:
+                raise ValueError(f"Record store {store_dir} has format version "
+                                 f"{manifest.get('version')}; rebuild it")
+            self.manifest = manifest
+        self._maps = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_maps'] = {}
+        return state
+
+    def _path(self, name):
+        return os.path.join(self.store_dir, name)
+
+    def _save(self):
+        path = self._path('manifest.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(path + '.tmp', path)
+        self._maps = {}
+
+    # ------------------------------------------------------------------
+    # Ingestion
+    # ------------------------------------------------------------------
+    def pending(self, files, dataset):
+        """Return the shards of files that have not been stored yet."""
+        stored = self.manifest['datasets'][dataset]['shards']
+        delta = []
+        for path in files:
+            sid = shard_id(path)
+            if sid not in stored:
+                delta.append(path)
+            elif stored[sid]['size'] != os.path.getsize(path):
+                raise ValueError(f"Shard {path} changed after it was stored; "
+                                 f"rebuild the record store {self.store_dir}")
+        return delta
+
+    def _encode(self, chunk, dataset):
+        """Structured records of one typed chunk, extending the dictionaries with new names."""
+        meta = self.manifest['datasets'][dataset]
+        records = np.empty(len(chunk), dtype=record_dtype(dataset))
+        days = chunk['date'].to_numpy(dtype='datetime64[D]')
+        records['date'] = np.where(np.isnat(days), MISSING_DAY, days.astype('int64'))
+        for col in CODED_COLUMNS:
+            names = meta[col]
+            index = {name: code for code, name in enumerate(names)}
+            for name in chunk[col].cat.categories:
+                if name not in index:
+                    index[name] = len(names)
+                    names.append(name)
+            if len(names) > np.iinfo(np.int16).max:
+                raise ValueError(f"More than {np.iinfo(np.int16).max} {col} names in {dataset}")
+            codes = np.array([index[name] for name in chunk[col].cat.categories] + [-1], dtype='int16')
+            records[col] = codes[chunk[col].cat.codes.to_numpy()]
+        records['pincode'] = chunk['pincode'].to_numpy()
+        for col in COUNT_DTYPES[dataset]:
+            records[col] = chunk[col].to_numpy()
+        return records
+
+    def ingest(self, enrolment_files, demographic_files, chunksize=DEFAULT_CHUNKSIZE,
+               verbose=False, validator=None):
+        """
+        Parse every shard not yet stored and append its records; return the number stored.
+
+        A validation.Validator checks the new shards as they are parsed:
+        the stored records keep whatever checks were in force when each
+        shard was ingested.
+        """
+        ingested = 0
+        for dataset, files in ((ENROLMENT, enrolment_files), (DEMOGRAPHIC, demographic_files)):
+            meta = self.manifest['datasets'][dataset]
+            itemsize = record_dtype(dataset).itemsize
+            for path in self.pending(files, dataset):
+                if verbose:
+                    print(f"  - Storing: {path}")
+                first = meta['rows']
+                with open(self._path(f"{dataset}.records"), 'ab') as f:
+                    # Drop the tail of an ingest that died before its manifest was saved
+                    f.truncate(first * itemsize)
+                    for chunk in iter_chunks(path, dataset, chunksize=chunksize, validator=validator):
+                        f.write(self._encode(chunk, dataset).tobytes())
+                        meta['rows'] += len(chunk)
+                    f.flush()
+                    os.fsync(f.fileno())
+                meta['shards'][shard_id(path)] = {
+                    'file': os.path.basename(path),
+                    'range': parse_shard_range(path),
+                    'size': os.path.getsize(path),
+                    'first_row': first,
+                    'rows': meta['rows'] - first,
+                }
+                self._save()
+                ingested += 1
+        return ingested
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def row_count(self, dataset):
+        return self.manifest['datasets'][dataset]['rows']
+
+    def records(self, dataset):
+        """Every stored record of a dataset as a read-only memory-mapped structured array."""
+        if dataset not in self._maps:
+            rows = self.row_count(dataset)
+            if rows:
+                self._maps[dataset] = np.memmap(self._path(f"{dataset}.records"), mode='r',
+                                                dtype=record_dtype(dataset), shape=(rows,))
+            else:
+                self._maps[dataset] = np.empty(0, dtype=record_dtype(dataset))
+        return self._maps[dataset]
+
+    def shard_records(self, path, dataset):
+        """The records of one stored shard: a view of the map, not a copy."""
+        shard = self.manifest['datasets'][dataset]['shards'][shard_id(path)]
+        return self.records(dataset)[shard['first_row']:shard['first_row'] + shard['rows']]
+
+    def _categories(self, dataset, col):
+        """(sorted names, code -> position in them) of a dictionary; code -1 maps to -1."""
+        names = np.array(self.manifest['datasets'][dataset][col], dtype=object)
+        order = np.argsort(names, kind='stable')
+        position = np.empty(len(names) + 1, dtype=np.intp)
+        position[order] = np.arange(len(names))
+        position[-1] = -1
+        return pd.Index(names[order], dtype='str'), position
+
+    def decode(self, records, dataset, columns=None):
+        """
+        Typed DataFrame of structured records, with the dtypes of loader.iter_chunks.
+
+        columns restricts the frame (and the work) to some columns.
+        """
+        columns = [col for col in dataset_columns(dataset) if columns is None or col in columns]
+        frame = {}
+        for col in columns:
+            values = records[col]
+            if col == 'date':
+                micros = values.astype('int64') * 86_400_000_000
+                micros[values == MISSING_DAY] = np.iinfo(np.int64).min
+                frame[col] = micros.view('datetime64[us]')
+            elif col in CODED_COLUMNS:
+                categories, position = self._categories(dataset, col)
+                frame[col] = pd.Categorical.from_codes(position[values], categories)
+            else:
+                frame[col] = np.array(values)
+        return pd.DataFrame(frame, columns=columns)
+
+    def frames(self, dataset, columns=None, start=0, stop=None, rows_per_frame=DEFAULT_CHUNKSIZE):
+        """Decode records start..stop as typed frames of at most rows_per_frame rows."""
+        records = self.records(dataset)
+        stop = len(records) if stop is None else min(stop, len(records))
+        for offset in range(start, stop, rows_per_frame):
+            yield self.decode(records[offset:min(offset + rows_per_frame, stop)], dataset, columns)
+
+    def read(self, dataset, columns=None):
+        """Every stored record of a dataset as one typed DataFrame."""
+        return self.decode(self.records(dataset), dataset, columns)
+
+    def aggregate_levels(self, dataset, levels, start=0, stop=None):
+        """
+        loader.aggregate_levels over stored records start..stop.
+
+        Only the key and count columns are decoded, one frame at a time.
+        """
+        columns = level_columns(dataset, levels)
+        return aggregate_chunks(self.frames(dataset, columns, start, stop), dataset, levels)
@@ -0,0 +1,451 @@
+"""
+UIDAI Hackathon - Chart Rendering Pipeline
+Draws every chart from a small aggregate payload in parallel, headless worker processes
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+RENDER_VERSION = 1
+MANIFEST_NAME = '.render_manifest.json'
+FORMATS = ('png', 'svg', 'draft')
+DRAFT_DPI = 100
+
+
+# ============================================================================
+# PAYLOAD BUILDERS (analysis side: small, JSON-serialisable inputs)
+# ============================================================================
+
+def trend_payload(age_df):
+    return {
+        'labels': [str(label) for label in age_df['Age Group']],
+        'values': [int(value) for value in age_df['Total Enrolments']],
+    }
+
+
+def anomaly_payload(top_10_anomalies):
+    return {
+        'states': [str(state) for state in top_10_anomalies['state']],
+        'ratios': [float(ratio) for ratio in top_10_anomalies['Update_to_Enrolment_Ratio']],
+    }
+
+
+def daily_trend_payload(dates, daily, rolling, spike_days, window):
+    return {
+        'dates': [date.strftime('%Y-%m-%d') for date in dates],
+        'daily': [int(value) for value in daily],
+        'rolling': [float(value) for value in rolling],
+        'spike_days': [bool(flag) for flag in spike_days],
+        'window': int(window),
+    }
+
+
+def boxplot_payload(merged_df, outliers, q1, q3, iqr, upper_bound):
+    top_outliers = outliers.head(5)
+    return {
+        'ratios': [float(ratio) for ratio in merged_df['Update_Ratio']],
+        'mean': float(merged_df['Update_Ratio'].mean()),
+        'median': float(merged_df['Update_Ratio'].median()),
+        'outliers': [[str(state), float(ratio)] for state, ratio in
+                     zip(top_outliers['state'], top_outliers['Update_Ratio'])],
+        'n_outliers': int(len(outliers)),
+        'Q1': float(q1),
+        'Q3': float(q3),
+        'IQR': float(iqr),
+        'upper_bound': float(upper_bound),
+    }
+
+
+def heatmap_payload(normalized, ratios, upper_bound, q3):
+    ratios = [float(ratio) for ratio in ratios]
+    upper_bound, q3 = float(upper_bound), float(q3)
+    critical = [ratio > upper_bound for ratio in ratios]
+    return {
+        'states': [str(state) for state in normalized.index],
+        'columns': [str(col) for col in normalized.columns],
+        'values': [[float(v) for v in row] for row in normalized.to_numpy()],
+        'critical': critical,
+        'high': [not is_critical and ratio > q3 for is_critical, ratio in zip(critical, ratios)],
+    }
+
+
+def combo_payload(top_10_risk, upper_bound):
+    return {
+        'states': [str(state) for state in top_10_risk['state']],
+        'enrolment': [int(count) for count in top_10_risk['Enrolment_Count']],
+        'ratios': [float(ratio) for ratio in top_10_risk['Update_Ratio']],
+        'upper_bound': float(upper_bound),
+    }
+
+
+# ============================================================================
+# STYLES
+# ============================================================================
+
+def _setup(style):
+    """Import matplotlib headless and apply the style of the originating script."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    matplotlib.rcdefaults()
+    if style == 'basic':
+        sns.set_style("whitegrid")
+        plt.rcParams['figure.figsize'] = (12, 6)
+    else:
+        sns.set_theme(style="whitegrid")
+        plt.rcParams['font.size'] = 10
+        plt.rcParams['axes.labelsize'] = 11
+        plt.rcParams['axes.titlesize'] = 13
+        plt.rcParams['xtick.labelsize'] = 9
+        plt.rcParams['ytick.labelsize'] = 9
+        plt.rcParams['legend.fontsize'] = 9
+    return plt, sns
+
+
+# ============================================================================
+# CHARTS (rendering side: payload in, figure out)
+# ============================================================================
+
+def draw_trend_analysis(plt, sns, payload):
+    labels, values = payload['labels'], payload['values']
+    fig = plt.figure(figsize=(12, 6))
+    bars = plt.bar(range(len(values)), values, color='steelblue', edgecolor='black')
+    plt.xlabel('Age Group', fontsize=12, fontweight='bold')
+    plt.ylabel('Total Enrolments', fontsize=12, fontweight='bold')
+    plt.title('Trend Analysis: Total Enrolments by Age Group', fontsize=14, fontweight='bold', pad=20)
+    plt.xticks(range(len(labels)), labels, rotation=45, ha='right')
+    plt.grid(axis='y', alpha=0.3)
+
+    # Add value labels on bars
+    for bar in bars:
+        height = bar.get_height()
+        plt.text(bar.get_x() + bar.get_width()/2., height,
+                 f'{int(height):,}',
+                 ha='center', va='bottom', fontsize=9)
+    plt.tight_layout()
+    return fig
+
+
+def draw_anomaly_detection(plt, sns, payload):
+    states, ratios = payload['states'], payload['ratios']
+    fig = plt.figure(figsize=(12, 8))
+    bars = plt.barh(range(len(ratios)), ratios, color='coral', edgecolor='black')
+    plt.yticks(range(len(states)), states)
+    plt.xlabel('Update-to-Enrolment Ratio', fontsize=12, fontweight='bold')
+    plt.ylabel('State', fontsize=12, fontweight='bold')
+    plt.title('Anomaly Detection: Top 10 States with Highest Update-to-Enrolment Ratios',
+              fontsize=14, fontweight='bold', pad=20)
+    plt.grid(axis='x', alpha=0.3)
+
+    # Add value labels on bars
+    for bar in bars:
+        width = bar.get_width()
+        plt.text(width, bar.get_y() + bar.get_height()/2.,
+                 f'{width:.3f}',
+                 ha='left', va='center', fontsize=9, fontweight='bold')
+    plt.tight_layout()
+    return fig
+
+
+def draw_daily_trend_analysis(plt, sns, payload):
+    import numpy as np
+
+    dates = np.array(payload['dates'], dtype='datetime64[D]')
+    daily = np.array(payload['daily'])
+    spike_days = np.array(payload['spike_days'], dtype=bool)
+
+    fig = plt.figure(figsize=(12, 6))
+    plt.bar(dates, daily, color='steelblue', edgecolor='black',
+            alpha=0.7, label='Daily demographic updates')
+    plt.plot(dates, payload['rolling'], color='darkorange', linewidth=2.5,
+             label=f"{payload['window']}-day rolling mean")
+    plt.scatter(dates[spike_days], daily[spike_days], color='red',
+                zorder=3, s=60, label='Days with state-level spikes')
+    plt.xlabel('Date', fontsize=12, fontweight='bold')
+    plt.ylabel('Total Updates', fontsize=12, fontweight='bold')
+    plt.title('Daily Trend Analysis: Demographic Updates with Rolling-Window Spikes',
+              fontsize=14, fontweight='bold', pad=20)
+    plt.xticks(rotation=45, ha='right')
+    plt.grid(axis='y', alpha=0.3)
+    plt.legend()
+    plt.tight_layout()
+    return fig
+
+
+def draw_advanced_boxplot_outliers(plt, sns, payload):
+    fig, ax = plt.subplots(figsize=(12, 8))
+
+    # Create box plot
+    box_parts = ax.boxplot([payload['ratios']],
+                           vert=True,
+                           patch_artist=True,
+                           widths=0.5,
+                           showmeans=True,
+                           meanprops=dict(marker='D', markerfacecolor='red', markersize=8, label='Mean'))
+
+    # Style the box
+    box_parts['boxes'][0].set_facecolor('lightblue')
+    box_parts['boxes'][0].set_edgecolor('darkblue')
+    box_parts['boxes'][0].set_linewidth(2)
+
+    # Style whiskers and caps
+    for whisker in box_parts['whiskers']:
+        whisker.set(color='darkblue', linewidth=1.5, linestyle='--')
+    for cap in box_parts['caps']:
+        cap.set(color='darkblue', linewidth=2)
+
+    # Style median line
+    box_parts['medians'][0].set(color='darkgreen', linewidth=2.5)
+
+    # Style outliers
+    box_parts['fliers'][0].set(marker='o', markerfacecolor='red', markersize=8,
+                               markeredgecolor='darkred', alpha=0.7)
+
+    # Add annotations for top outliers
+    for state, ratio in payload['outliers']:
+        ax.annotate(f"{state}\n({ratio:.1f})",
+                    xy=(1, ratio),
+                    xytext=(1.3, ratio),
+                    fontsize=8,
+                    bbox=dict(boxstyle='round,pad=0.3', facecolor='yellow', alpha=0.7),
+                    arrowprops=dict(arrowstyle='->', connectionstyle='arc3,rad=0', color='red'))
+
+    # Add statistical reference lines
+    ax.axhline(y=payload['mean'], color='red', linestyle='--',
+               linewidth=1.5, alpha=0.7, label=f"Mean: {payload['mean']:.2f}")
+    ax.axhline(y=payload['median'], color='green', linestyle='--',
+               linewidth=1.5, alpha=0.7, label=f"Median: {payload['median']:.2f}")
+    ax.axhline(y=payload['upper_bound'], color='orange', linestyle=':',
+               linewidth=2, alpha=0.8, label=f"Outlier Threshold: {payload['upper_bound']:.2f}")
+
+    ax.set_ylabel('Update-to-Enrolment Ratio', fontweight='bold', fontsize=12)
+    ax.set_title('Statistical Outliers in Demographic Updates\nBox Plot Analysis with IQR Method',
+                 fontweight='bold', fontsize=14, pad=20)
+    ax.set_xticks([1])
+    ax.set_xticklabels(['All States'], fontsize=11)
+    ax.legend(loc='upper right', framealpha=0.9)
+    ax.grid(True, alpha=0.3, axis='y')
+
+    # Add text box with statistics
+    stats_text = (f"Total States: {len(payload['ratios'])}\nOutliers: {payload['n_outliers']}\n"
+                  f"IQR: {payload['IQR']:.2f}\nQ1: {payload['Q1']:.2f}\nQ3: {payload['Q3']:.2f}")
+    ax.text(0.02, 0.98, stats_text, transform=ax.transAxes, fontsize=9,
+            verticalalignment='top', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
+    plt.tight_layout()
+    return fig
+
+
+def draw_advanced_risk_heatmap(plt, sns, payload):
+    import pandas as pd
+
+    heatmap_data = pd.DataFrame(payload['values'], columns=payload['columns'],
+                                index=payload['states'])
+    fig, ax = plt.subplots(figsize=(10, 12))
+
+    sns.heatmap(heatmap_data,
+                annot=True,
+                fmt='.2f',
+                cmap='coolwarm',
+                center=0.5,
+                linewidths=1,
+                linecolor='white',
+                cbar_kws={'label': 'Normalized Intensity (0=Low, 1=High)'},
+                vmin=0,
+                vmax=1,
+                ax=ax)
+
+    ax.set_title('State-wise Risk Heatmap: Top 20 States by Activity\nRed = High Risk/Volume | Blue = Low Risk/Volume',
+                 fontweight='bold', fontsize=13, pad=20)
+    ax.set_xlabel('Metrics', fontweight='bold', fontsize=11)
+    ax.set_ylabel('State', fontweight='bold', fontsize=11)
+
+    # Rotate labels
+    plt.setp(ax.get_xticklabels(), rotation=0, ha='center')
+    plt.setp(ax.get_yticklabels(), rotation=0)
+
+    # Add color-coded risk indicators
+    for i, (is_critical, is_high) in enumerate(zip(payload['critical'], payload['high'])):
+        if is_critical:
+            ax.text(3.2, i + 0.5, '🚨', fontsize=12, va='center')
+        elif is_high:
+            ax.text(3.2, i + 0.5, '⚠️', fontsize=12, va='center')
+    plt.tight_layout()
+    return fig
+
+
+def draw_advanced_combo_chart(plt, sns, payload):
+    import numpy as np
+
+    states, enrolment, ratios = payload['states'], payload['enrolment'], payload['ratios']
+    upper_bound = payload['upper_bound']
+    fig, ax1 = plt.subplots(figsize=(14, 8))
+
+    # Create bar chart for Enrolment Count (left Y-axis)
+    x_pos = np.arange(len(states))
+    bars = ax1.bar(x_pos, enrolment,
+                   color='steelblue', alpha=0.7, edgecolor='darkblue', linewidth=1.5,
+                   label='Enrolment Count', width=0.6)
+
+    ax1.set_xlabel('State', fontweight='bold', fontsize=12)
+    ax1.set_ylabel('Enrolment Count', color='steelblue', fontweight='bold', fontsize=12)
+    ax1.tick_params(axis='y', labelcolor='steelblue')
+    ax1.set_xticks(x_pos)
+    ax1.set_xticklabels(states, rotation=45, ha='right')
+    ax1.grid(True, alpha=0.3, axis='y')
+
+    # Add value labels on bars
+    for bar in bars:
+        height = bar.get_height()
+        ax1.text(bar.get_x() + bar.get_width()/2., height,
+                 f'{int(height):,}',
+                 ha='center', va='bottom', fontsize=8, color='darkblue', fontweight='bold')
+
+    # Create second Y-axis for Update Ratio (line chart)
+    ax2 = ax1.twinx()
+    ax2.plot(x_pos, ratios,
+             color='red', marker='o', markersize=10, linewidth=3,
+             label='Update Ratio', markeredgecolor='darkred', markeredgewidth=2)
+
+    ax2.set_ylabel('Update-to-Enrolment Ratio', color='red', fontweight='bold', fontsize=12)
+    ax2.tick_params(axis='y', labelcolor='red')
+
+    # Add value labels on line points
+    for x, y in zip(x_pos, ratios):
+        ax2.annotate(f'{y:.1f}',
+                     xy=(x, y),
+                     xytext=(0, 10),
+                     textcoords='offset points',
+                     ha='center',
+                     fontsize=9,
+                     color='darkred',
+                     fontweight='bold',
+                     bbox=dict(boxstyle='round,pad=0.3', facecolor='yellow', alpha=0.7))
+
+    # Add threshold line
+    ax2.axhline(y=upper_bound, color='orange', linestyle='--', linewidth=2,
+                alpha=0.7, label=f'Outlier Threshold ({upper_bound:.1f})')
+
+    # Title and legends
+    plt.title('Volume vs. Risk: Enrolment Counts and Update Ratios\nTop 10 States by Update Ratio',
+              fontweight='bold', fontsize=14, pad=20)
+
+    # Combine legends
+    lines1, labels1 = ax1.get_legend_handles_labels()
+    lines2, labels2 = ax2.get_legend_handles_labels()
+    ax1.legend(lines1 + lines2, labels1 + labels2, loc='upper left', framealpha=0.9, fontsize=10)
+
+    # Add interpretation box
+    interpretation = "High bars + High line = High volume with high risk\nLow bars + High line = Low volume but high risk (investigate!)"
+    ax1.text(0.98, 0.02, interpretation, transform=ax1.transAxes, fontsize=9,
+             verticalalignment='bottom', horizontalalignment='right',
+             bbox=dict(boxstyle='round', facecolor='lightblue', alpha=0.8))
+    plt.tight_layout()
+    return fig
+
+
+# name -> (style, draw function)
+CHARTS = {
+    'trend_analysis': ('basic', draw_trend_analysis),
+    'anomaly_detection': ('basic', draw_anomaly_detection),
+    'daily_trend_analysis': ('basic', draw_daily_trend_analysis),
+    'advanced_boxplot_outliers': ('advanced', draw_advanced_boxplot_outliers),
+    'advanced_risk_heatmap': ('advanced', draw_advanced_risk_heatmap),
+    'advanced_combo_chart': ('advanced', draw_advanced_combo_chart),
+}
+
+
+# ============================================================================
+# PIPELINE
+# ============================================================================
+
+def output_settings(fmt, dpi):
+    """Return (file extension, suffix, dpi) for a --format / --dpi choice."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown chart format {fmt!r}; expected one of {FORMATS}")
+    if fmt == 'draft':
+        return 'png', '_draft', DRAFT_DPI
+    return fmt, '', dpi
+
+
+def payload_hash(name, payload, ext, dpi):
+    """Hash of everything that determines a chart's output file."""
+    raw = json.dumps({'version': RENDER_VERSION, 'chart': name, 'ext': ext, 'dpi': dpi,
+                      'payload': payload}, sort_keys=True)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def render_chart(task):
+    """Draw one chart in the current (worker) process and save it."""
+    name, payload, path, ext, dpi = task
+    style, draw = CHARTS[name]
+    plt, sns = _setup(style)
+    fig = draw(plt, sns, payload)
+    fig.savefig(path, dpi=dpi, bbox_inches='tight', format=ext)
+    plt.close(fig)
+    return path
+
+
+def _load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def render_charts(jobs, output_dir, fmt='png', dpi=300, workers=None, force=False):
+    """
+    Render (name, payload) jobs into output_dir.
+
+    Charts whose payload, format and DPI hash matches the last render are
+    skipped. The rest are drawn in parallel worker processes with the Agg
+    backend, by default one per chart up to the CPU count (workers=1
+    draws them in this process). Returns [(name, path, rendered)] in job
+    order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    ext, suffix, dpi = output_settings(fmt, dpi)
+    manifest = _load_manifest(output_dir)
+
+    results = []
+    tasks = []
+    hashes = {}
+    for name, payload in jobs:
+        filename = f"{name}{suffix}.{ext}"
+        path = os.path.join(output_dir, filename)
+        digest = payload_hash(name, payload, ext, dpi)
+        if not force and manifest.get(filename) == digest and os.path.exists(path):
+            results.append((name, path, False))
+            continue
+        hashes[filename] = digest
+        tasks.append((name, payload, path, ext, dpi))
+        results.append((name, path, True))
+
+    if tasks:
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = max(1, min(workers, len(tasks)))
+        if workers == 1:
+            for task in tasks:
+                render_chart(task)
+        else:
+            context = None
+            if 'fork' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                list(executor.map(render_chart, tasks))
+        manifest.update(hashes)
+        _save_manifest(output_dir, manifest)
+    return results
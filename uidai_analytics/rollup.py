@@ -0,0 +1,191 @@
+"""
+UIDAI Hackathon - Hierarchical Rollup Cube
+Counts materialized once per (date, state, district, pincode, age band) and rolled up
+to every level, so totals and top-N queries are array slices instead of group-bys
+"""
+
+import numpy as np
+import pandas as pd
+
+from .hierarchy import LEVEL_KEYS, encode_levels
+from .loader import count_columns
+from .trends import DailyCube
+
+LEVELS = tuple(LEVEL_KEYS)
+LEVEL_OF_KEYS = {tuple(keys): level for level, keys in LEVEL_KEYS.items()}
+
+# Levels whose daily counts are kept dense as (days, units, bands) arrays;
+# daily pincode counts stay sparse in the leaf cells
+DAILY_LEVELS = ('state', 'district')
+
+
+def _band_bincount(index, counts, size):
+    """Sum the rows of counts (cells x bands) into size buckets given by index."""
+    out = np.empty((size, counts.shape[1]), dtype=np.int64)
+    for b in range(counts.shape[1]):
+        out[:, b] = np.bincount(index, weights=counts[:, b], minlength=size)
+    return out
+
+
+class RollupCube:
+    """
+    Counts of one dataset at every level of the geographic hierarchy, per age band.
+
+    The leaf is a sparse list of the (day, pincode) cells holding at least
+    one record, with a count per band and the unit code of every level.
+    From it the cube keeps, for each level, unit labels (sorted like
+    hierarchy.encode_levels), a parent map, the unit totals as a
+    (units, bands) array and, for state and district, the dense
+    (days, units, bands) daily counts. Records without a parsable date
+    count towards every total but towards no day.
+    """
+
+    def __init__(self, dataset, dates, units, parents, complete, totals, daily, cells):
+        self.dataset = dataset
+        self.bands = count_columns(dataset)
+        self.dates = dates
+        self.units = units
+        self.parents = parents
+        self.complete = complete
+        self.totals = totals
+        self.daily = daily
+        self.cells = cells
+
+    def band_totals(self):
+        """Total count of every age band across all units, as a Series."""
+        return pd.Series(self.totals['state'].sum(axis=0), index=self.bands)
+
+    def level_table(self, level='state'):
+        """
+        Per-unit band counts with the level's key columns.
+
+        Same content as aggregating the records by LEVEL_KEYS[level] (units
+        with a missing key are left out), sorted by key.
+        """
+        table = self.units[level][self.complete[level]].reset_index(drop=True)
+        counts = self.totals[level][self.complete[level]]
+        for b, band in enumerate(self.bands):
+            table[band] = counts[:, b]
+        return table
+
+    def table(self, keys):
+        """
+        Aggregate by keys: a level's keys (e.g. ['state', 'district']),
+        optionally preceded by 'date' for daily counts.
+        """
+        keys = list(keys)
+        daily = keys[:1] == ['date']
+        level = LEVEL_OF_KEYS.get(tuple(keys[1:] if daily else keys))
+        if level is None:
+            raise ValueError(f"No cube level has keys {keys}")
+        return self.daily_table(level) if daily else self.level_table(level)
+
+    def unit_totals(self, level='state'):
+        """Counts summed over the age bands, one value per unit of a level."""
+        return self.totals[level].sum(axis=1)
+
+    def top(self, level='state', n=10, band=None):
+        """The n units with the largest total (or the largest count of one band)."""
+        table = self.level_table(level)
+        column = band or 'total'
+        if band is None:
+            table['total'] = table[self.bands].sum(axis=1)
+        return table.nlargest(n, column).reset_index(drop=True)
+
+    def children(self, level, parent_code):
+        """Codes of the units of level whose parent unit is parent_code."""
+        return np.flatnonzero(self.parents[level] == parent_code)
+
+    def daily_cube(self, level='state'):
+        """Dense daily counts of a level as a trends.DailyCube."""
+        if level not in self.daily:
+            raise ValueError(f"Daily counts are kept for {', '.join(DAILY_LEVELS)}, not {level!r}")
+        on_day = self.cells['day'] >= 0
+        observed = np.zeros(self.daily[level].shape[:2], dtype=bool)
+        observed[self.cells['day'][on_day], self.cells[level][on_day]] = True
+        return DailyCube(self.dates, self.units[level], self.bands, self.daily[level], observed)
+
+    def daily_table(self, level='state'):
+        """Long-form (date, unit) band counts, as from grouping dated records by date and keys."""
+        unit = self.cells[level]
+        keep = (self.cells['day'] >= 0) & self.complete[level][unit]
+        n_units = len(self.units[level])
+        keys, inverse = np.unique(self.cells['day'][keep] * n_units + unit[keep],
+                                  return_inverse=True)
+        counts = _band_bincount(inverse, self.cells['counts'][keep], len(keys))
+        table = self.units[level].iloc[keys % n_units].reset_index(drop=True)
+        table.insert(0, 'date', self.dates[keys // n_units])
+        for b, band in enumerate(self.bands):
+            table[band] = counts[:, b]
+        return table
+
+
+def build_rollup(frame, dataset):
+    """
+    Build a RollupCube from records or any pre-aggregated table of them.
+
+    frame needs date, state, district and pincode plus the dataset's
+    count columns. One factorization and a bincount per band build the
+    leaf; every coarser level is then a bincount over the leaf cells.
+    Rows without a state are dropped.
+    """
+    bands = count_columns(dataset)
+    frame = frame.dropna(subset=['state'])
+    codes, labels = encode_levels(frame[LEVEL_KEYS['pincode']])
+    n_units = {level: len(labels[level]) for level in LEVELS}
+
+    # Parent code of every unit (state has none)
+    parents = {'state': np.full(n_units['state'], -1, dtype=np.int64)}
+    for child, parent in (('district', 'state'), ('pincode', 'district')):
+        parents[child] = np.zeros(n_units[child], dtype=np.int64)
+        parents[child][codes[child]] = codes[parent]
+
+    # A missing district is encoded as its own unit; it still counts
+    # towards its state but is not a unit of the district or pincode level
+    missing = frame['district'].isna().to_numpy()
+    complete = {level: np.ones(n, dtype=bool) for level, n in n_units.items()}
+    complete['district'][codes['district'][missing]] = False
+    complete['pincode'] = complete['district'][parents['pincode']]
+
+    days = frame['date'].to_numpy('datetime64[D]')
+    dated = ~np.isnat(days)
+    day_numbers = days[dated].astype(np.int64)
+    if len(day_numbers):
+        first, n_days = day_numbers.min(), int(day_numbers.max() - day_numbers.min()) + 1
+    else:
+        first, n_days = 0, 0
+    dates = pd.date_range(pd.Timestamp(np.datetime64(int(first), 'D')), periods=n_days, freq='D')
+    # Undated records go to an extra day slot n_days
+    day_index = np.full(len(frame), n_days, dtype=np.int64)
+    day_index[dated] = day_numbers - first
+
+    # Sparse leaf: one row per non-empty (day, pincode) cell
+    leaf_key = day_index * n_units['pincode'] + codes['pincode']
+    cell_keys, cell_of_row = np.unique(leaf_key, return_inverse=True)
+    counts = _band_bincount(cell_of_row, frame[bands].to_numpy(np.float64), len(cell_keys))
+    cell_day = cell_keys // n_units['pincode']
+    cells = {
+        'day': np.where(cell_day < n_days, cell_day, -1),
+        'pincode': cell_keys % n_units['pincode'],
+        'counts': counts,
+    }
+    cells['district'] = parents['pincode'][cells['pincode']]
+    cells['state'] = parents['district'][cells['district']]
+
+    # Roll the leaf up to every level
+    totals = {}
+    daily = {}
+    for level in LEVELS:
+        unit_of_cell = cells[level]
+        totals[level] = _band_bincount(unit_of_cell, counts, n_units[level])
+        if level in DAILY_LEVELS:
+            on_day = cells['day'] >= 0
+            flat = cells['day'][on_day] * n_units[level] + unit_of_cell[on_day]
+            daily[level] = _band_bincount(flat, counts[on_day], n_days * n_units[level]).reshape(
+                n_days, n_units[level], len(bands))
+
+    # Labels of the missing-district units are the string 'nan'; restore NaN
+    units = {level: labels[level] for level in LEVELS}
+    for level in ('district', 'pincode'):
+        units[level].loc[~complete[level], 'district'] = np.nan
+    return RollupCube(dataset, dates, units, parents, complete, totals, daily, cells)
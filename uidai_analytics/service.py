@@ -0,0 +1,446 @@
+"""
+UIDAI Hackathon - Query Service
+Async HTTP API over in-memory rollup cubes and hierarchy scores, with an LRU
+result cache, that reloads when the shard set changes
+
+Usage:
+    python -m uidai_analytics.service --port 8000
+    curl 'http://127.0.0.1:8000/anomalies?level=district&n=10'
+    curl 'http://127.0.0.1:8000/timeseries?state=Bihar&district=Patna'
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+import time
+from collections import OrderedDict
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from .cache import DEFAULT_BUDGET_MB, ShardCache, shard_fingerprint
+from .discovery import discover_shards
+from .hierarchy import LEVEL_KEYS, score_hierarchy
+from .loader import DEMOGRAPHIC, ENROLMENT
+from .pipeline import clean, load
+from .rollup import DAILY_LEVELS, build_rollup
+
+DEFAULT_RESULT_CACHE_MB = 64
+DEFAULT_LIMIT = 100
+
+# Request line plus headers; anything longer is rejected
+MAX_HEADER_LINES = 100
+
+
+class Snapshot:
+    """Cubes and hierarchy scores of one version of the shard set; never mutated once built."""
+
+    def __init__(self, signature, cubes, hierarchy, row_counts):
+        self.signature = signature
+        self.version = hashlib.sha1('|'.join(sorted(signature)).encode('utf-8')).hexdigest()[:12]
+        self.loaded_at = time.time()
+        self.cubes = cubes
+        self.hierarchy = hierarchy
+        self.row_counts = row_counts
+        # Unit tables ranked by ratio once, and the rows of each state,
+        # district and pincode in them, so a filtered query is a single take
+        self.ranked = {}
+        self.members = {}
+        for level, table in hierarchy.units.items():
+            ranked = table.sort_values('Update_Ratio', ascending=False, na_position='last',
+                                       kind='stable').reset_index(drop=True)
+            self.ranked[level] = ranked
+            self.members[level] = {}
+            for depth in range(1, len(LEVEL_KEYS[level]) + 1):
+                keys = LEVEL_KEYS[level][:depth]
+                groups = ranked.groupby(keys, sort=False).indices
+                self.members[level].update(
+                    (key if isinstance(key, tuple) else (key,), rows) for key, rows in groups.items())
+        # (state,) / (state, district) -> unit code in each cube's daily arrays
+        self.unit_codes = {
+            dataset: {level: {tuple(row): code for code, row in
+                              enumerate(cube.units[level].itertuples(index=False))}
+                      for level in DAILY_LEVELS}
+            for dataset, cube in cubes.items()}
+
+
+def shard_signature(discovery):
+    """Fingerprints of every kept shard; changes when a shard is added, replaced or removed."""
+    return frozenset(shard_fingerprint(shard.path) for shard in discovery.shards)
+
+
+def load_snapshot(discovery, workers=1, cache=None):
+    """Parse every shard and build the cubes and hierarchy scores served by the API."""
+    signature = shard_signature(discovery)
+    files = {dataset: discovery.files(dataset) for dataset in (ENROLMENT, DEMOGRAPHIC)}
+    frames = load(files, workers=workers, cache=cache)
+    row_counts = {dataset: len(frame) for dataset, frame in frames.items()}
+    frames, _ = clean(frames)
+    cubes = {dataset: build_rollup(frame, dataset) for dataset, frame in frames.items()}
+    del frames
+    keys = LEVEL_KEYS['pincode']
+    hierarchy = score_hierarchy(cubes[ENROLMENT].table(keys), cubes[DEMOGRAPHIC].table(keys))
+    return Snapshot(signature, cubes, hierarchy, row_counts)
+
+
+class ResultCache:
+    """Least-recently-used cache of encoded responses, evicted beyond a byte budget."""
+
+    def __init__(self, max_bytes=DEFAULT_RESULT_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        body = self.entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes or key in self.entries:
+            return
+        self.entries[key] = body
+        self.bytes += len(body)
+        while self.bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= len(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def stats(self):
+        return {'entries': len(self.entries), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+def _number(value):
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def _records(frame):
+    """Rows as JSON-safe dicts (NaN becomes null)."""
+    return json.loads(frame.to_json(orient='records'))
+
+
+def _int_param(params, name, default, minimum=1):
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    if value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    return value
+
+
+def _level_param(params, default='state'):
+    level = params.get('level', default)
+    if level not in LEVEL_KEYS:
+        raise ValueError(f"Unknown level {level!r}; expected one of {', '.join(LEVEL_KEYS)}")
+    return level
+
+
+def _filtered_rows(snapshot, params, level):
+    """Rows of snapshot.ranked[level] matching the state/district/pincode params, by ratio."""
+    keys = LEVEL_KEYS[level]
+    for key in LEVEL_KEYS['pincode']:
+        if key in params and key not in keys:
+            raise ValueError(f"{key} does not apply to level {level}")
+    given = [key for key in keys if key in params]
+    if given != keys[:len(given)]:
+        needed = [key for key in keys[:keys.index(given[-1])] if key not in params]
+        raise ValueError(f"{given[-1]} needs {', '.join(needed)}")
+    if not given:
+        return np.arange(len(snapshot.ranked[level]))
+    values = [params[key] for key in given]
+    if 'pincode' in given:
+        values[-1] = _int_param(params, 'pincode', None, minimum=0)
+    rows = snapshot.members[level].get(tuple(values))
+    return rows if rows is not None else np.empty(0, dtype=np.intp)
+
+
+def ratios_endpoint(snapshot, params):
+    level = _level_param(params)
+    limit = _int_param(params, 'limit', DEFAULT_LIMIT)
+    rows = _filtered_rows(snapshot, params, level)
+    return {
+        'level': level,
+        'thresholds': {key: _number(value)
+                       for key, value in snapshot.hierarchy.thresholds[level].items()},
+        'count': len(rows),
+        'units': _records(snapshot.ranked[level].take(rows[:limit])),
+    }
+
+
+def anomalies_endpoint(snapshot, params):
+    level = _level_param(params, 'district')
+    n = _int_param(params, 'n', 10)
+    rule = params.get('rule', 'iqr')
+    if rule not in ('iqr', 'robust'):
+        raise ValueError(f"Unknown rule {rule!r}; expected iqr or robust")
+    table = snapshot.ranked[level]
+    rows = _filtered_rows(snapshot, params, level)
+    rows = rows[table['is_outlier' if rule == 'iqr' else 'is_robust_outlier'].to_numpy()[rows]]
+    return {
+        'level': level,
+        'rule': rule,
+        'upper_bound': _number(snapshot.hierarchy.thresholds[level]['upper_bound']),
+        'count': len(rows),
+        'units': _records(table.take(rows[:n])),
+    }
+
+
+def timeseries_endpoint(snapshot, params):
+    if 'state' not in params:
+        raise ValueError("state is required")
+    level = 'district' if 'district' in params else 'state'
+    key = tuple(params[name] for name in LEVEL_KEYS[level])
+    series = {}
+    for dataset, cube in snapshot.cubes.items():
+        code = snapshot.unit_codes[dataset][level].get(key)
+        counts = (cube.daily[level][:, code, :].sum(axis=1) if code is not None
+                  else np.zeros(len(cube.dates), dtype=np.int64))
+        series[dataset] = pd.Series(counts, index=cube.dates)
+    if all(key not in snapshot.unit_codes[dataset][level] for dataset in snapshot.cubes):
+        raise KeyError(f"No {level} {' / '.join(key)}")
+
+    frame = pd.DataFrame(series).fillna(0).astype(np.int64)
+    if 'start' in params:
+        frame = frame[frame.index >= pd.Timestamp(params['start'])]
+    if 'end' in params:
+        frame = frame[frame.index <= pd.Timestamp(params['end'])]
+    result = {name: params[name] for name in LEVEL_KEYS[level]}
+    result['level'] = level
+    result['dates'] = frame.index.strftime('%Y-%m-%d').tolist()
+    for dataset in frame.columns:
+        result[dataset] = frame[dataset].tolist()
+    return result
+
+
+# Cached query endpoints: path -> (function(snapshot, params) -> dict, description)
+ENDPOINTS = {
+    '/ratios': (ratios_endpoint,
+                "Update ratios of a level's units, highest first "
+                "(level, state, district, pincode, limit)"),
+    '/anomalies': (anomalies_endpoint,
+                   "Top-n outliers of a level (level, n, rule=iqr|robust, state, district, pincode)"),
+    '/timeseries': (timeseries_endpoint,
+                    "Daily enrolment and update counts of a state or district "
+                    "(state, district, start, end)"),
+}
+
+
+class QueryService:
+    """
+    Answers GET requests from the current Snapshot.
+
+    handle() works without a socket, so the service can be queried
+    directly; serve() puts it behind an asyncio HTTP/1.1 server and polls
+    the shards every interval seconds, building a new snapshot in a
+    thread and swapping it in once ready. Requests are served from the
+    old snapshot meanwhile.
+    """
+
+    def __init__(self, root='.', manifest=None, patterns=None, workers=1, cache=None,
+                 result_cache_mb=DEFAULT_RESULT_CACHE_MB, interval=5.0):
+        self.root = root
+        self.manifest = manifest
+        self.patterns = patterns
+        self.workers = workers
+        self.cache = cache
+        self.interval = interval
+        self.results = ResultCache(int(result_cache_mb * 1024 * 1024))
+        self.snapshot = None
+        self.reloads = 0
+        self.requests = 0
+
+    def load(self, force=False):
+        """A new Snapshot if the shard set changed since the current one (or force), else None."""
+        discovery = discover_shards(self.root, self.manifest, self.patterns)
+        if not force and self.snapshot is not None and \
+                shard_signature(discovery) == self.snapshot.signature:
+            return None
+        return load_snapshot(discovery, workers=self.workers, cache=self.cache)
+
+    def install(self, snapshot):
+        self.snapshot = snapshot
+        self.results.clear()
+        self.reloads += 1
+
+    def reload(self, force=False):
+        """Load and install a new snapshot if the shards changed. Returns True if it did."""
+        snapshot = self.load(force)
+        if snapshot is not None:
+            self.install(snapshot)
+        return snapshot is not None
+
+    def health(self):
+        snapshot = self.snapshot
+        return {
+            'status': 'ok',
+            'version': snapshot.version,
+            'loaded_at': snapshot.loaded_at,
+            'shards': len(snapshot.signature),
+            'records': snapshot.row_counts,
+            'reloads': self.reloads,
+            'requests': self.requests,
+            'cache': self.results.stats(),
+        }
+
+    def handle(self, target):
+        """Answer one GET target such as '/ratios?level=district'. Returns (status, body, x_cache)."""
+        self.requests += 1
+        url = urlsplit(target)
+        if url.path == '/health':
+            return HTTPStatus.OK, json.dumps(self.health()).encode('utf-8'), None
+        if url.path == '/':
+            index = {path: description for path, (_, description) in ENDPOINTS.items()}
+            return HTTPStatus.OK, json.dumps(index).encode('utf-8'), None
+        if url.path not in ENDPOINTS:
+            return HTTPStatus.NOT_FOUND, json.dumps({'error': f"No endpoint {url.path}"}).encode(), None
+
+        snapshot = self.snapshot
+        params = dict(parse_qsl(url.query))
+        key = (snapshot.version, url.path, tuple(sorted(params.items())))
+        body = self.results.get(key)
+        if body is not None:
+            return HTTPStatus.OK, body, 'hit'
+        try:
+            result = ENDPOINTS[url.path][0](snapshot, params)
+        except ValueError as exc:
+            return HTTPStatus.BAD_REQUEST, json.dumps({'error': str(exc)}).encode(), None
+        except KeyError as exc:
+            return HTTPStatus.NOT_FOUND, json.dumps({'error': exc.args[0]}).encode(), None
+        body = json.dumps(result).encode('utf-8')
+        self.results.put(key, body)
+        return HTTPStatus.OK, body, 'miss'
+
+    async def handle_connection(self, reader, writer):
+        """Serve keep-alive HTTP/1.1 requests on one connection until the client closes it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                for _ in range(MAX_HEADER_LINES):
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip().lower()
+                else:
+                    break
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    break
+                method, target, version = parts
+                keep_alive = (version == 'HTTP/1.1' and headers.get('connection') != 'close')
+
+                if method != 'GET':
+                    status, body, x_cache = (HTTPStatus.METHOD_NOT_ALLOWED,
+                                             json.dumps({'error': "Only GET is supported"}).encode(),
+                                             None)
+                else:
+                    try:
+                        status, body, x_cache = self.handle(target)
+                    except Exception as exc:  # answer instead of dropping the connection
+                        print(f"Error answering {target}: {exc!r}", file=sys.stderr, flush=True)
+                        status, body, x_cache = (HTTPStatus.INTERNAL_SERVER_ERROR,
+                                                 json.dumps({'error': "Internal error"}).encode(), None)
+                head = [f"HTTP/1.1 {status.value} {status.phrase}",
+                        "Content-Type: application/json",
+                        f"Content-Length: {len(body)}",
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                if x_cache:
+                    head.append(f"X-Cache: {x_cache}")
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def watch(self):
+        """Poll the shards and swap in a new snapshot when they change."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                snapshot = await loop.run_in_executor(None, self.load)
+            except Exception as exc:  # keep serving the last good snapshot
+                print(f"Reload failed: {exc}", file=sys.stderr, flush=True)
+                continue
+            if snapshot is not None:
+                self.install(snapshot)
+                print(f"Reloaded: {len(snapshot.signature)} shards, version {snapshot.version}",
+                      flush=True)
+
+    async def serve(self, host='127.0.0.1', port=8000):
+        if self.snapshot is None:
+            self.reload(force=True)
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        port = server.sockets[0].getsockname()[1]
+        print(f"Serving on http://{host}:{port} ({len(self.snapshot.signature)} shards, "
+              f"version {self.snapshot.version})", flush=True)
+        watcher = asyncio.create_task(self.watch()) if self.interval > 0 else None
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP query service over in-memory aggregates")
+    parser.add_argument('--root', default='.', help="Directory holding the data folders")
+    parser.add_argument('--manifest', default=None,
+                        help="Shard manifest (.json or one path per line) instead of the data folders")
+    parser.add_argument('--glob', dest='patterns', action='append', default=None,
+                        help="Glob pattern of shard files (repeatable) instead of the data folders")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8000, help="Port to listen on; 0 picks a free one")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes used to parse shards on (re)load (default: 1)")
+    parser.add_argument('--cache-dir', default=None,
+                        help="Directory for the parsed-shard cache (Arrow IPC); disabled if not set")
+    parser.add_argument('--cache-budget-mb', type=int, default=DEFAULT_BUDGET_MB,
+                        help=f"Disk budget of the shard cache in MB (default: {DEFAULT_BUDGET_MB})")
+    parser.add_argument('--result-cache-mb', type=float, default=DEFAULT_RESULT_CACHE_MB,
+                        help=f"Memory budget of the LRU result cache in MB; 0 disables it "
+                             f"(default: {DEFAULT_RESULT_CACHE_MB})")
+    parser.add_argument('--interval', type=float, default=5.0,
+                        help="Seconds between checks for new shards; 0 disables reloading")
+    args = parser.parse_args(argv)
+
+    cache = None
+    if args.cache_dir:
+        cache = ShardCache(args.cache_dir, max_bytes=args.cache_budget_mb * 1024 * 1024)
+    service = QueryService(args.root, args.manifest, args.patterns, workers=args.workers,
+                           cache=cache, result_cache_mb=args.result_cache_mb,
+                           interval=args.interval)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    main()
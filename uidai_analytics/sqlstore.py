@@ -0,0 +1,328 @@
+"""
+UIDAI Hackathon - Embedded Analytical Store
+Ingests shards into one indexed SQLite file; ratios and IQR thresholds are SQL queries
+"""
+
+import itertools
+import os
+import pathlib
+import sqlite3
+
+import pandas as pd
+
+from .analysis import build_merged_df
+from .incremental import shard_id
+from .loader import DEFAULT_CHUNKSIZE, DEMOGRAPHIC, ENROLMENT, count_columns, iter_chunks
+
+SCHEMA_VERSION = 2
+
+# Fact table of each dataset (the dataset names are valid SQL identifiers)
+TABLES = {ENROLMENT: 'enrolment', DEMOGRAPHIC: 'demographic'}
+
+# Unit keys of the ratio views, mirroring hierarchy.LEVEL_KEYS
+RATIO_VIEWS = {
+    'state': ('state_ratios', ['state']),
+    'district': ('district_ratios', ['state', 'district']),
+    'pincode': ('pincode_ratios', ['state', 'district', 'pincode']),
+}
+
+# Actions the query connection may perform: reading tables and views only
+# (no ATTACH, which could create or write other database files)
+READ_ACTIONS = frozenset([sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION,
+                          sqlite3.SQLITE_RECURSIVE])
+
+# A load drops a fact table's indexes and rebuilds them once only when it
+# adds at least this fraction of the table's size; a smaller delta goes
+# into the existing indexes
+REBUILD_FRACTION = 0.25
+
+# STRICT tables reject values of the wrong type instead of coercing them
+STRICT = ' STRICT' if sqlite3.sqlite_version_info >= (3, 37, 0) else ''
+
+
+def _sql_values(series):
+    """Column values as Python objects, with NaN/NaT as None (NULL)."""
+    if series.dtype.kind in 'iu':
+        return series.tolist()
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def _allow_reads(action, *_):
+    return sqlite3.SQLITE_OK if action in READ_ACTIONS else sqlite3.SQLITE_DENY
+
+
+def _total_expr(dataset):
+    return ' + '.join(count_columns(dataset))
+
+
+def index_columns(table):
+    """(index name, columns) of the secondary indexes of a fact table."""
+    return [
+        (f"{table}_state_district", 'state, district'),
+        (f"{table}_pincode", 'pincode'),
+        (f"{table}_date_state", 'date, state'),
+    ]
+
+
+def schema_sql():
+    """CREATE statements for the fact tables, shard log, indexes and views."""
+    statements = [
+        f"""CREATE TABLE IF NOT EXISTS shards (
+            dataset TEXT NOT NULL,
+            shard TEXT NOT NULL,
+            file TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            rows INTEGER NOT NULL,
+            PRIMARY KEY (dataset, shard)
+        ){STRICT}""",
+    ]
+    for dataset, table in TABLES.items():
+        counts = ',\n            '.join(f"{col} INTEGER NOT NULL" for col in count_columns(dataset))
+        statements.append(f"""CREATE TABLE IF NOT EXISTS {table} (
+            shard TEXT NOT NULL,
+            date TEXT,
+            state TEXT,
+            district TEXT,
+            pincode INTEGER,
+            {counts}
+        ){STRICT}""")
+        statements += [f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"
+                       for name, columns in index_columns(table)]
+
+    # Same semantics as build_merged_df: rows without a state are left out
+    # and only units present in both datasets get a ratio
+    for view, keys in RATIO_VIEWS.values():
+        key_list = ', '.join(keys)
+        not_null = ' AND '.join(f"{key} IS NOT NULL" for key in keys)
+        statements.append(f"""CREATE VIEW IF NOT EXISTS {view} AS
+            WITH e AS (SELECT {key_list}, SUM({_total_expr(ENROLMENT)}) AS Enrolment_Count
+                       FROM enrolment WHERE {not_null} GROUP BY {key_list}),
+                 u AS (SELECT {key_list}, SUM({_total_expr(DEMOGRAPHIC)}) AS Update_Count
+                       FROM demographic WHERE {not_null} GROUP BY {key_list})
+            SELECT {key_list}, Enrolment_Count, Update_Count,
+                   CAST(Update_Count AS REAL) / Enrolment_Count AS Update_Ratio
+            FROM e JOIN u USING ({key_list})""")
+    return statements
+
+
+def iqr_sql(view, column='Update_Ratio'):
+    """
+    Query returning Q1, Q3, IQR, lower_bound and upper_bound of a view column.
+
+    Quartiles use the same linear interpolation as pandas/numpy quantile,
+    computed with window functions; the fence multiplier is the :k
+    parameter.
+    """
+    return f"""
+        WITH ranked AS (
+            SELECT {column} AS x,
+                   ROW_NUMBER() OVER (ORDER BY {column}) - 1 AS i,
+                   COUNT(*) OVER () AS n
+            FROM {view} WHERE {column} IS NOT NULL
+        ),
+        probs(p) AS (VALUES (0.25), (0.75)),
+        positions AS (
+            SELECT p, p * (n - 1) AS pos, CAST(p * (n - 1) AS INTEGER) AS lo
+            FROM probs, (SELECT MAX(n) AS n FROM ranked)
+        ),
+        bracket AS (
+            SELECT positions.p, positions.pos - positions.lo AS t,
+                   MAX(CASE WHEN ranked.i = positions.lo THEN ranked.x END) AS a,
+                   COALESCE(MAX(CASE WHEN ranked.i = positions.lo + 1 THEN ranked.x END),
+                            MAX(CASE WHEN ranked.i = positions.lo THEN ranked.x END)) AS b
+            FROM positions JOIN ranked ON ranked.i IN (positions.lo, positions.lo + 1)
+            GROUP BY positions.p
+        ),
+        quartiles AS (
+            SELECT p, CASE WHEN t >= 0.5 THEN b - (b - a) * (1 - t) ELSE a + (b - a) * t END AS q
+            FROM bracket
+        )
+        SELECT q1.q AS Q1, q3.q AS Q3, q3.q - q1.q AS IQR,
+               q1.q - :k * (q3.q - q1.q) AS lower_bound,
+               q3.q + :k * (q3.q - q1.q) AS upper_bound
+        FROM quartiles q1, quartiles q3 WHERE q1.p = 0.25 AND q3.p = 0.75"""
+
+
+class AnalyticsDB:
+    """
+    Single-file SQLite database holding every record of both datasets.
+
+    Shards are ingested once (tracked in the shards table with their
+    size and row count); later questions are SQL over indexed, typed
+    tables instead of a re-parse of the CSVs. query() runs on a separate
+    read-only connection, so user SQL cannot change the store.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise ValueError(f"{path} has schema version {version}, expected {SCHEMA_VERSION}; "
+                             f"delete it and ingest again")
+        with self.conn:
+            for statement in schema_sql():
+                self.conn.execute(statement)
+            self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self.reader = sqlite3.connect(pathlib.Path(path).absolute().as_uri() + '?mode=ro', uri=True)
+        self.reader.execute("PRAGMA query_only=ON")
+        self.reader.set_authorizer(_allow_reads)
+
+    def close(self):
+        self.reader.close()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Ingest
+    # ------------------------------------------------------------------
+    def applied(self, dataset):
+        rows = self.conn.execute("SELECT shard, size FROM shards WHERE dataset = ?", (dataset,))
+        return dict(rows.fetchall())
+
+    def pending(self, files, dataset):
+        """Return the shards of files that have not been ingested yet."""
+        applied = self.applied(dataset)
+        delta = []
+        for path in files:
+            sid = shard_id(path)
+            if sid not in applied:
+                delta.append(path)
+            elif applied[sid] != os.path.getsize(path):
+                raise ValueError(f"Shard {path} changed after it was ingested; rebuild {self.path}")
+        return delta
+
+    def ingest_shard(self, path, dataset, chunksize=DEFAULT_CHUNKSIZE, validator=None):
+        """Insert one shard and its shards row in a single transaction. Returns the row count."""
+        table = TABLES[dataset]
+        columns = ['date', 'state', 'district', 'pincode'] + count_columns(dataset)
+        placeholders = ', '.join('?' * (len(columns) + 1))
+        sid = shard_id(path)
+        n_rows = 0
+        with self.conn:
+            for chunk in iter_chunks(path, dataset, chunksize=chunksize, validator=validator):
+                n_rows += len(chunk)
+                values = [_sql_values(chunk['date'].dt.strftime('%Y-%m-%d'))]
+                values += [_sql_values(chunk[col]) for col in columns[1:]]
+                self.conn.executemany(
+                    f"INSERT INTO {table} (shard, {', '.join(columns)}) VALUES ({placeholders})",
+                    zip(itertools.repeat(sid), *values))
+            self.conn.execute("INSERT INTO shards VALUES (?, ?, ?, ?, ?)",
+                              (dataset, sid, os.path.basename(path), os.path.getsize(path), n_rows))
+        return n_rows
+
+    def ingest(self, enrolment_files, demographic_files, chunksize=DEFAULT_CHUNKSIZE,
+               verbose=False, validator=None):
+        """
+        Ingest every shard not yet in the database; return the number ingested.
+
+        With a validation.Validator only the records that pass its checks
+        are stored, with canonical names.
+
+        Maintaining the secondary indexes row by row costs several times
+        the inserts themselves, so for an empty table or a large delta
+        (REBUILD_FRACTION of the shard bytes already in it) they are
+        dropped for the load and rebuilt, and the table re-analyzed, once
+        at the end. A small delta is inserted into the existing indexes, so
+        its cost does not grow with the table.
+        """
+        pending = [(dataset, path)
+                   for dataset, files in ((ENROLMENT, enrolment_files),
+                                          (DEMOGRAPHIC, demographic_files))
+                   for path in self.pending(files, dataset)]
+        if not pending:
+            return 0
+
+        rebuild = []
+        for dataset, table in TABLES.items():
+            added = sum(os.path.getsize(path) for name, path in pending if name == dataset)
+            stored = sum(self.applied(dataset).values())
+            if added and added >= REBUILD_FRACTION * stored:
+                rebuild.append(table)
+        for table in rebuild:
+            for name, _ in index_columns(table):
+                self.conn.execute(f"DROP INDEX IF EXISTS {name}")
+        try:
+            for dataset, path in pending:
+                if verbose:
+                    print(f"  - Ingesting: {path}")
+                self.ingest_shard(path, dataset, chunksize, validator)
+        finally:
+            with self.conn:
+                for table in rebuild:
+                    for name, columns in index_columns(table):
+                        self.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+            # Refresh the planner statistics used to pick indexes
+            for table in rebuild:
+                self.conn.execute(f"ANALYZE {table}")
+        return len(pending)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def query(self, sql, params=()):
+        """
+        Run a SELECT and return the result as a DataFrame.
+
+        The read-only connection rejects anything but reading tables and
+        views, such as writes, PRAGMA and ATTACH
+        (pandas.errors.DatabaseError).
+        """
+        return pd.read_sql_query(sql, self.reader, params=params)
+
+    def row_count(self, dataset):
+        row = self.conn.execute("SELECT COALESCE(SUM(rows), 0) FROM shards WHERE dataset = ?",
+                                (dataset,)).fetchone()
+        return int(row[0])
+
+    def level_table(self, dataset, keys):
+        """Count columns of a dataset summed by keys (rows with a missing key left out)."""
+        key_list = ', '.join(keys)
+        sums = ', '.join(f"SUM({col}) AS {col}" for col in count_columns(dataset))
+        not_null = ' AND '.join(f"{key} IS NOT NULL" for key in keys)
+        table = self.query(f"SELECT {key_list}, {sums} FROM {TABLES[dataset]} "
+                           f"WHERE {not_null} GROUP BY {key_list} ORDER BY {key_list}")
+        if 'date' in keys:
+            table['date'] = pd.to_datetime(table['date'])
+        return table
+
+    def ratios(self, level='state'):
+        """Per-unit Enrolment_Count, Update_Count and Update_Ratio, highest ratio first."""
+        view, _ = RATIO_VIEWS[level]
+        return self.query(f"SELECT * FROM {view} ORDER BY Update_Ratio DESC")
+
+    def merged_df(self, how='inner'):
+        """
+        The state-level merged_df of the analysis scripts.
+
+        The inner join is the state_ratios view; other joins merge the
+        per-state sums with analysis.build_merged_df.
+        """
+        if how == 'inner':
+            return self.ratios('state')
+        return build_merged_df(self.level_table(ENROLMENT, ['state']),
+                               self.level_table(DEMOGRAPHIC, ['state']), how)
+
+    def thresholds(self, level='state', k=1.5):
+        """IQR fence of the unit ratios of a level, computed in SQL; all NaN with no ratios."""
+        view, _ = RATIO_VIEWS[level]
+        row = self.query(iqr_sql(view), {'k': k})
+        if row.empty:
+            return {col: float('nan') for col in row.columns}
+        return {col: float(row[col].iloc[0]) for col in row.columns}
+
+    def outliers(self, level='state', k=1.5):
+        """Units whose ratio is above the upper IQR fence, highest first."""
+        view, _ = RATIO_VIEWS[level]
+        return self.query(
+            f"SELECT v.* FROM {view} v, ({iqr_sql(view)}) f "
+            f"WHERE v.Update_Ratio > f.upper_bound ORDER BY v.Update_Ratio DESC", {'k': k})
@@ -0,0 +1,220 @@
+"""
+UIDAI Hackathon - Streaming Anomaly Scoring
+Keeps running per-state counts, fences the current per-state update ratios and
+emits an alert when a state crosses the fence as records arrive from watched
+directories or stdin
+
+Usage:
+    python -m uidai_analytics.streaming --watch
+    cat new_records.csv | python -m uidai_analytics.streaming --stdin --dataset demographic
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from .discovery import DATA_DIRS
+from .loader import DEMOGRAPHIC, ENROLMENT, count_columns, dataset_columns, iter_chunks
+
+
+class StreamingScorer:
+    """
+    Running per-state enrolment/update totals with an IQR fence on the ratio.
+
+    The fence is taken from the current ratio of every state, exactly as
+    the batch analysis takes it from merged_df, so it never mixes in the
+    partial ratios of earlier batches. A state is reported when its ratio
+    crosses above Q3 + k * IQR, and again only after it has dropped back
+    below. Memory is bounded by the number of states, not by the records
+    seen.
+    """
+
+    def __init__(self, k=1.5, min_enrolment=1, min_states=5):
+        self.k = k
+        self.min_enrolment = min_enrolment
+        self.min_states = min_states
+        self.enrolment = {}
+        self.update = {}
+        self.above = set()
+        self.records = 0
+
+    def ratios(self):
+        """{state: Update_Ratio} of the states with enough enrolments."""
+        return {state: self.update.get(state, 0) / enrolment
+                for state, enrolment in self.enrolment.items() if enrolment >= self.min_enrolment}
+
+    def thresholds(self, ratios=None):
+        """(Q1, Q3, lower_bound, upper_bound); NaN until min_states states have a ratio."""
+        values = list((self.ratios() if ratios is None else ratios).values())
+        if len(values) < max(self.min_states, 1):
+            return (float('nan'),) * 4
+        q1, q3 = np.quantile(values, [0.25, 0.75])
+        iqr = q3 - q1
+        return q1, q3, q1 - self.k * iqr, q3 + self.k * iqr
+
+    def add_totals(self, dataset, totals):
+        """Fold {state: count} totals of one batch in; return alerts for states that crossed."""
+        target = self.enrolment if dataset == ENROLMENT else self.update
+        for state, count in totals.items():
+            target[state] = target.get(state, 0) + count
+
+        ratios = self.ratios()
+        q1, q3, _, upper = self.thresholds(ratios)
+        if math.isnan(upper):
+            return []
+        # The fence moves with every batch, so every state is re-checked
+        above = {state for state, ratio in ratios.items() if ratio > upper}
+        crossed = sorted(above - self.above)
+        self.above = above
+        return [{
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'state': state,
+            'Update_Ratio': round(ratios[state], 4),
+            'upper_bound': round(upper, 4),
+            'Q1': round(q1, 4),
+            'Q3': round(q3, 4),
+            'Enrolment_Count': self.enrolment.get(state, 0),
+            'Update_Count': self.update.get(state, 0),
+        } for state in crossed]
+
+
+def emit(alerts, out=sys.stdout):
+    for alert in alerts:
+        out.write(json.dumps(alert) + '\n')
+    out.flush()
+
+
+def shard_totals(path, dataset, chunksize=50_000):
+    """({state: count}, records) of one shard."""
+    totals = {}
+    records = 0
+    for chunk in iter_chunks(path, dataset, ['state'] + count_columns(dataset), chunksize=chunksize):
+        records += len(chunk)
+        chunk = chunk.dropna(subset=['state'])
+        counts = chunk.groupby('state', observed=True)[count_columns(dataset)].sum().sum(axis=1)
+        for state, count in counts.items():
+            totals[str(state)] = totals.get(str(state), 0) + int(count)
+    return totals, records
+
+
+def watch_directories(scorer, root='.', interval=2.0, chunksize=50_000, once=False):
+    """
+    Poll the data directories and score every shard once it has stopped changing.
+
+    A shard is read when its (size, mtime) is the same on two polls in a
+    row, or when it was last modified at least interval seconds ago, so a
+    file still being copied is not read half-written. A shard that changes
+    after it was scored (appended to or rewritten) is read again and only
+    the difference from its previous totals is folded in. A shard that
+    cannot be parsed is logged and skipped until its (size, mtime)
+    changes. With once, the directories are polled until no shard is left
+    waiting.
+    """
+    listed = {}
+    scored = {}
+    failed = {}
+    while True:
+        waiting = False
+        for dataset, subdir in DATA_DIRS.items():
+            directory = os.path.join(root, subdir)
+            if not os.path.isdir(directory):
+                continue
+            for name in sorted(os.listdir(directory)):
+                path = os.path.join(directory, name)
+                if not name.endswith('.csv'):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                version = (stat.st_size, stat.st_mtime_ns)
+                previous, listed[path] = listed.get(path), version
+                if (path in scored and scored[path][0] == version) or failed.get(path) == version:
+                    continue
+                if previous != version and time.time() - stat.st_mtime < interval:
+                    waiting = True
+                    continue
+                try:
+                    totals, records = shard_totals(path, dataset, chunksize)
+                except (ValueError, pd.errors.ParserError) as error:
+                    # Skipped until the file changes again
+                    print(f"Skipping unreadable shard {path}: {error}", file=sys.stderr)
+                    failed[path] = version
+                    continue
+                failed.pop(path, None)
+                _, old_totals, old_records = scored.get(path, (None, {}, 0))
+                delta = {state: totals.get(state, 0) - old_totals.get(state, 0)
+                         for state in set(totals) | set(old_totals)}
+                scored[path] = (version, totals, records)
+                scorer.records += records - old_records
+                emit(scorer.add_totals(dataset, delta))
+        if once and not waiting:
+            return
+        time.sleep(interval)
+
+
+def read_stdin(scorer, dataset, stream=sys.stdin):
+    """
+    Score CSV records from a stream line by line.
+
+    A header line switches the dataset, so enrolment and demographic
+    records can be interleaved.
+    """
+    columns = dataset_columns(dataset)
+    for row in csv.reader(stream):
+        if not row:
+            continue
+        if row[0] == 'date':
+            columns = row
+            dataset = ENROLMENT if 'age_0_5' in row else DEMOGRAPHIC
+            continue
+        record = dict(zip(columns, row))
+        state = record.get('state')
+        if not state:
+            continue
+        try:
+            count = sum(int(record[col]) for col in count_columns(dataset))
+        except (KeyError, ValueError):
+            continue
+        scorer.records += 1
+        emit(scorer.add_totals(dataset, {state: count}))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streaming update-ratio anomaly alerts")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--watch', action='store_true',
+                        help="Watch the enrolment/demographic data directories for new shards")
+    source.add_argument('--stdin', action='store_true', help="Read CSV records from stdin")
+    parser.add_argument('--root', default='.', help="Directory holding the data folders")
+    parser.add_argument('--dataset', choices=[ENROLMENT, DEMOGRAPHIC], default=DEMOGRAPHIC,
+                        help="Dataset of stdin records until a header line says otherwise")
+    parser.add_argument('--interval', type=float, default=2.0, help="Polling interval in seconds")
+    parser.add_argument('--k', type=float, default=1.5, help="IQR multiplier of the outlier fence")
+    parser.add_argument('--min-enrolment', type=int, default=1,
+                        help="Ignore states with fewer enrolments than this")
+    parser.add_argument('--once', action='store_true', help="Scan the directories once and exit")
+    args = parser.parse_args(argv)
+
+    scorer = StreamingScorer(k=args.k, min_enrolment=args.min_enrolment)
+    try:
+        if args.watch:
+            watch_directories(scorer, args.root, args.interval, once=args.once)
+        else:
+            read_stdin(scorer, args.dataset)
+    except KeyboardInterrupt:
+        pass
+    q1, q3, _, upper = scorer.thresholds()
+    print(f"Records scored: {scorer.records:,}  Q1: {q1:.2f}  Q3: {q3:.2f}  "
+          f"Outlier threshold: {upper:.2f}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
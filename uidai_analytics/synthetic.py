@@ -0,0 +1,218 @@
+"""
+UIDAI Hackathon - Synthetic Shard Generator
+Writes realistic enrolment / demographic shards at any scale for benchmarking
+
+Usage:
+    python -m uidai_analytics.synthetic --rows 1000000 --out-dir /tmp/uidai_synth
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .discovery import DATA_DIRS, discover_shards
+from .loader import DATE_FORMAT, DEMOGRAPHIC, ENROLMENT, count_columns
+
+# Per-record mean and negative binomial dispersion of every count column,
+# fitted by eye to the shipped shards (small counts with a long tail)
+COUNT_PROFILE = {
+    'age_0_5': (3.6, 1.5),
+    'age_5_17': (3.5, 0.8),
+    'age_18_greater': (0.1, 0.3),
+    'demo_age_5_17': (1.3, 0.4),
+    'demo_age_17_': (12.4, 0.5),
+}
+
+# Upper bounds of the loader's unsigned count dtypes
+COUNT_LIMITS = {'age_0_5': 65535, 'age_5_17': 65535, 'age_18_greater': 65535,
+                'demo_age_5_17': 65535, 'demo_age_17_': 4294967295}
+
+# Fallback geography when no real shards are available: state and the
+# first two digits of its pincodes (postal circle)
+STATES = [
+    ('Uttar Pradesh', 20), ('Maharashtra', 40), ('Bihar', 80), ('West Bengal', 70),
+    ('Madhya Pradesh', 45), ('Tamil Nadu', 60), ('Rajasthan', 30), ('Karnataka', 56),
+    ('Gujarat', 36), ('Andhra Pradesh', 51), ('Odisha', 75), ('Telangana', 50),
+    ('Kerala', 67), ('Jharkhand', 81), ('Assam', 78), ('Punjab', 14), ('Chhattisgarh', 49),
+    ('Haryana', 12), ('Delhi', 11), ('Jammu and Kashmir', 18), ('Uttarakhand', 24),
+    ('Himachal Pradesh', 17), ('Tripura', 79), ('Meghalaya', 79), ('Manipur', 79),
+    ('Nagaland', 79), ('Goa', 40), ('Arunachal Pradesh', 79), ('Puducherry', 60),
+    ('Mizoram', 79), ('Chandigarh', 16), ('Sikkim', 73), ('Ladakh', 19),
+    ('Andaman and Nicobar Islands', 74), ('Lakshadweep', 68),
+    ('Dadra and Nagar Haveli and Daman and Diu', 39),
+]
+
+
+def real_geography(root='.'):
+    """Unique (state, district, pincode) units of the shards under root, or None."""
+    enrolment_files, demographic_files = discover_shards(root).split()
+    frames = [pd.read_csv(path, usecols=['state', 'district', 'pincode'])
+              for path in enrolment_files + demographic_files]
+    if not frames:
+        return None
+    units = pd.concat(frames).dropna().drop_duplicates()
+    units['pincode'] = units['pincode'].astype(np.int32)
+    return units.sort_values(['state', 'district', 'pincode']).reset_index(drop=True)
+
+
+def synthetic_geography(rng, districts_per_state=20, pincodes_per_district=25):
+    """A made-up but plausibly shaped state -> district -> pincode hierarchy."""
+    rows = []
+    for state, circle in STATES:
+        for d in range(districts_per_state):
+            district = f"{state.split()[0]} District {d + 1}"
+            offsets = rng.choice(10_000, size=pincodes_per_district, replace=False)
+            for offset in offsets:
+                rows.append((state, district, circle * 10_000 + int(offset)))
+    return pd.DataFrame(rows, columns=['state', 'district', 'pincode']).astype({'pincode': np.int32})
+
+
+def zipf_weights(n, exponent, rng):
+    """Zipf-like weights over n items in random rank order, summing to one."""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def unit_weights(units, rng, state_skew=1.1, pincode_skew=0.8):
+    """Sampling probability of every unit: Zipf across states, then within each state."""
+    state_codes, states = pd.factorize(units['state'])
+    state_weight = zipf_weights(len(states), state_skew, rng)
+    weights = np.empty(len(units))
+    for code in range(len(states)):
+        members = np.flatnonzero(state_codes == code)
+        weights[members] = state_weight[code] * zipf_weights(len(members), pincode_skew, rng)
+    return weights / weights.sum()
+
+
+def day_weights(n_days, rng, spike_rate=0.05, spike_factor=6.0):
+    """Daily volume with weekly seasonality and occasional spike days."""
+    days = np.arange(n_days)
+    weekly = 1.0 - 0.4 * (days % 7 >= 5)
+    noise = rng.lognormal(0.0, 0.2, n_days)
+    spikes = np.where(rng.random(n_days) < spike_rate, spike_factor, 1.0)
+    weights = weekly * noise * spikes
+    return weights / weights.sum()
+
+
+class ShardGenerator:
+    """
+    Draws synthetic records for one dataset, one chunk at a time.
+
+    Units and days are sampled by inverse CDF lookup, so each chunk costs
+    O(rows * log units) regardless of the total size being generated.
+    """
+
+    def __init__(self, dataset, units, start_date='2025-09-01', days=120, seed=0):
+        self.dataset = dataset
+        self.rng = np.random.default_rng(seed)
+        self.units = units.reset_index(drop=True)
+        self.unit_cdf = np.cumsum(unit_weights(self.units, self.rng))
+        self.day_cdf = np.cumsum(day_weights(days, self.rng))
+        dates = pd.date_range(start_date, periods=days, freq='D')
+        self.date_strings = np.asarray(dates.strftime(DATE_FORMAT))
+        # Per-unit activity level gives the pincode totals a heavy tail
+        self.activity = self.rng.lognormal(0.0, 0.6, len(self.units))
+        self.columns = count_columns(dataset)
+
+    def chunk(self, n_rows):
+        """n_rows synthetic records as a DataFrame with the real column order."""
+        rng = self.rng
+        unit = np.searchsorted(self.unit_cdf, rng.random(n_rows) * self.unit_cdf[-1])
+        unit = np.minimum(unit, len(self.units) - 1)
+        day = np.searchsorted(self.day_cdf, rng.random(n_rows) * self.day_cdf[-1])
+        day = np.minimum(day, len(self.date_strings) - 1)
+
+        frame = pd.DataFrame({'date': self.date_strings[day]})
+        for col in ('state', 'district', 'pincode'):
+            frame[col] = self.units[col].to_numpy()[unit]
+        activity = self.activity[unit]
+        for col in self.columns:
+            mean, dispersion = COUNT_PROFILE[col]
+            mu = mean * activity
+            counts = rng.negative_binomial(dispersion, dispersion / (dispersion + mu))
+            frame[col] = np.minimum(counts, COUNT_LIMITS[col])
+        return frame
+
+
+def write_dataset(generator, out_dir, n_rows, rows_per_shard=1_000_000, chunk_rows=250_000,
+                  first_id=0, verbose=False):
+    """Stream n_rows records into <prefix>_<start>_<end>.csv shards. Returns the paths."""
+    prefix = DATA_DIRS[generator.dataset]
+    target_dir = os.path.join(out_dir, prefix)
+    os.makedirs(target_dir, exist_ok=True)
+    paths = []
+    written = 0
+    while written < n_rows:
+        shard_rows = min(rows_per_shard, n_rows - written)
+        start = first_id + written
+        path = os.path.join(target_dir, f"{prefix}_{start}_{start + shard_rows}.csv")
+        with open(path, 'w', newline='') as f:
+            done = 0
+            while done < shard_rows:
+                rows = min(chunk_rows, shard_rows - done)
+                generator.chunk(rows).to_csv(f, header=(done == 0), index=False)
+                done += rows
+        written += shard_rows
+        paths.append(path)
+        if verbose:
+            print(f"  - Wrote: {path} ({shard_rows:,} rows)")
+    return paths
+
+
+def generate(out_dir, enrolment_rows, demographic_rows=None, rows_per_shard=1_000_000,
+             geography_root='.', start_date='2025-09-01', days=120, seed=0, verbose=False):
+    """
+    Write synthetic shards of both datasets under out_dir.
+
+    Units come from the real shards under geography_root when there are
+    any (so names, pincodes and their quirks look like production data),
+    otherwise from a built-in state list. demographic_rows defaults to
+    twelve times enrolment_rows, the ratio of the shipped shards.
+    Returns {dataset: [paths]}.
+    """
+    if demographic_rows is None:
+        demographic_rows = 12 * enrolment_rows
+    rng = np.random.default_rng(seed)
+    units = real_geography(geography_root) if geography_root else None
+    if units is None:
+        units = synthetic_geography(rng)
+
+    files = {}
+    for offset, (dataset, n_rows) in enumerate(((ENROLMENT, enrolment_rows),
+                                                (DEMOGRAPHIC, demographic_rows))):
+        generator = ShardGenerator(dataset, units, start_date, days, seed=seed + offset + 1)
+        files[dataset] = write_dataset(generator, out_dir, n_rows, rows_per_shard,
+                                       verbose=verbose)
+    return files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic Aadhaar shards")
+    parser.add_argument('--out-dir', required=True, help="Directory the data folders are created in")
+    parser.add_argument('--rows', type=float, default=1e5,
+                        help="Total rows across both datasets, 1e5 .. 1e9 (default: 1e5)")
+    parser.add_argument('--rows-per-shard', type=int, default=1_000_000)
+    parser.add_argument('--days', type=int, default=120, help="Calendar days covered")
+    parser.add_argument('--start-date', default='2025-09-01')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--geography-root', default='.',
+                        help="Take states/districts/pincodes from the shards here ('' for built-in)")
+    args = parser.parse_args(argv)
+
+    total = int(args.rows)
+    enrolment_rows = total // 13
+    start = time.perf_counter()
+    files = generate(args.out_dir, enrolment_rows, total - enrolment_rows, args.rows_per_shard,
+                     args.geography_root, args.start_date, args.days, args.seed, verbose=True)
+    elapsed = time.perf_counter() - start
+    n_shards = sum(len(paths) for paths in files.values())
+    print(f"Generated {total:,} rows in {n_shards} shards in {elapsed:.1f}s "
+          f"({total / elapsed:,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
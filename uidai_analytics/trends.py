@@ -0,0 +1,160 @@
+"""
+UIDAI Hackathon - Time-Series Trend Engine
+Dense (date x unit x age group) count arrays with rolling windows and spike detection
+"""
+
+import numpy as np
+import pandas as pd
+
+from .hierarchy import LEVEL_KEYS, encode_levels
+from .loader import count_columns
+
+
+class DailyCube:
+    """
+    Dense daily counts: counts[day, unit, band].
+
+    Days cover every calendar day between the first and last date seen,
+    so gaps in the data show up as zero rows rather than being skipped.
+    observed[day, unit] marks the cells that have any record at all; the
+    others are gaps in the data, not days without activity.
+    """
+
+    def __init__(self, dates, units, bands, counts, observed=None):
+        self.dates = dates
+        self.units = units
+        self.bands = bands
+        self.counts = counts
+        self.observed = np.ones(counts.shape[:2], dtype=bool) if observed is None else observed
+
+    @property
+    def totals(self):
+        """Counts summed over age bands, shape (days, units)."""
+        return self.counts.sum(axis=2)
+
+    def band_totals(self):
+        """National daily counts per age band as a DataFrame."""
+        return pd.DataFrame(self.counts.sum(axis=1), index=self.dates, columns=self.bands)
+
+
+def build_daily_cube(frame, dataset, level='state'):
+    """
+    Scatter rows (raw records or a pre-aggregated date/unit table) into a DailyCube.
+
+    Rows with an unparseable date or a missing unit key are skipped.
+    """
+    keys = LEVEL_KEYS[level]
+    bands = count_columns(dataset)
+    frame = frame.dropna(subset=['date'] + keys)
+
+    days = frame['date'].to_numpy('datetime64[D]').astype(np.int64)
+    if len(days):
+        first, last = days.min(), days.max()
+    else:
+        first = last = 0
+    day_index = days - first
+    n_days = int(last - first) + 1 if len(days) else 0
+    dates = pd.date_range(pd.Timestamp(np.datetime64(int(first), 'D')), periods=n_days, freq='D')
+
+    codes, labels = encode_levels(frame[keys], levels=list(LEVEL_KEYS)[:len(keys)])
+    unit_codes = codes[level]
+    units = labels[level]
+    n_units = len(units)
+
+    flat = day_index * n_units + unit_codes
+    counts = np.empty((n_days, n_units, len(bands)), dtype=np.int64)
+    for b, band in enumerate(bands):
+        counts[:, :, b] = np.bincount(flat, weights=frame[band].to_numpy(np.float64),
+                                      minlength=n_days * n_units).reshape(n_days, n_units)
+    observed = (np.bincount(flat, minlength=n_days * n_units) > 0).reshape(n_days, n_units)
+    return DailyCube(dates, units, bands, counts, observed)
+
+
+def _shifted_cumsum(values):
+    """Cumulative sum along time with a leading zero row."""
+    cumsum = np.cumsum(values, axis=0, dtype=np.float64)
+    return np.concatenate([np.zeros((1,) + values.shape[1:]), cumsum], axis=0)
+
+
+def rolling_mean(values, window):
+    """Trailing mean over up to window days (shorter at the start), along axis 0."""
+    cumsum = _shifted_cumsum(values)
+    n = len(values)
+    end = np.arange(1, n + 1)
+    start = np.maximum(end - window, 0)
+    length = (end - start).reshape((-1,) + (1,) * (values.ndim - 1))
+    return (cumsum[end] - cumsum[start]) / length
+
+
+def day_over_day(values):
+    """Change from the previous day along axis 0 (zero on the first day)."""
+    return np.diff(values, axis=0, prepend=values[:1])
+
+
+def rolling_zscore(values, window, min_periods=3):
+    """
+    z-score of each day against the mean and std of the preceding window days.
+
+    The current day is excluded from its own baseline, so a spike cannot
+    hide itself. NaN values are missing days: they get NaN and are left out
+    of the baselines of the days after them. Days with fewer than
+    min_periods non-missing days in their window get NaN. The std is
+    floored at the Poisson sqrt(mean), and at 1, so a jump after a flat or
+    all-zero run still gets a finite, large z-score.
+    """
+    values = values.astype(np.float64)
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0.0)
+    cumsum = _shifted_cumsum(filled)
+    cumsum_sq = _shifted_cumsum(filled ** 2)
+    cumcount = _shifted_cumsum(present)
+    n = len(values)
+    end = np.arange(n)
+    start = np.maximum(end - window, 0)
+    length = cumcount[end] - cumcount[start]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = (cumsum[end] - cumsum[start]) / length
+        variance = (cumsum_sq[end] - cumsum_sq[start]) / length - mean ** 2
+        std = np.maximum(np.sqrt(np.maximum(variance, 0)), np.sqrt(np.maximum(mean, 1)))
+        z = (values - mean) / std
+    z[length < min_periods] = np.nan
+    z[~np.isfinite(z)] = np.nan
+    return z, mean
+
+
+class TrendResult:
+    """Rolling statistics and spike flags for every (day, unit) of a cube."""
+
+    def __init__(self, cube, window, threshold, min_count):
+        totals = cube.totals
+        self.cube = cube
+        self.window = window
+        self.totals = totals
+        self.rolling_mean = rolling_mean(totals, window)
+        self.delta = day_over_day(totals)
+        # Cells without any record are gaps, not zero-activity baselines
+        observed = np.where(cube.observed, totals, np.nan)
+        self.zscore, self.baseline = rolling_zscore(observed, window)
+        self.spikes = (self.zscore > threshold) & (totals >= min_count)
+
+    def spike_table(self):
+        """Flagged (date, unit) spikes, largest z-score first."""
+        day, unit = np.nonzero(self.spikes)
+        table = self.cube.units.iloc[unit].reset_index(drop=True)
+        table.insert(0, 'date', self.cube.dates[day])
+        table['count'] = self.totals[day, unit]
+        table['baseline_mean'] = self.baseline[day, unit]
+        table['delta'] = self.delta[day, unit]
+        table['zscore'] = self.zscore[day, unit]
+        return table.sort_values('zscore', ascending=False).reset_index(drop=True)
+
+
+def detect_trends(frame, dataset, level='state', window=7, threshold=3.0, min_count=10):
+    """
+    Build the daily cube for a level and flag rolling-window spikes.
+
+    frame may also be a ready DailyCube (e.g. RollupCube.daily_cube()).
+    """
+    cube = frame if isinstance(frame, DailyCube) else build_daily_cube(frame, dataset, level)
+    return TrendResult(cube, window, threshold, min_count)
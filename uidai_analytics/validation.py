@@ -0,0 +1,404 @@
+"""
+UIDAI Hackathon - Data-Quality Validation
+Vectorized per-chunk checks run by the loader while a shard is parsed: state
+and district names are canonicalised and bad records are quarantined
+"""
+
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from .loader import COUNT_DTYPES, DATE_FORMAT, parse_shard_range
+
+# Current names of the states and union territories
+CANONICAL_STATES = (
+    'Andaman and Nicobar Islands', 'Andhra Pradesh', 'Arunachal Pradesh', 'Assam', 'Bihar',
+    'Chandigarh', 'Chhattisgarh', 'Dadra and Nagar Haveli and Daman and Diu', 'Delhi', 'Goa',
+    'Gujarat', 'Haryana', 'Himachal Pradesh', 'Jammu and Kashmir', 'Jharkhand', 'Karnataka',
+    'Kerala', 'Ladakh', 'Lakshadweep', 'Madhya Pradesh', 'Maharashtra', 'Manipur', 'Meghalaya',
+    'Mizoram', 'Nagaland', 'Odisha', 'Puducherry', 'Punjab', 'Rajasthan', 'Sikkim',
+    'Tamil Nadu', 'Telangana', 'Tripura', 'Uttar Pradesh', 'Uttarakhand', 'West Bengal',
+)
+
+# Old names and misspellings, keyed like name_key(). Keys of the canonical
+# names themselves are added below, so case, spacing and '&' vs 'and'
+# never need an entry here.
+STATE_ALIASES = {
+    'orissa': 'Odisha',
+    'pondicherry': 'Puducherry',
+    'westbangal': 'West Bengal',
+    'uttaranchal': 'Uttarakhand',
+    'chhatisgarh': 'Chhattisgarh',
+    'nctofdelhi': 'Delhi',
+    'newdelhi': 'Delhi',
+    'andamanandnicobar': 'Andaman and Nicobar Islands',
+    'dadraandnagarhaveli': 'Dadra and Nagar Haveli and Daman and Diu',
+    'damananddiu': 'Dadra and Nagar Haveli and Daman and Diu',
+}
+
+# District spellings that cleaning alone does not reconcile, keyed like
+# name_key() -> the spelling kept
+DISTRICT_ALIASES = {
+    'aurangabadbh': 'Aurangabad(BH)',
+    'banaskantha': 'Banaskantha',
+    'barabanki': 'Barabanki',
+    'janjgirchampa': 'Janjgir-Champa',
+    'karimnagar': 'Karimnagar',
+    'kvrangareddy': 'K.V. Rangareddy',
+    'mahabubnagar': 'Mahabubnagar',
+    'medchalmalkajgiri': 'Medchal-Malkajgiri',
+    'mumbaisuburban': 'Mumbai Suburban',
+    'panchmahals': 'Panchmahals',
+    'sabarkantha': 'Sabarkantha',
+    'sasnagarmohali': 'SAS Nagar (Mohali)',
+    'seraikelakharsawan': 'Seraikela-Kharsawan',
+    'surendranagar': 'Surendranagar',
+    'warangalurban': 'Warangal Urban',
+    'yamunanagar': 'Yamunanagar',
+}
+
+# Postal region (first two pincode digits) -> the states it serves
+PIN_PREFIX_STATES = {
+    11: ('Delhi',),
+    12: ('Haryana',), 13: ('Haryana',),
+    14: ('Punjab',), 15: ('Punjab',), 16: ('Punjab', 'Chandigarh'),
+    17: ('Himachal Pradesh',),
+    18: ('Jammu and Kashmir',), 19: ('Jammu and Kashmir', 'Ladakh'),
+    20: ('Uttar Pradesh',), 21: ('Uttar Pradesh',), 22: ('Uttar Pradesh',),
+    23: ('Uttar Pradesh',), 24: ('Uttar Pradesh', 'Uttarakhand'), 25: ('Uttar Pradesh',),
+    26: ('Uttar Pradesh', 'Uttarakhand'), 27: ('Uttar Pradesh',), 28: ('Uttar Pradesh',),
+    30: ('Rajasthan',), 31: ('Rajasthan',), 32: ('Rajasthan',), 33: ('Rajasthan',),
+    34: ('Rajasthan',),
+    36: ('Gujarat', 'Dadra and Nagar Haveli and Daman and Diu'), 37: ('Gujarat',),
+    38: ('Gujarat',), 39: ('Gujarat', 'Dadra and Nagar Haveli and Daman and Diu'),
+    40: ('Maharashtra', 'Goa'), 41: ('Maharashtra',), 42: ('Maharashtra',),
+    43: ('Maharashtra',), 44: ('Maharashtra',),
+    45: ('Madhya Pradesh',), 46: ('Madhya Pradesh',), 47: ('Madhya Pradesh',),
+    48: ('Madhya Pradesh',), 49: ('Chhattisgarh',),
+    50: ('Telangana', 'Andhra Pradesh'), 51: ('Andhra Pradesh',), 52: ('Andhra Pradesh',),
+    53: ('Andhra Pradesh', 'Puducherry'),
+    56: ('Karnataka',), 57: ('Karnataka',), 58: ('Karnataka',), 59: ('Karnataka',),
+    60: ('Tamil Nadu', 'Puducherry'), 61: ('Tamil Nadu',), 62: ('Tamil Nadu',),
+    63: ('Tamil Nadu',), 64: ('Tamil Nadu',),
+    67: ('Kerala', 'Puducherry'), 68: ('Kerala', 'Lakshadweep'), 69: ('Kerala',),
+    70: ('West Bengal',), 71: ('West Bengal',), 72: ('West Bengal',),
+    73: ('West Bengal', 'Sikkim'), 74: ('West Bengal', 'Andaman and Nicobar Islands'),
+    75: ('Odisha',), 76: ('Odisha',), 77: ('Odisha',),
+    78: ('Assam',),
+    79: ('Arunachal Pradesh', 'Meghalaya', 'Manipur', 'Mizoram', 'Nagaland', 'Tripura'),
+    80: ('Bihar',), 81: ('Bihar', 'Jharkhand'), 82: ('Bihar', 'Jharkhand'),
+    83: ('Jharkhand',), 84: ('Bihar',), 85: ('Bihar',),
+}
+
+# Largest believable count of one age band at one pincode on one day, about
+# 30x the largest in the published shards
+MAX_COUNT = 50_000
+
+# Quarantine reasons in the order they are checked; a record is filed under
+# the first one that applies
+REASONS = {
+    'duplicate_range': "record ID already read from an earlier, overlapping shard",
+    'missing_state': "state is blank",
+    'bad_pincode': "pincode missing, not six digits or in no known postal region",
+    'unknown_state': "state not recognised and the pincode's region spans several states",
+    'pincode_state_mismatch': "pincode's postal region does not serve the state",
+    'bad_count': "count missing, negative, fractional or above the maximum",
+    'bad_date': "date missing or not DD-MM-YYYY",
+}
+
+# Rows kept but rewritten
+REPAIRS = ('state_spelling', 'state_from_pincode', 'district_spelling')
+
+QUARANTINE_SUFFIX = '.quarantine.csv.gz'
+SUMMARY_SUFFIX = '.quality.json'
+
+_DASHES = dict.fromkeys(map(ord, '‐‑‒–—−'), '-')
+
+
+def name_key(name):
+    """Lower-case letters and digits only, with '&' read as 'and'."""
+    return re.sub(r'[^a-z0-9]', '', name.lower().replace('&', 'and'))
+
+
+def clean_name(name):
+    """Tidy a raw name: dashes, '*' markers, '&', runs of spaces and all-caps/all-lower case."""
+    name = name.translate(_DASHES).replace('*', ' ').replace('&', ' and ')
+    name = ' '.join(name.split())
+    if name.isupper() or name.islower():
+        name = name.title()
+    return name
+
+
+STATE_INDEX = {name_key(state): i for i, state in enumerate(CANONICAL_STATES)}
+STATE_INDEX.update({key: CANONICAL_STATES.index(state) for key, state in STATE_ALIASES.items()})
+
+
+def _prefix_tables():
+    """(allowed[prefix, state], single[prefix]) lookup arrays over every two-digit prefix."""
+    allowed = np.zeros((100, len(CANONICAL_STATES)), dtype=bool)
+    single = np.full(100, -1)
+    for prefix, states in PIN_PREFIX_STATES.items():
+        indexes = [CANONICAL_STATES.index(state) for state in states]
+        allowed[prefix, indexes] = True
+        if len(indexes) == 1:
+            single[prefix] = indexes[0]
+    return allowed, single
+
+
+PREFIX_ALLOWED, PREFIX_SINGLE = _prefix_tables()
+PREFIX_KNOWN = PREFIX_ALLOWED.any(axis=1)
+
+# Canonical spelling of every raw name seen so far (per process)
+_state_names = {}
+_district_names = {}
+
+
+def canonical_state(name):
+    """Index of a raw state name in CANONICAL_STATES, or -1 if it is not recognised."""
+    if name not in _state_names:
+        _state_names[name] = STATE_INDEX.get(name_key(name), -1)
+    return _state_names[name]
+
+
+def canonical_district(name):
+    """The kept spelling of a raw district name."""
+    if name not in _district_names:
+        cleaned = clean_name(name)
+        _district_names[name] = DISTRICT_ALIASES.get(name_key(cleaned), cleaned)
+    return _district_names[name]
+
+
+def _per_row(values, codes, renamed):
+    """
+    Expand per-category lookups of a categorical to its rows.
+
+    codes and renamed hold one entry per category; missing values get
+    code -1 and are never renamed. Returns (row_codes, row_renamed).
+    """
+    rows = values.cat.codes.to_numpy()
+    return (np.append(np.asarray(codes, dtype=np.intp), -1)[rows],
+            np.append(np.asarray(renamed, dtype=bool), False)[rows])
+
+
+def _categorical(codes, categories):
+    """Categorical of codes into categories, keeping only the categories in use."""
+    used = np.bincount(codes[codes >= 0], minlength=len(categories)) > 0
+    position = np.append(np.cumsum(used) - 1, -1)
+    return pd.Categorical.from_codes(position[codes], pd.Index(categories)[used])
+
+
+def _whole(values):
+    """Finite, non-negative whole numbers."""
+    return np.isfinite(values) & (values >= 0) & (values == np.floor(values))
+
+
+def _parse_dates(values):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    return pd.to_datetime(values, format=DATE_FORMAT, errors='coerce')
+
+
+class _ShardTally:
+    """Running totals of one shard while its chunks are checked."""
+
+    def __init__(self):
+        self.rows = 0
+        self.quarantined = dict.fromkeys(REASONS, 0)
+        self.repaired = dict.fromkeys(REPAIRS, 0)
+        self.rejected = []
+
+
+class Validator:
+    """
+    Data-quality checks applied to every chunk as the loader parses it.
+
+    Each chunk is checked with whole-column operations: states are
+    looked up in CANONICAL_STATES (plus aliases, and the pincode's
+    region when the name is not recognised), pincodes against
+    PIN_PREFIX_STATES, counts against max_count, dates for parse
+    failures and record IDs against the earlier shard of an overlap.
+    Names are canonicalised per category, not per row. Failing rows are
+    dropped from the chunk and written, with their reason, to
+    <quarantine_dir>/<shard>.quarantine.csv.gz; <shard>.quality.json
+    holds the shard's counts. Both are written when the shard has been
+    read, so a Validator can be handed to worker processes as it is.
+
+    covered maps a shard path to the number of its leading records that
+    an earlier shard already holds (see for_discovery).
+    """
+
+    def __init__(self, quarantine_dir, covered=None, max_count=MAX_COUNT):
+        self.quarantine_dir = quarantine_dir
+        self.covered = dict(covered or {})
+        self.max_count = max_count
+        self._tallies = {}
+
+    @classmethod
+    def for_discovery(cls, discovery, quarantine_dir, **kwargs):
+        """A Validator that quarantines the records shared by overlapping shards."""
+        covered = {nxt.path: prev.end - nxt.start for _, prev, nxt in discovery.overlaps}
+        return cls(quarantine_dir, covered, **kwargs)
+
+    def read_dtypes(self, dtypes):
+        """
+        read_csv dtypes for a checked read: numbers as float64.
+
+        Blank, negative and oversized values then reach the checks instead
+        of failing the parse; float64 parses as fast as the integer types.
+        """
+        return {col: dtype if dtype == 'category' else 'float64' for col, dtype in dtypes.items()}
+
+    def check(self, chunk, path, dataset):
+        """Check one chunk of a shard. Returns the kept rows with canonical names and dtypes."""
+        tally = self._tallies.setdefault(path, _ShardTally())
+        n = len(chunk)
+        failed = {}
+
+        row = tally.rows + np.arange(n)
+        failed['duplicate_range'] = row < self.covered.get(path, 0)
+
+        names = chunk['state'].cat.categories
+        index = [canonical_state(name) for name in names]
+        state, respelled = _per_row(chunk['state'], index, [
+            i >= 0 and CANONICAL_STATES[i] != name for i, name in zip(index, names)])
+
+        pincode = chunk['pincode'].to_numpy(dtype='float64')
+        valid_pincode = _whole(pincode) & (pincode >= 100_000) & (pincode <= 999_999)
+        prefix = np.where(valid_pincode, pincode // 10_000, 0).astype(np.intp)
+        valid_pincode &= PREFIX_KNOWN[prefix]
+
+        # A blank or unrecognised state is taken from the pincode when its region has one state
+        from_pincode = (state < 0) & valid_pincode & (PREFIX_SINGLE[prefix] >= 0)
+        state = np.where(from_pincode, PREFIX_SINGLE[prefix], state)
+        failed['missing_state'] = chunk['state'].isna().to_numpy() & (state < 0)
+        failed['bad_pincode'] = ~valid_pincode
+        failed['unknown_state'] = state < 0
+        failed['pincode_state_mismatch'] = ~PREFIX_ALLOWED[prefix, np.maximum(state, 0)]
+
+        bad_count = np.zeros(n, dtype=bool)
+        for col, dtype in COUNT_DTYPES[dataset].items():
+            values = chunk[col].to_numpy(dtype='float64')
+            limit = min(self.max_count, np.iinfo(dtype).max)
+            bad_count |= ~_whole(values) | (values > limit)
+        failed['bad_count'] = bad_count
+
+        dates = _parse_dates(chunk['date'])
+        failed['bad_date'] = dates.isna().to_numpy()
+
+        # 0 = kept, else 1 + the position of the first failed check in REASONS
+        reason = np.select(list(failed.values()), np.arange(1, len(REASONS) + 1), default=0)
+        keep = reason == 0
+        tally.rows += n
+        if not keep.all():
+            id_range = parse_shard_range(path)
+            rejected = chunk[~keep].copy()
+            rejected.insert(0, 'reason', np.array(list(REASONS))[reason[~keep] - 1])
+            rejected.insert(0, 'record_id', row[~keep] + id_range[0] if id_range else pd.NA)
+            rejected.insert(0, 'row', row[~keep])
+            tally.rejected.append(rejected)
+            counts = np.bincount(reason, minlength=len(REASONS) + 1)[1:]
+            for name, count in zip(REASONS, counts):
+                tally.quarantined[name] += int(count)
+
+        kept = chunk[keep].copy()
+        tally.repaired['state_spelling'] += int(respelled[keep].sum())
+        tally.repaired['state_from_pincode'] += int(from_pincode[keep].sum())
+        kept['state'] = _categorical(state[keep], CANONICAL_STATES)
+
+        names = kept['district'].cat.categories
+        spellings = [canonical_district(name) for name in names]
+        categories = sorted(set(spellings))
+        position = {name: i for i, name in enumerate(categories)}
+        district, respelled = _per_row(kept['district'], [position[name] for name in spellings],
+                                       [new != old for new, old in zip(spellings, names)])
+        tally.repaired['district_spelling'] += int(respelled.sum())
+        kept['district'] = _categorical(district, categories)
+
+        kept['pincode'] = kept['pincode'].astype('int32')
+        for col, dtype in COUNT_DTYPES[dataset].items():
+            kept[col] = kept[col].astype(dtype)
+        kept['date'] = dates[keep]
+        return kept
+
+    def finish(self, path):
+        """Write the quarantine file and summary of a shard once all its chunks are checked."""
+        tally = self._tallies.pop(path, _ShardTally())
+        os.makedirs(self.quarantine_dir, exist_ok=True)
+        stem = os.path.join(self.quarantine_dir, os.path.splitext(os.path.basename(path))[0])
+        quarantine_path = stem + QUARANTINE_SUFFIX
+        if tally.rejected:
+            rejected = pd.concat(tally.rejected)
+            # Numbers were read as float64; whole ones are written without '.0'
+            for col in rejected.columns[3:]:
+                values = rejected[col]
+                if values.dtype == 'float64' and (values.isna() | (values == values.round())).all():
+                    rejected[col] = values.astype('Int64')
+            rejected.to_csv(quarantine_path + '.tmp', index=False,
+                            compression={'method': 'gzip', 'compresslevel': 1})
+            os.replace(quarantine_path + '.tmp', quarantine_path)
+        elif os.path.exists(quarantine_path):
+            # Left by an earlier run of a shard that has since been fixed
+            os.remove(quarantine_path)
+
+        quarantined = sum(tally.quarantined.values())
+        summary = {
+            'shard': os.path.basename(path),
+            'path': path,
+            'rows': tally.rows,
+            'kept': tally.rows - quarantined,
+            'quarantined': tally.quarantined,
+            'repaired': tally.repaired,
+        }
+        with open(stem + SUMMARY_SUFFIX + '.tmp', 'w') as f:
+            json.dump(summary, f, indent=2)
+        os.replace(stem + SUMMARY_SUFFIX + '.tmp', stem + SUMMARY_SUFFIX)
+        return summary
+
+    def check_shard(self, frame, path, dataset):
+        """Check a whole shard already in memory (e.g. from the ShardCache) and finish it."""
+        kept = self.check(frame, path, dataset)
+        self.finish(path)
+        return kept
+
+    def report(self, paths=None):
+        """quality_report() of this validator's quarantine directory."""
+        return quality_report(self.quarantine_dir, paths)
+
+
+def quality_report(quarantine_dir, paths=None):
+    """
+    One row per shard summary in quarantine_dir (only those of paths if given).
+
+    Columns: shard, rows, kept, one per reason and one per repair.
+    """
+    if paths is None:
+        names = sorted(name for name in os.listdir(quarantine_dir) if name.endswith(SUMMARY_SUFFIX))
+    else:
+        names = [os.path.splitext(os.path.basename(path))[0] + SUMMARY_SUFFIX for path in paths]
+    records = []
+    for name in names:
+        with open(os.path.join(quarantine_dir, name)) as f:
+            summary = json.load(f)
+        records.append({'shard': summary['shard'], 'rows': summary['rows'], 'kept': summary['kept'],
+                        **summary['quarantined'], **summary['repaired']})
+    return pd.DataFrame(records, columns=['shard', 'rows', 'kept', *REASONS, *REPAIRS])
+
+
+def quality_lines(report):
+    """Printable totals of a quality_report()."""
+    rows = int(report['rows'].sum())
+    quarantined = rows - int(report['kept'].sum())
+    lines = [f"Quarantined {quarantined:,} of {rows:,} records ({quarantined / rows:.3%})"
+             if rows else "No records checked"]
+    for reason in REASONS:
+        count = int(report[reason].sum())
+        if count:
+            lines.append(f"  - {reason}: {count:,}")
+    repairs = [f"{repair} {int(report[repair].sum()):,}" for repair in REPAIRS
+               if report[repair].sum()]
+    if repairs:
+        lines.append(f"Repaired: {', '.join(repairs)}")
+    return lines